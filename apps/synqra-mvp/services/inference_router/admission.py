@@ -0,0 +1,225 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable
+
+from fastapi import HTTPException, status
+
+try:
+    from .deadline import Deadline
+except ImportError:
+    from deadline import Deadline
+
+
+# Lower runs first; products not listed get DEFAULT_PRIORITY.
+DEFAULT_PRIORITIES = {"synqra": 0, "aurafx": 1, "noid": 2}
+DEFAULT_PRIORITY = 3
+
+
+class AdmissionRejected(HTTPException):
+    """Shed for load; says nothing about the request itself, so it is never negatively cached."""
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "product", "deadline", "future")
+
+    def __init__(
+        self, priority: int, seq: int, product: str, deadline: Deadline, future: asyncio.Future
+    ) -> None:
+        self.priority = priority
+        self.seq = seq
+        self.product = product
+        self.deadline = deadline
+        self.future = future
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class AdmissionController:
+    """
+    Bounded admission in front of provider calls.
+    At most `max_concurrency` requests compute at once; the rest wait in a queue of
+    `max_queue` ordered by product priority, then arrival. A request is turned away
+    up front when its deadline cannot cover the expected queue wait plus a typical
+    service time, and dropped from the queue once that stops being true, so capacity
+    goes to requests that can still finish. When the queue is full a newcomer
+    displaces the newest waiter of a lower priority, or is rejected itself.
+    """
+
+    def __init__(
+        self,
+        *,
+        enabled: bool = True,
+        max_concurrency: int = 128,
+        max_queue: int = 256,
+        priorities: dict[str, int] | None = None,
+        default_priority: int = DEFAULT_PRIORITY,
+        service_time_alpha: float = 0.2,
+        clock: Callable[[], float] = time.perf_counter,
+    ) -> None:
+        self.enabled = enabled
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.priorities = {
+            product.lower(): value
+            for product, value in (DEFAULT_PRIORITIES if priorities is None else priorities).items()
+        }
+        self.default_priority = default_priority
+        self.service_time_alpha = service_time_alpha
+        self._clock = clock
+        self.in_flight = 0
+        self._queue: list[_Waiter] = []
+        self._queued = 0
+        self._seq = itertools.count()
+        # EWMA of how long a provider call holds its slot; None until the first one finishes.
+        self.service_seconds: float | None = None
+        self.outcomes: dict[str, dict[str, int]] = {}
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queued
+
+    def priority_for(self, product: str) -> int:
+        return self.priorities.get(product, self.default_priority)
+
+    def label(self, product: str) -> str:
+        """Product as reported in stats; unknown ones are pooled so clients cannot add labels."""
+        return product if product in self.priorities else "other"
+
+    @asynccontextmanager
+    async def admit(
+        self, product: str, deadline: Deadline, *, observe_service_time: bool = True
+    ) -> AsyncIterator[float]:
+        """
+        Holds a slot for the block; yields the seconds spent queued for it.
+        Pass observe_service_time=False for holders whose duration is not a provider
+        call's, such as a stream paced by its client, so the shedding estimate stays honest.
+        """
+        if not self.enabled:
+            yield 0.0
+            return
+        waited = await self._enter(product, deadline)
+        started = self._clock()
+        try:
+            yield waited
+        finally:
+            self._leave(self._clock() - started if observe_service_time else None)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self._queued,
+            "service_ms": None if self.service_seconds is None else int(self.service_seconds * 1000),
+            "priorities": dict(self.priorities),
+            "outcomes": {product: dict(counts) for product, counts in self.outcomes.items()},
+        }
+
+    async def _enter(self, product: str, deadline: Deadline) -> float:
+        priority = self.priority_for(product)
+        if self.in_flight < self.max_concurrency and not self._queued:
+            self.in_flight += 1
+            self._count(product, "admitted")
+            return 0.0
+
+        if deadline.remaining() < self._expected_wait(priority) + (self.service_seconds or 0.0):
+            self._reject(product, "deadline", "Request cannot be served before its deadline")
+        if self._queued >= self.max_queue and not self._displace(priority):
+            self._reject(product, "queue_full", "Admission queue is full")
+
+        queued_at = self._clock()
+        waiter = _Waiter(
+            priority, next(self._seq), product, deadline, asyncio.get_running_loop().create_future()
+        )
+        heapq.heappush(self._queue, waiter)
+        self._queued += 1
+        # Stop waiting while there is still time to be served.
+        timeout = max(0.0, deadline.remaining() - (self.service_seconds or 0.0))
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            self._reject(product, "deadline", "Request deadline reached while queued")
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        self._count(product, "admitted")
+        return self._clock() - queued_at
+
+    def _leave(self, held_seconds: float | None) -> None:
+        self.in_flight -= 1
+        if held_seconds is None:
+            pass
+        elif self.service_seconds is None:
+            self.service_seconds = held_seconds
+        else:
+            self.service_seconds += self.service_time_alpha * (held_seconds - self.service_seconds)
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._queue and self.in_flight < self.max_concurrency:
+            waiter = heapq.heappop(self._queue)
+            if waiter.future.done():
+                continue
+            self._queued -= 1
+            if waiter.deadline.remaining() < (self.service_seconds or 0.0):
+                waiter.future.set_exception(
+                    self._rejection(
+                        waiter.product, "deadline", "Request deadline reached while queued"
+                    )
+                )
+                continue
+            self.in_flight += 1
+            waiter.future.set_result(None)
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        if not waiter.future.done():
+            waiter.future.cancel()
+            self._queued -= 1
+        elif not waiter.future.cancelled() and waiter.future.exception() is None:
+            # Handed a slot just as we gave up on it; pass it on.
+            self.in_flight -= 1
+            self._wake()
+
+    def _displace(self, priority: int) -> bool:
+        """Sheds the newest waiter of a lower priority than `priority` to make room."""
+        live = [waiter for waiter in self._queue if not waiter.future.done()]
+        if not live:
+            return False
+        victim = max(live)
+        if victim.priority <= priority:
+            return False
+        self._queued -= 1
+        victim.future.set_exception(
+            self._rejection(victim.product, "displaced", "Shed for higher-priority traffic")
+        )
+        return True
+
+    def _expected_wait(self, priority: int) -> float:
+        if self.service_seconds is None:
+            return 0.0
+        ahead = sum(
+            1 for waiter in self._queue if waiter.priority <= priority and not waiter.future.done()
+        )
+        return (ahead + 1) * self.service_seconds / self.max_concurrency
+
+    def _reject(self, product: str, reason: str, detail: str) -> None:
+        raise self._rejection(product, reason, detail)
+
+    def _rejection(self, product: str, reason: str, detail: str) -> AdmissionRejected:
+        self._count(product, reason)
+        retry_after = max(1, int(self._expected_wait(self.priority_for(product)) + 0.999))
+        return AdmissionRejected(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail,
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    def _count(self, product: str, outcome: str) -> None:
+        counts = self.outcomes.setdefault(self.label(product), {})
+        counts[outcome] = counts.get(outcome, 0) + 1
@@ -0,0 +1 @@
+# Standalone benchmarks for the inference router; run with `python -m` from apps/synqra-mvp.
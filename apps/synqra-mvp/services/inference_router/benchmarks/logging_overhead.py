@@ -0,0 +1,152 @@
+"""
+Logging time paid by the caller (the event loop) per request: inline JSON to a stream vs
+the background handler, with and without rate limiting of a failing Redis.
+
+    python -m services.inference_router.benchmarks.logging_overhead --failure-rate 0.2
+
+Each simulated request logs one `http.request` line with the middleware's extras; a
+`--failure-rate` share of them also logs `cache.get_failed` with a traceback, as
+RedisCache does on every call while Redis is unreachable. `--sink-latency-us` makes
+every write block that long, like stdout backed by a slow pipe or log collector.
+Each case runs `--repeat` times and the fastest run is reported.
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import time
+from typing import Any
+
+from .. import structured_logging
+from ..structured_logging import BackgroundLogHandler, EventSampler, JsonFormatter
+
+
+class _SlowSink:
+    def __init__(self, latency_seconds: float) -> None:
+        self.latency_seconds = latency_seconds
+        self._devnull = open(os.devnull, "w", encoding="utf-8")
+
+    def write(self, text: str) -> int:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        return self._devnull.write(text)
+
+    def flush(self) -> None:
+        self._devnull.flush()
+
+    def close(self) -> None:
+        self._devnull.close()
+
+
+def _redis_error() -> BaseException:
+    try:
+        raise ConnectionError("Error 111 connecting to localhost:6379. Connection refused.")
+    except ConnectionError as exc:
+        return exc
+
+
+def _simulate(logger: logging.Logger, requests: int, failure_rate: float, seed: int = 7) -> float:
+    rng = random.Random(seed)
+    error = _redis_error()
+    spent = 0.0
+    for index in range(requests):
+        failed = rng.random() < failure_rate
+        started = time.perf_counter()
+        if failed:
+            logger.error("cache.get_failed", exc_info=error)
+        logger.info(
+            "http.request",
+            extra={
+                "request_id": f"req-{index}",
+                "path": "/infer",
+                "method": "POST",
+                "status_code": 200,
+                "duration_ms": 12,
+            },
+        )
+        spent += time.perf_counter() - started
+    return spent
+
+
+def _run_case(
+    requests: int,
+    failure_rate: float,
+    sink_latency: float,
+    *,
+    background: bool,
+    use_orjson: bool,
+    rate_limit: int | None = None,
+) -> dict[str, Any]:
+    original_orjson = structured_logging.orjson
+    if not use_orjson:
+        structured_logging.orjson = None
+    sink = _SlowSink(sink_latency)
+    handler: logging.Handler = logging.StreamHandler(sink)
+    handler.setFormatter(JsonFormatter())
+    if background:
+        handler = BackgroundLogHandler(handler, max_queue=requests * 2 + 1)
+    if rate_limit is not None:
+        handler.addFilter(EventSampler(rate_limits={"cache.get_failed": rate_limit}))
+
+    logger = logging.getLogger(f"benchmark.logging.{id(handler)}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    try:
+        wall_started = time.perf_counter()
+        spent = _simulate(logger, requests, failure_rate)
+        handler.flush()
+        wall = time.perf_counter() - wall_started
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+        sink.close()
+        structured_logging.orjson = original_orjson
+    return {
+        "caller_us_per_request": round(spent * 1_000_000 / requests, 2),
+        "total_ms_including_writer": round(wall * 1000, 1),
+    }
+
+
+def _best_of(repeat: int, *args: Any, **kwargs: Any) -> dict[str, Any]:
+    runs = [_run_case(*args, **kwargs) for _ in range(repeat)]
+    return min(runs, key=lambda result: result["caller_us_per_request"])
+
+
+def run(requests: int, failure_rate: float, sink_latency_us: float, repeat: int = 3) -> dict[str, Any]:
+    have_orjson = structured_logging.orjson is not None
+    case = (repeat, requests, failure_rate, sink_latency_us / 1_000_000)
+    results: dict[str, Any] = {
+        "requests": requests,
+        "failure_rate": failure_rate,
+        "sink_latency_us": sink_latency_us,
+        "orjson_available": have_orjson,
+        "inline_stdlib_json": _best_of(*case, background=False, use_orjson=False),
+    }
+    if have_orjson:
+        results["inline_orjson"] = _best_of(*case, background=False, use_orjson=True)
+    results["background"] = _best_of(*case, background=True, use_orjson=have_orjson)
+    results["background_rate_limited"] = _best_of(
+        *case, background=True, use_orjson=have_orjson, rate_limit=5
+    )
+    baseline = results["inline_stdlib_json"]["caller_us_per_request"]
+    results["saved_us_per_request"] = round(
+        baseline - results["background_rate_limited"]["caller_us_per_request"], 2
+    )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--failure-rate", type=float, default=0.2, help="share of requests hitting a Redis error")
+    parser.add_argument("--sink-latency-us", type=float, default=0.0, help="blocking time per write")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    print(json.dumps(run(args.requests, args.failure_rate, args.sink_latency_us, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Redis round trips per /infer request: legacy call sequence vs admit/publish scripts.
+
+    python -m services.inference_router.benchmarks.redis_round_trips
+    python -m services.inference_router.benchmarks.redis_round_trips --redis-url redis://localhost:6379/0
+
+Run from apps/synqra-mvp. Without `--redis-url` (or REDIS_URL) the scripts run in-process on fakeredis[lua]
+(requirements-dev.txt), which counts round trips exactly but says nothing about
+network latency; point it at a real server for meaningful `mean_ms`.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from contextlib import nullcontext
+from typing import Any, Awaitable, Callable
+from unittest import mock
+
+from redis.asyncio.connection import Connection
+
+from .. import redis_cache
+from ..redis_cache import RedisCache
+
+
+class RoundTripCounter:
+    """Counts packed sends on every connection; one send is one network round trip."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self._original = Connection.send_packed_command
+
+    def __enter__(self) -> "RoundTripCounter":
+        counter = self
+        original = self._original
+
+        async def counting_send(connection: Connection, command: Any, check_health: bool = True) -> None:
+            counter.count += 1
+            await original(connection, command, check_health)
+
+        Connection.send_packed_command = counting_send
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        Connection.send_packed_command = self._original
+
+
+async def _legacy_miss(cache: RedisCache, signature: str, request_id: str) -> None:
+    await cache.record_total_request(request_id)
+    await cache.get_cached(signature, use_local=False)
+    await cache.try_acquire_dedupe_lock(signature, request_id)
+    result = {"provider": "bench", "route": "text", "output": "x" * 512}
+    await cache.set_cached(signature, result)
+    await cache.set_dedupe_result(signature, result)
+    await cache.release_dedupe_lock(signature, request_id)
+
+
+async def _legacy_hit(cache: RedisCache, signature: str, request_id: str) -> None:
+    await cache.record_total_request(request_id)
+    await cache.get_cached(signature, use_local=False)
+
+
+async def _fast_miss(cache: RedisCache, signature: str, request_id: str) -> None:
+    await cache.admit(signature, request_id)
+    result = {"provider": "bench", "route": "text", "output": "x" * 512}
+    await cache.publish_result(signature, result, request_id)
+
+
+async def _fast_hit(cache: RedisCache, signature: str, request_id: str) -> None:
+    await cache.admit(signature, request_id)
+
+
+async def _measure(
+    cache: RedisCache,
+    flow: Callable[[RedisCache, str, str], Awaitable[None]],
+    signatures: list[str],
+) -> dict[str, float]:
+    with RoundTripCounter() as counter:
+        started = time.perf_counter()
+        for index, signature in enumerate(signatures):
+            await flow(cache, signature, f"bench-{index}")
+        elapsed = time.perf_counter() - started
+    return {
+        "round_trips_per_request": round(counter.count / len(signatures), 2),
+        "mean_ms": round(elapsed * 1000 / len(signatures), 3),
+    }
+
+
+def _fake_backend() -> Any:
+    """Routes RedisCache's client to an in-process fakeredis server."""
+    import fakeredis
+
+    server = fakeredis.FakeServer()
+    return mock.patch.object(
+        redis_cache.redis,
+        "from_url",
+        lambda url, **kwargs: fakeredis.FakeAsyncRedis(server=server, **kwargs),
+    )
+
+
+async def run(redis_url: str | None, iterations: int) -> dict[str, Any]:
+    namespace = f"bench:{uuid.uuid4().hex[:8]}"
+    with nullcontext() if redis_url else _fake_backend():
+        cache = RedisCache(redis_url or "redis://fakeredis", namespace=namespace)
+    try:
+        legacy = [f"legacy-{i}" for i in range(iterations)]
+        fast = [f"fast-{i}" for i in range(iterations)]
+        report = {
+            "backend": redis_url or "fakeredis",
+            "iterations": iterations,
+            "miss": {
+                "legacy": await _measure(cache, _legacy_miss, legacy),
+                "admit_publish": await _measure(cache, _fast_miss, fast),
+            },
+            "hit": {
+                "legacy": await _measure(cache, _legacy_hit, legacy),
+                "admit_publish": await _measure(cache, _fast_hit, fast),
+            },
+        }
+        async for key in cache._redis.scan_iter(match=f"{namespace}:*"):
+            await cache._redis.delete(key)
+        return report
+    finally:
+        await cache.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", default=os.getenv("REDIS_URL"))
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.redis_url, args.iterations)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Cache signatures: legacy sha256-over-json vs SignatureBuilder, speed and hit rate.
+
+    python -m services.inference_router.benchmarks.signatures --traffic requests.jsonl
+
+from apps/synqra-mvp, or `python -m benchmarks.signatures` from services/inference_router.
+
+`--traffic` is a JSONL file with one /infer request body per line; without it a
+synthetic mix with per-request trace ids and whitespace variants is used.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import time
+from typing import Any, Callable
+
+try:
+    from ..signature import SignatureBuilder
+except ImportError:
+    from signature import SignatureBuilder
+
+
+def _legacy(payload: dict[str, Any]) -> str:
+    """The router's cache key before key schemas: sha256 over the JSON-dumped payload."""
+    signature_payload = {
+        "product": payload.get("product", ""),
+        "prompt": payload.get("prompt", ""),
+        "media_url": payload.get("media_url", ""),
+        "metadata": payload.get("metadata") or {},
+    }
+    encoded = json.dumps(signature_payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _synthetic_traffic(count: int, seed: int = 7) -> list[dict[str, Any]]:
+    rng = random.Random(seed)
+    prompts = [f"Write a caption for product launch number {n}" for n in range(count // 10 or 1)]
+    payloads = []
+    for index in range(count):
+        prompt = rng.choice(prompts)
+        if rng.random() < 0.3:
+            prompt = f"  {prompt.replace(' ', '  ')}\n"
+        payloads.append(
+            {
+                "product": rng.choice(["synqra", "aurafx", "noid"]),
+                "prompt": prompt,
+                "metadata": {
+                    "trace_id": f"trace-{index}",
+                    "locale": "en",
+                    "tags": ["launch", "social"],
+                    "context": {"brand": "synqra", "tone": "bold", "history": ["x" * 64] * 8},
+                },
+            }
+        )
+    return payloads
+
+
+def _load_traffic(path: str) -> list[dict[str, Any]]:
+    with open(path, encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def _measure(build: Callable[[dict[str, Any]], str], payloads: list[dict[str, Any]]) -> dict[str, float]:
+    started = time.perf_counter()
+    signatures = [build(payload) for payload in payloads]
+    elapsed = time.perf_counter() - started
+    return {
+        "mean_us": round(elapsed * 1_000_000 / len(payloads), 3),
+        "hit_rate": round(1 - len(set(signatures)) / len(signatures), 4),
+    }
+
+
+def run(payloads: list[dict[str, Any]], schemas: str) -> dict[str, Any]:
+    builder = SignatureBuilder.from_json(schemas)
+    return {
+        "requests": len(payloads),
+        "legacy": _measure(_legacy, payloads),
+        "schema": _measure(builder.build, payloads),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--traffic", help="JSONL file of recorded request bodies")
+    parser.add_argument("--requests", type=int, default=20000, help="synthetic request count")
+    parser.add_argument("--schemas", default="", help="SIGNATURE_SCHEMAS JSON")
+    args = parser.parse_args()
+    payloads = _load_traffic(args.traffic) if args.traffic else _synthetic_traffic(args.requests)
+    print(json.dumps(run(payloads, args.schemas), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,262 @@
 import asyncio
 import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def is_breaker_failure(exc: BaseException) -> bool:
+    """Client errors (4xx other than 408/429) are the caller's fault, not the provider's."""
+    status_code = getattr(exc, "status_code", None)
+    if status_code is None:
+        return True
+    return status_code in (408, 429) or status_code >= 500
+
+
+class _Bucket:
+    __slots__ = ("bucket_id", "calls", "failures", "slow")
+
+    def __init__(self) -> None:
+        self.bucket_id = -1
+        self.calls = 0
+        self.failures = 0
+        self.slow = 0
+
+
+class _RollingWindow:
+    """Call, failure and slow-call counts over the last `window_seconds`, in 1s buckets."""
+
+    def __init__(self, window_seconds: int) -> None:
+        self._buckets = [_Bucket() for _ in range(max(1, window_seconds))]
+
+    def add(self, now: float, *, failed: bool, slow: bool) -> None:
+        bucket_id = int(now)
+        bucket = self._buckets[bucket_id % len(self._buckets)]
+        if bucket.bucket_id != bucket_id:
+            bucket.bucket_id = bucket_id
+            bucket.calls = bucket.failures = bucket.slow = 0
+        bucket.calls += 1
+        bucket.failures += failed
+        bucket.slow += slow
+
+    def totals(self, now: float) -> tuple[int, int, int]:
+        floor = int(now) - len(self._buckets) + 1
+        calls = failures = slow = 0
+        for bucket in self._buckets:
+            if bucket.bucket_id >= floor:
+                calls += bucket.calls
+                failures += bucket.failures
+                slow += bucket.slow
+        return calls, failures, slow
+
+    def clear(self) -> None:
+        for bucket in self._buckets:
+            bucket.bucket_id = -1
 
 
 class CircuitBreaker:
-    """Simple async circuit breaker for Groq rate-limit protection."""
+    """
+    Circuit breaker for one provider.
+    Opens when the rolling error rate or slow-call rate crosses its threshold (once
+    `min_calls` have been seen) or after `rate_limit_threshold` consecutive 429s.
+    After `open_seconds` it turns half-open and lets `half_open_probes` calls through;
+    that many successes close it, any failure reopens it.
+    Everything runs synchronously on the event loop, so reads never wait on a lock.
+    """
 
-    def __init__(self, threshold_429: int = 2, open_seconds: int = 60) -> None:
-        self.threshold_429 = threshold_429
+    def __init__(
+        self,
+        name: str = "groq",
+        *,
+        window_seconds: int = 30,
+        min_calls: int = 10,
+        error_rate_threshold: float = 0.5,
+        slow_call_seconds: float | None = None,
+        slow_call_rate_threshold: float = 0.8,
+        rate_limit_threshold: int = 2,
+        open_seconds: float = 60.0,
+        half_open_probes: int = 1,
+        is_failure: Callable[[BaseException], bool] = is_breaker_failure,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.min_calls = max(1, min_calls)
+        self.error_rate_threshold = error_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.rate_limit_threshold = rate_limit_threshold
         self.open_seconds = open_seconds
-        self._consecutive_429 = 0
+        self.half_open_probes = max(1, half_open_probes)
+        self._is_failure = is_failure
+        self._clock = clock
+        self._window = _RollingWindow(window_seconds)
+        self._state = CLOSED
         self._open_until = 0.0
-        self._lock = asyncio.Lock()
-
-    async def is_open(self) -> bool:
-        async with self._lock:
-            return time.time() < self._open_until
-
-    async def record_rate_limited(self) -> None:
-        async with self._lock:
-            self._consecutive_429 += 1
-            if self._consecutive_429 >= self.threshold_429:
-                self._open_until = time.time() + self.open_seconds
-
-    async def record_success(self) -> None:
-        async with self._lock:
-            self._consecutive_429 = 0
-            self._open_until = 0.0
-
-    async def record_non_429(self) -> None:
-        async with self._lock:
-            self._consecutive_429 = 0
-
-    async def status(self) -> dict:
-        async with self._lock:
-            now = time.time()
-            return {
-                "consecutive_429": self._consecutive_429,
-                "open": now < self._open_until,
-                "retry_after_seconds": max(0, int(self._open_until - now)),
-            }
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._probe_started_at = 0.0
+        self._consecutive_429 = 0
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self._clock() >= self._open_until:
+            self._state = HALF_OPEN
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        return self._state
+
+    def is_open(self) -> bool:
+        """True while calls are being refused; does not take a half-open probe slot."""
+        state = self.state
+        if state == OPEN:
+            return True
+        return state == HALF_OPEN and not self._probe_slot_free()
+
+    def allow(self) -> bool:
+        """Admits one call, taking a probe slot when half-open."""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._probe_slot_free():
+            self._probes_in_flight += 1
+            self._probe_started_at = self._clock()
+            return True
+        self.rejected += 1
+        return False
+
+    def retry_after_seconds(self) -> float:
+        if self.state == OPEN:
+            return max(0.0, self._open_until - self._clock())
+        return 0.0
+
+    @asynccontextmanager
+    async def track(self, *, observe_latency: bool = True) -> AsyncIterator[None]:
+        """Records the outcome of one call that allow() admitted."""
+        started = self._clock()
+        try:
+            yield
+        except (asyncio.CancelledError, GeneratorExit):
+            self.record_ignored()
+            raise
+        except BaseException as exc:
+            if getattr(exc, "status_code", None) == 429:
+                self.record_rate_limited()
+            elif self._is_failure(exc):
+                self.record_failure()
+            else:
+                self.record_ignored()
+            raise
+        else:
+            self.record_success(self._clock() - started if observe_latency else None)
+
+    def record_success(self, latency_seconds: float | None = None) -> None:
+        slow = (
+            self.slow_call_seconds is not None
+            and latency_seconds is not None
+            and latency_seconds > self.slow_call_seconds
+        )
+        self._consecutive_429 = 0
+        if self._state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if slow:
+                self._open()
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_probes:
+                self._close()
+            return
+        self._record(failed=False, slow=slow)
+
+    def record_failure(self) -> None:
+        self._consecutive_429 = 0
+        if self._state == HALF_OPEN:
+            self._open()
+            return
+        self._record(failed=True, slow=False)
+
+    def record_rate_limited(self) -> None:
+        self._consecutive_429 += 1
+        if self._state == HALF_OPEN or self._consecutive_429 >= self.rate_limit_threshold:
+            self._open()
+            return
+        self._record(failed=True, slow=False)
+
+    def record_ignored(self) -> None:
+        """Releases a probe slot for a call whose outcome says nothing about provider health."""
+        if self._state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def status(self) -> dict[str, Any]:
+        state = self.state
+        calls, failures, slow = self._window.totals(self._clock())
+        return {
+            "state": state,
+            "open": state == OPEN,
+            "retry_after_seconds": int(self.retry_after_seconds() + 0.999),
+            "window_calls": calls,
+            "error_rate": round(failures / calls, 4) if calls else 0.0,
+            "slow_call_rate": round(slow / calls, 4) if calls else 0.0,
+            "consecutive_429": self._consecutive_429,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+    def _record(self, *, failed: bool, slow: bool) -> None:
+        now = self._clock()
+        self._window.add(now, failed=failed, slow=slow)
+        if self._state != CLOSED:
+            return
+        calls, failures, slow_calls = self._window.totals(now)
+        if calls < self.min_calls:
+            return
+        if failures / calls >= self.error_rate_threshold or (
+            self.slow_call_seconds is not None
+            and slow_calls / calls >= self.slow_call_rate_threshold
+        ):
+            self._open()
+
+    def _probe_slot_free(self) -> bool:
+        if self._probes_in_flight < self.half_open_probes:
+            return True
+        # A probe that never reported back must not wedge the breaker half-open.
+        return self._clock() - self._probe_started_at >= self.open_seconds
+
+    def _open(self) -> None:
+        self._state = OPEN
+        self._open_until = self._clock() + self.open_seconds
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.opened += 1
+
+    def _close(self) -> None:
+        self._state = CLOSED
+        self._window.clear()
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+
+class CircuitBreakerRegistry:
+    """One CircuitBreaker per provider, created on first use from shared defaults and per-provider overrides."""
+
+    def __init__(
+        self, overrides: dict[str, dict[str, Any]] | None = None, **defaults: Any
+    ) -> None:
+        self._overrides = overrides or {}
+        self._defaults = defaults
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, provider: str) -> CircuitBreaker:
+        breaker = self._breakers.get(provider)
+        if breaker is None:
+            options = {**self._defaults, **self._overrides.get(provider, {})}
+            breaker = self._breakers[provider] = CircuitBreaker(provider, **options)
+        return breaker
+
+    def status(self) -> dict[str, Any]:
+        return {name: breaker.status() for name, breaker in self._breakers.items()}
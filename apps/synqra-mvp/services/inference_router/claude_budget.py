@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable
+
+
+logger = logging.getLogger(__name__)
+
+
+class ClaudeBudget:
+    """
+    Claude cap reservations spent from a small locally held lease.
+    A lease of `lease_size` reservations is taken from Redis in one call and is
+    valid for `lease_seconds`; leftovers go back to Redis when it expires or on close.
+    Leased reservations already count against the cap, so the global ratio holds;
+    `tolerance` lets the lease overshoot the cap ratio by that fraction so that
+    allowance parked in other processes' leases does not starve this one.
+    """
+
+    def __init__(
+        self,
+        redis_cache: Any,
+        *,
+        lease_size: int = 5,
+        lease_seconds: float = 30.0,
+        tolerance: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.redis_cache = redis_cache
+        self.lease_size = max(0, lease_size)
+        self.lease_seconds = lease_seconds
+        self.tolerance = max(0.0, tolerance)
+        self._clock = clock
+        self._remaining = 0
+        self._lease_bucket: str | None = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+        self.leases = 0
+        self.spent_locally = 0
+        self.returned = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.lease_size > 1
+
+    async def reserve(self, request_id: str) -> tuple[bool, int, int, float, str | None]:
+        """Same contract as RedisCache.try_reserve_claude_request."""
+        if not self.enabled:
+            return await self.redis_cache.try_reserve_claude_request(request_id)
+
+        if self._take():
+            return True, 0, 0, 0.0, self._lease_bucket
+
+        async with self._lock:
+            if self._take():
+                return True, 0, 0, 0.0, self._lease_bucket
+
+            expired_bucket, expired_count = self._lease_bucket, self._remaining
+            granted, total_count, claude_count, projected_ratio, bucket = (
+                await self.redis_cache.lease_claude_requests(
+                    self.lease_size,
+                    cap_ratio=self.redis_cache.claude_cap_ratio * (1 + self.tolerance),
+                    return_bucket=expired_bucket,
+                    return_count=expired_count,
+                )
+            )
+            self.returned += expired_count
+            self._lease_bucket = bucket
+            self._remaining = granted
+            self._expires_at = self._clock() + self.lease_seconds
+            if granted <= 0:
+                return False, total_count, claude_count, projected_ratio, None
+
+            self.leases += 1
+            self._take()
+            return True, total_count, claude_count, projected_ratio, bucket
+
+    async def release(self, reservation_member: str) -> None:
+        if self.enabled and reservation_member == self._lease_bucket and self._lease_active():
+            self._remaining += 1
+            self.spent_locally -= 1
+            return
+        await self.redis_cache.release_claude_reservation(reservation_member)
+
+    async def close(self) -> None:
+        async with self._lock:
+            if self._lease_bucket and self._remaining > 0:
+                await self.redis_cache.return_claude_requests(self._lease_bucket, self._remaining)
+                self.returned += self._remaining
+            self._remaining = 0
+            self._lease_bucket = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "lease_size": self.lease_size,
+            "lease_seconds": self.lease_seconds,
+            "tolerance": self.tolerance,
+            "remaining": self._remaining if self._lease_active() else 0,
+            "leases": self.leases,
+            "spent_locally": self.spent_locally,
+            "returned": self.returned,
+        }
+
+    def _lease_active(self) -> bool:
+        return self._lease_bucket is not None and self._clock() < self._expires_at
+
+    def _take(self) -> bool:
+        if self._remaining <= 0 or not self._lease_active():
+            return False
+        self._remaining -= 1
+        self.spent_locally += 1
+        return True
@@ -0,0 +1,53 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+
+class RequestCoalescer:
+    """
+    Per-process singleflight.
+    Concurrent callers with the same key share one in-flight computation,
+    so only the first of them reaches Redis and the providers.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.local_coalesced = 0
+        self.remote_deduped = 0
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        """Returns (result, coalesced); coalesced is True when another caller did the work."""
+        if not self.enabled:
+            return await factory(), False
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.local_coalesced += 1
+            return await asyncio.shield(task), True
+
+        task = asyncio.create_task(factory())
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._forget(key, done))
+        self.leaders += 1
+        # Shielded so one caller timing out does not cancel the work the others wait on.
+        return await asyncio.shield(task), False
+
+    def record_remote_dedupe(self) -> None:
+        self.remote_deduped += 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "local_coalesced": self.local_coalesced,
+            "remote_deduped": self.remote_deduped,
+        }
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Marks the exception retrieved when every waiter has already gone away.
+            task.exception()
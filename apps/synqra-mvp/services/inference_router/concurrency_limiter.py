@@ -0,0 +1,152 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for one provider.
+    While latency stays within `latency_tolerance` x the no-load baseline the limit
+    grows by roughly one per limit's worth of saturated successes; a latency spike
+    or a server-side error multiplies it by `backoff_ratio`. Successes acquired with
+    observe_latency=False still grow the limit, they just cannot shrink it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        initial_limit: int,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        latency_tolerance: float = 2.0,
+        backoff_ratio: float = 0.9,
+        baseline_drift: float = 0.002,
+        backoff_interval_seconds: float = 0.0,
+        is_failure: Callable[[BaseException], bool] | None = None,
+        on_wait: Callable[[str, float], None] | None = None,
+    ) -> None:
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(self.max_limit, max(self.min_limit, initial_limit)))
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+        self.baseline_drift = baseline_drift
+        self.backoff_interval_seconds = backoff_interval_seconds
+        self._is_failure = is_failure or (lambda exc: True)
+        # Told (name, seconds) for every acquisition, including the ones that never queued.
+        self._on_wait = on_wait
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._baseline: float | None = None
+        self._last_backoff = 0.0
+        self.successes = 0
+        self.failures = 0
+        self.backoffs = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def baseline_latency(self) -> float | None:
+        return self._baseline
+
+    @asynccontextmanager
+    async def acquire(self, *, observe_latency: bool = True) -> AsyncIterator[None]:
+        await self._enter()
+        started = time.perf_counter()
+        try:
+            yield
+        except (asyncio.CancelledError, GeneratorExit):
+            self._leave()
+            raise
+        except BaseException as exc:
+            self._leave()
+            if self._is_failure(exc):
+                self._on_failure()
+            raise
+        else:
+            self._leave()
+            self._on_success(time.perf_counter() - started if observe_latency else None)
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "baseline_latency_ms": None if self._baseline is None else int(self._baseline * 1000),
+            "successes": self.successes,
+            "failures": self.failures,
+            "backoffs": self.backoffs,
+        }
+
+    async def _enter(self) -> None:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            if self._on_wait is not None:
+                self._on_wait(self.name, 0.0)
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        queued = time.perf_counter()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was handed over just as we were cancelled; pass it on.
+                self.in_flight -= 1
+                self._wake()
+            else:
+                self._waiters.remove(waiter)
+            raise
+        if self._on_wait is not None:
+            self._on_wait(self.name, time.perf_counter() - queued)
+
+    def _leave(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self.in_flight += 1
+            waiter.set_result(None)
+
+    def _on_success(self, latency: float | None) -> None:
+        self.successes += 1
+        if latency is not None:
+            if self._baseline is None:
+                self._baseline = latency
+            else:
+                # Slow upward drift lets the baseline forget a stale minimum.
+                self._baseline = min(latency, self._baseline * (1 + self.baseline_drift))
+            if latency > self._baseline * self.latency_tolerance:
+                self._backoff()
+                return
+        saturated = self.in_flight + 1 >= int(self.limit) or bool(self._waiters)
+        if saturated and self.limit < self.max_limit:
+            self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self._wake()
+
+    def _on_failure(self) -> None:
+        self.failures += 1
+        self._backoff()
+
+    def _backoff(self) -> None:
+        # At most one decrease per latency period, so one slow burst does not collapse the limit.
+        now = time.monotonic()
+        interval = max(self.backoff_interval_seconds, (self._baseline or 0.0) * self.latency_tolerance)
+        if now - self._last_backoff < interval:
+            return
+        self._last_backoff = now
+        self.backoffs += 1
+        self.limit = max(float(self.min_limit), self.limit * self.backoff_ratio)
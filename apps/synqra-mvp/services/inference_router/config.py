@@ -0,0 +1,11 @@
+from typing import Any, Callable
+
+
+def parse_limits(raw: str, value_type: Callable[[str], Any] = int) -> dict[str, Any]:
+    """Parses "groq=64,ollama=20" into {"groq": 64, "ollama": 20}."""
+    limits: dict[str, Any] = {}
+    for item in raw.split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip():
+            limits[name.strip().lower()] = value_type(value)
+    return limits
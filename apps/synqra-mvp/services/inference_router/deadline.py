@@ -0,0 +1,23 @@
+import time
+from typing import Callable
+
+
+class Deadline:
+    """Absolute end time of one request, shared by every hop of the fallback cascade."""
+
+    def __init__(
+        self, timeout_seconds: float, *, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self._clock = clock
+        self.timeout_seconds = timeout_seconds
+        self.expires_at = clock() + timeout_seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - self._clock())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def budget(self, cap: float) -> float:
+        """Time a hop may use: its own timeout, cut down to what is left of the request."""
+        return min(cap, self.remaining())
@@ -0,0 +1,265 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    signature TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+"""
+
+
+class DiskResultCache:
+    """
+    Persistent SQLite (WAL) tier behind Redis for results that stay valid long after
+    the Redis TTL. It survives restarts and Redis flushes.
+    Every statement runs on one worker thread, so the event loop never blocks on disk.
+    Writes are queued and committed in batches by a background task; a full queue
+    drops writes instead of slowing requests down. Once the stored values exceed
+    `max_bytes`, the least recently read entries are evicted down to 90% of it.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        max_bytes: int = 512 * 1024 * 1024,
+        ttl_seconds: float = 86_400.0,
+        max_pending_writes: int = 1024,
+        write_batch_size: int = 64,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = path
+        self.max_bytes = max(0, max_bytes)
+        self.ttl_seconds = ttl_seconds
+        self.write_batch_size = max(1, write_batch_size)
+        self._clock = clock
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="disk-cache")
+        self._db: sqlite3.Connection | None = None
+        self._bytes = 0
+        self._pending: asyncio.Queue | None = None
+        self._max_pending_writes = max_pending_writes
+        self._writer: asyncio.Task | None = None
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.writes = 0
+        self.dropped_writes = 0
+        self.evictions = 0
+        self.errors = 0
+
+    async def get(self, signature: str) -> dict[str, Any] | None:
+        found = await self.get_many([signature])
+        return found.get(signature)
+
+    async def get_many(self, signatures: list[str]) -> dict[str, dict[str, Any]]:
+        if not signatures:
+            return {}
+        try:
+            found = await self._run(self._select, signatures)
+        except Exception:
+            self.errors += 1
+            logger.exception("disk_cache.get_failed")
+            return {}
+        self.hits += len(found)
+        self.misses += len(signatures) - len(found)
+        return found
+
+    def put(self, signature: str, value: dict[str, Any]) -> None:
+        """Queues a write; never waits on disk."""
+        if self._pending is None:
+            self._pending = asyncio.Queue(self._max_pending_writes)
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_loop())
+        try:
+            self._pending.put_nowait((signature, value))
+        except asyncio.QueueFull:
+            self.dropped_writes += 1
+
+    async def flush(self) -> None:
+        if self._pending is not None and self._writer is not None and not self._writer.done():
+            await self._pending.join()
+
+    async def close(self) -> None:
+        await self.flush()
+        if self._writer is not None:
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+        if self._db is not None:
+            await self._run(self._db.close)
+            self._db = None
+        self._executor.shutdown(wait=True)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": True,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "expirations": self.expirations,
+            "writes": self.writes,
+            "pending_writes": self._pending.qsize() if self._pending is not None else 0,
+            "dropped_writes": self.dropped_writes,
+            "evictions": self.evictions,
+            "errors": self.errors,
+        }
+
+    async def _write_loop(self) -> None:
+        assert self._pending is not None
+        while True:
+            batch = [await self._pending.get()]
+            while len(batch) < self.write_batch_size and not self._pending.empty():
+                batch.append(self._pending.get_nowait())
+            try:
+                await self._run(self._insert, batch)
+                self.writes += len(batch)
+            except Exception:
+                self.errors += 1
+                logger.exception("disk_cache.write_failed")
+            finally:
+                for _ in batch:
+                    self._pending.task_done()
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    # Everything below runs on the worker thread.
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(_SCHEMA)
+            self._bytes = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            self._db = db
+        return self._db
+
+    @staticmethod
+    @contextmanager
+    def _transaction(db: sqlite3.Connection) -> Iterator[None]:
+        db.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def _select(self, signatures: list[str]) -> dict[str, dict[str, Any]]:
+        db = self._connection()
+        now = self._clock()
+        placeholders = ",".join("?" * len(signatures))
+        rows = db.execute(
+            f"SELECT signature, value, expires_at FROM entries WHERE signature IN ({placeholders})",
+            signatures,
+        ).fetchall()
+        fresh = {
+            signature: json.loads(zlib.decompress(value))
+            for signature, value, expires_at in rows
+            if expires_at > now
+        }
+        expired = [signature for signature, _, expires_at in rows if expires_at <= now]
+        if not fresh and not expired:
+            return fresh
+        freed = 0
+        with self._transaction(db):
+            if expired:
+                freed = self._delete(db, expired)
+            db.executemany(
+                "UPDATE entries SET accessed_at = ? WHERE signature = ?",
+                [(now, signature) for signature in fresh],
+            )
+        self._bytes -= freed
+        self.expirations += len(expired)
+        return fresh
+
+    def _insert(self, batch: list[tuple[str, dict[str, Any]]]) -> None:
+        db = self._connection()
+        now = self._clock()
+        rows = {
+            signature: zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+            for signature, value in batch
+        }
+        # Counters change only once the transaction commits; a rollback leaves them as they were.
+        expired = evicted = 0
+        with self._transaction(db):
+            size = self._bytes - self._delete(db, list(rows))
+            db.executemany(
+                "INSERT INTO entries (signature, value, size, expires_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [
+                    (signature, value, len(value), now + self.ttl_seconds, now)
+                    for signature, value in rows.items()
+                ],
+            )
+            size += sum(len(value) for value in rows.values())
+            if size > self.max_bytes:
+                size, expired, evicted = self._evict(db, size, int(self.max_bytes * 0.9))
+        self._bytes = size
+        self.expirations += expired
+        self.evictions += evicted
+
+    def _delete(self, db: sqlite3.Connection, signatures: list[str]) -> int:
+        """Deletes the rows and returns the bytes they held."""
+        placeholders = ",".join("?" * len(signatures))
+        freed = db.execute(
+            f"SELECT COALESCE(SUM(size), 0) FROM entries WHERE signature IN ({placeholders})",
+            signatures,
+        ).fetchone()[0]
+        db.execute(f"DELETE FROM entries WHERE signature IN ({placeholders})", signatures)
+        return freed
+
+    def _evict(
+        self, db: sqlite3.Connection, size: int, target_bytes: int
+    ) -> tuple[int, int, int]:
+        """Shrinks `size` bytes of entries to `target_bytes`; returns (size, expired, evicted)."""
+        now = self._clock()
+        expired, expired_bytes = db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE expires_at <= ?", (now,)
+        ).fetchone()
+        db.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        size -= expired_bytes
+        evicted = 0
+        while size > target_bytes:
+            oldest = db.execute(
+                "SELECT signature, size FROM entries ORDER BY accessed_at LIMIT 256"
+            ).fetchall()
+            if not oldest:
+                size = 0
+                break
+            victims: list[str] = []
+            for signature, entry_size in oldest:
+                if size <= target_bytes:
+                    break
+                victims.append(signature)
+                size -= entry_size
+            db.execute(
+                f"DELETE FROM entries WHERE signature IN ({','.join('?' * len(victims))})",
+                victims,
+            )
+            evicted += len(victims)
+        return size, expired, evicted
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable
+
+
+logger = logging.getLogger(__name__)
+
+GLOBAL = "global"
+SCOPES = (GLOBAL, "product", "template")
+
+
+class CacheGenerations:
+    """
+    Generation counters mixed into every cache signature, so bumping one orphans every
+    entry it covers in O(1) instead of a SCAN/DEL over the keyspace; orphans simply age
+    out. Counters live in a Redis hash and are read from a local snapshot that is
+    reloaded in the background every `refresh_seconds`, so other processes pick up a
+    bump within that interval and the request path never waits on Redis for them.
+    The snapshot must be loaded with refresh() before serving; until then every key
+    would be the pre-bump one.
+    """
+
+    def __init__(
+        self,
+        redis_cache: Any,
+        *,
+        refresh_seconds: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.redis_cache = redis_cache
+        self.refresh_seconds = refresh_seconds
+        self._clock = clock
+        self._values: dict[str, int] = {}
+        self._loaded_at: float | None = None
+        self._refreshing: asyncio.Task | None = None
+        self.refresh_failures = 0
+
+    @staticmethod
+    def field(scope: str, name: str = "") -> str:
+        if scope not in SCOPES:
+            raise ValueError(f"unknown generation scope {scope!r}")
+        if scope == GLOBAL:
+            return GLOBAL
+        if not name:
+            raise ValueError(f"{scope} generation needs a name")
+        return f"{scope}:{name.strip().lower()}"
+
+    def key_for(self, product: str, template: str) -> str:
+        """Generation part of the cache key; empty while nothing has been bumped."""
+        self._refresh_if_due()
+        parts = (
+            self._values.get(GLOBAL, 0),
+            self._values.get(f"product:{product}", 0),
+            self._values.get(f"template:{template}", 0),
+        )
+        if not any(parts):
+            return ""
+        return "g%d.%d.%d" % parts
+
+    async def bump(self, scope: str, name: str = "") -> int:
+        field = self.field(scope, name)
+        value = await self.redis_cache.bump_generation(field)
+        # This process switches at once; others within refresh_seconds.
+        self._values[field] = value
+        return value
+
+    async def refresh(self) -> None:
+        try:
+            loaded = await self.redis_cache.get_generations()
+            # Counters only grow; a read that started before a local bump must not undo it.
+            merged = dict(self._values)
+            for field, value in loaded.items():
+                merged[field] = max(merged.get(field, 0), value)
+            self._values = merged
+        except Exception:
+            self.refresh_failures += 1
+            logger.exception("cache.generations_refresh_failed")
+        finally:
+            self._loaded_at = self._clock()
+
+    def snapshot(self) -> dict[str, int]:
+        return dict(self._values)
+
+    async def close(self) -> None:
+        if self._refreshing is not None:
+            await asyncio.gather(self._refreshing, return_exceptions=True)
+
+    def _refresh_if_due(self) -> None:
+        if self._refreshing is not None and not self._refreshing.done():
+            return
+        if self._loaded_at is not None and self._clock() - self._loaded_at < self.refresh_seconds:
+            return
+        self._refreshing = asyncio.create_task(self.refresh())
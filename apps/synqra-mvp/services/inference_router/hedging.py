@@ -0,0 +1,98 @@
+from collections import deque
+from typing import Any
+
+
+class LatencyTracker:
+    """Recent latency samples (seconds) for one provider."""
+
+    def __init__(self, window: int = 200) -> None:
+        self._samples: deque[float] = deque(maxlen=max(1, window))
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> float | None:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+        return ordered[index]
+
+
+class HedgePolicy:
+    """
+    Decides when a slow Groq call gets a parallel Ollama hedge.
+    The hedge fires once Groq has run past its observed latency percentile, and
+    a token bucket caps hedges at `max_hedge_ratio` of primary requests.
+    """
+
+    def __init__(
+        self,
+        *,
+        enabled: bool = False,
+        percentile: float = 0.95,
+        min_delay_seconds: float = 0.25,
+        max_delay_seconds: float = 8.0,
+        default_delay_seconds: float = 2.0,
+        min_samples: int = 20,
+        max_hedge_ratio: float = 0.1,
+        burst: float = 5.0,
+        window: int = 200,
+    ) -> None:
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_delay_seconds = min_delay_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.default_delay_seconds = default_delay_seconds
+        self.min_samples = min_samples
+        self.max_hedge_ratio = max_hedge_ratio
+        self.burst = burst
+        self.primary_latency = LatencyTracker(window)
+        self._tokens = burst
+        self.primaries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.hedges_denied = 0
+
+    def observe_primary(self, seconds: float) -> None:
+        self.primary_latency.observe(seconds)
+
+    def delay_seconds(self) -> float | None:
+        """Returns how long to wait for Groq before hedging, or None when hedging is off."""
+        if not self.enabled:
+            return None
+        self.primaries += 1
+        self._tokens = min(self.burst, self._tokens + self.max_hedge_ratio)
+
+        observed = None
+        if len(self.primary_latency) >= self.min_samples:
+            observed = self.primary_latency.percentile(self.percentile)
+        delay = self.default_delay_seconds if observed is None else observed
+        return min(self.max_delay_seconds, max(self.min_delay_seconds, delay))
+
+    def try_acquire(self) -> bool:
+        if self._tokens < 1 - 1e-9:
+            self.hedges_denied += 1
+            return False
+        self._tokens -= 1
+        self.hedges += 1
+        return True
+
+    def record_hedge_win(self) -> None:
+        self.hedge_wins += 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "percentile": self.percentile,
+            "primary_percentile_seconds": self.primary_latency.percentile(self.percentile),
+            "samples": len(self.primary_latency),
+            "primaries": self.primaries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedges_denied": self.hedges_denied,
+            "hedge_ratio": round(self.hedges / self.primaries, 4) if self.primaries else 0.0,
+        }
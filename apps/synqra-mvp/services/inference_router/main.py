@@ -1,4 +1,5 @@
 import asyncio
+import hmac
 import json
 import logging
 import os
@@ -6,44 +7,44 @@ import sys
 import time
 import uuid
 from contextlib import asynccontextmanager
-from typing import Any
+from typing import Any, AsyncIterator, Literal
 
-from fastapi import FastAPI, HTTPException, Request, status
+from fastapi import FastAPI, Header, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
 
 try:
+    from .config import parse_limits
+    from .deadline import Deadline
     from .router import InferenceRouter
+    from .server_timing import ServerTiming
+    from .structured_logging import BackgroundLogHandler, EventSampler, JsonFormatter
 except ImportError:
+    from config import parse_limits
+    from deadline import Deadline
     from router import InferenceRouter
-
-
-class JsonFormatter(logging.Formatter):
-    _reserved = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__.keys())
-
-    def format(self, record: logging.LogRecord) -> str:
-        payload: dict[str, Any] = {
-            "ts": self.formatTime(record, datefmt="%Y-%m-%dT%H:%M:%S"),
-            "level": record.levelname,
-            "logger": record.name,
-            "message": record.getMessage(),
-        }
-        for key, value in record.__dict__.items():
-            if key not in self._reserved and not key.startswith("_"):
-                payload[key] = value
-
-        if record.exc_info:
-            payload["exc_info"] = self.formatException(record.exc_info)
-
-        return json.dumps(payload, default=str, separators=(",", ":"))
+    from server_timing import ServerTiming
+    from structured_logging import BackgroundLogHandler, EventSampler, JsonFormatter
 
 
 def configure_logging() -> None:
     level = os.getenv("LOG_LEVEL", "INFO").upper()
-    handler = logging.StreamHandler(sys.stdout)
+    handler: logging.Handler = logging.StreamHandler(sys.stdout)
     handler.setFormatter(JsonFormatter())
+    if os.getenv("LOG_ASYNC", "true").lower() == "true":
+        handler = BackgroundLogHandler(handler, max_queue=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+    # e.g. LOG_SAMPLE_RATES="http.request=0.1", LOG_RATE_LIMITS="cache.get_failed=5"
+    handler.addFilter(
+        EventSampler(
+            sample_rates=parse_limits(os.getenv("LOG_SAMPLE_RATES", ""), float),
+            rate_limits=parse_limits(os.getenv("LOG_RATE_LIMITS", "")),
+        )
+    )
 
     root = logging.getLogger()
-    root.handlers.clear()
+    for previous in root.handlers[:]:
+        root.removeHandler(previous)
+        previous.close()
     root.setLevel(level)
     root.addHandler(handler)
 
@@ -52,6 +53,9 @@ configure_logging()
 logger = logging.getLogger(__name__)
 GLOBAL_REQUEST_TIMEOUT_SECONDS = int(os.getenv("GLOBAL_TIMEOUT_SECONDS", "30"))
 MAX_PROMPT_CHARS = int(os.getenv("MAX_PROMPT_CHARS", "16000"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "64"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
 
 
 class InferenceRequest(BaseModel):
@@ -69,11 +73,45 @@ class InferenceResponse(BaseModel):
     cached: bool
     deduped: bool
     claude_escalated: bool
+    debug: dict[str, Any] | None = Field(
+        default=None, description="Latency breakdown; only present when requested with ?debug=true"
+    )
+
+
+# Batch items never carry the per-request debug breakdown.
+BATCH_ITEM_EXCLUDE = {"response": {"debug"}}
+
+
+class BatchInferenceRequest(BaseModel):
+    items: list[InferenceRequest] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+    stream: bool = Field(default=False, description="Stream NDJSON results as they complete")
+
+
+class BatchItemError(BaseModel):
+    status_code: int
+    detail: Any
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    response: InferenceResponse | None = None
+    error: BatchItemError | None = None
+
+
+class BatchInferenceResponse(BaseModel):
+    request_id: str
+    results: list[BatchItemResult]
+
+
+class GenerationBumpRequest(BaseModel):
+    scope: Literal["global", "product", "template"]
+    name: str = Field(default="", description="Product or template name; unused for global")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     app.state.router = InferenceRouter.from_env()
+    await app.state.router.start()
     logger.info("service.started")
     try:
         yield
@@ -110,8 +148,7 @@ async def request_logging_middleware(request: Request, call_next):
         )
 
 
-@app.post("/infer", response_model=InferenceResponse)
-async def infer(req: InferenceRequest, request: Request):
+def validate_request(req: InferenceRequest) -> None:
     if not req.prompt and not req.media_url:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
@@ -123,26 +160,211 @@ async def infer(req: InferenceRequest, request: Request):
             detail=f"Prompt exceeds {MAX_PROMPT_CHARS} characters",
         )
 
+
+def timing_headers(timing: ServerTiming) -> dict[str, str]:
+    if not SERVER_TIMING_ENABLED or not timing:
+        return {}
+    return {"Server-Timing": timing.header()}
+
+
+def sse_event(event: str, data: dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str, separators=(',', ':'))}\n\n"
+
+
+@app.post("/infer", response_model=InferenceResponse)
+async def infer(req: InferenceRequest, request: Request, debug: bool = False):
+    validate_request(req)
+
     request_id = request.state.request_id
+    deadline = Deadline(GLOBAL_REQUEST_TIMEOUT_SECONDS)
     payload = req.model_dump()
+    timing = ServerTiming()
     try:
-        result = await asyncio.wait_for(
-            app.state.router.route_request(payload=payload, request_id=request_id),
-            timeout=GLOBAL_REQUEST_TIMEOUT_SECONDS,
-        )
-        return InferenceResponse(**result)
+        with timing.activate():
+            result = await asyncio.wait_for(
+                app.state.router.route_request(
+                    payload=payload, request_id=request_id, deadline=deadline
+                ),
+                timeout=deadline.remaining(),
+            )
+    except asyncio.TimeoutError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Global request timeout reached (30s)",
+        ) from exc
+
+    # Serialized here rather than by FastAPI so the header can include it.
+    with timing.measure("serialize"):
+        response = InferenceResponse(**result)
+        if debug:
+            response.debug = {"timings": timing.as_list()}
+        content = response.model_dump_json(exclude=None if debug else {"debug"})
+    return Response(content, media_type="application/json", headers=timing_headers(timing))
+
+
+@app.post("/infer/stream")
+async def infer_stream(req: InferenceRequest, request: Request):
+    validate_request(req)
+
+    request_id = request.state.request_id
+    deadline = Deadline(GLOBAL_REQUEST_TIMEOUT_SECONDS)
+    events = app.state.router.stream_request(
+        payload=req.model_dump(), request_id=request_id, deadline=deadline
+    )
+    # Pull the first event before responding so guard, open-circuit and all-providers-failed
+    # errors still surface as regular HTTP status codes; the header covers time to first token.
+    timing = ServerTiming()
+    try:
+        with timing.activate():
+            first = await asyncio.wait_for(anext(events), timeout=deadline.remaining())
     except asyncio.TimeoutError as exc:
+        await events.aclose()
         raise HTTPException(
             status_code=status.HTTP_504_GATEWAY_TIMEOUT,
             detail="Global request timeout reached (30s)",
         ) from exc
 
+    async def body() -> AsyncIterator[str]:
+        event = first
+        try:
+            while True:
+                name = event.pop("event")
+                yield sse_event(name, event)
+                if name == "done":
+                    return
+                event = await asyncio.wait_for(anext(events), timeout=deadline.remaining())
+        except asyncio.TimeoutError:
+            yield sse_event("error", {"status_code": 504, "detail": "Global request timeout reached"})
+        except HTTPException as exc:
+            yield sse_event("error", {"status_code": exc.status_code, "detail": exc.detail})
+        except Exception:
+            logger.exception("stream.failed", extra={"request_id": request_id})
+            yield sse_event("error", {"status_code": 502, "detail": "Provider stream failed"})
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **timing_headers(timing)},
+    )
+
+
+@app.post(
+    "/infer/batch",
+    response_model=BatchInferenceResponse,
+    response_model_exclude={"results": {"__all__": BATCH_ITEM_EXCLUDE}},
+)
+async def infer_batch(req: BatchInferenceRequest, request: Request):
+    request_id = request.state.request_id
+    deadline = Deadline(GLOBAL_REQUEST_TIMEOUT_SECONDS)
+
+    pending: dict[int, BatchItemResult | None] = {}
+    valid: list[int] = []
+    for index, item in enumerate(req.items):
+        try:
+            validate_request(item)
+        except HTTPException as exc:
+            pending[index] = BatchItemResult(
+                index=index, error=BatchItemError(status_code=exc.status_code, detail=exc.detail)
+            )
+            continue
+        pending[index] = None
+        valid.append(index)
+
+    # Started before any response exists, so a tripped memory guard is a plain 503.
+    outcomes = (
+        app.state.router.route_batch(
+            payloads=[req.items[index].model_dump() for index in valid],
+            request_id=request_id,
+            deadline=deadline,
+        )
+        if valid
+        else None
+    )
+
+    async def results() -> AsyncIterator[BatchItemResult]:
+        for index, result in pending.items():
+            if result is not None:
+                yield result
+        if outcomes is None:
+            return
+
+        done: set[int] = set()
+        # Once results are streaming the status is already sent; unfinished items report the failure.
+        failure: BatchItemError | None = None
+        try:
+            while len(done) < len(valid):
+                position, outcome = await asyncio.wait_for(
+                    anext(outcomes), timeout=deadline.remaining()
+                )
+                done.add(position)
+                yield BatchItemResult(index=valid[position], **outcome)
+        except asyncio.TimeoutError:
+            failure = BatchItemError(status_code=504, detail="Global request timeout reached")
+        except HTTPException as exc:
+            failure = BatchItemError(status_code=exc.status_code, detail=exc.detail)
+        except Exception:
+            logger.exception("batch.failed", extra={"request_id": request_id})
+            failure = BatchItemError(status_code=502, detail="Inference failed")
+        finally:
+            await outcomes.aclose()
+        if failure is not None:
+            for position, index in enumerate(valid):
+                if position not in done:
+                    yield BatchItemResult(index=index, error=failure)
+
+    if req.stream:
+
+        async def body() -> AsyncIterator[str]:
+            async for result in results():
+                yield result.model_dump_json(exclude=BATCH_ITEM_EXCLUDE) + "\n"
+
+        return StreamingResponse(body(), media_type="application/x-ndjson")
+
+    ordered = sorted([result async for result in results()], key=lambda result: result.index)
+    return BatchInferenceResponse(request_id=request_id, results=ordered)
+
+
+def require_admin(token: str | None) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin API is disabled")
+    if not token or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid admin token")
+
+
+@app.post("/admin/cache/generations")
+async def bump_cache_generation(
+    req: GenerationBumpRequest, x_admin_token: str | None = Header(default=None)
+) -> dict[str, Any]:
+    require_admin(x_admin_token)
+    try:
+        return await app.state.router.bump_cache_generation(req.scope, req.name)
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc)
+        ) from exc
+
+
+@app.get("/admin/cache")
+async def cache_report(x_admin_token: str | None = Header(default=None)) -> dict[str, Any]:
+    require_admin(x_admin_token)
+    return await app.state.router.cache_report()
+
 
 @app.get("/health")
 async def health() -> dict[str, Any]:
     return await app.state.router.health()
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(
+        app.state.router.metrics.registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -1,27 +1,156 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable
+
 import psutil
 from fastapi import HTTPException, status
 
 
+logger = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+
+
 class MemoryGuard:
-    """Rejects new requests when free RAM is below threshold."""
+    """
+    Rejects new requests when free memory is below threshold.
+    A background task samples every `sample_interval_seconds`: the container's cgroup v2
+    limit minus its working set (memory.current without reclaimable page cache) when a
+    limit is set, host available memory otherwise. enforce() only reads the last sample.
+    Once tripped, the guard stays tripped until free memory is back above
+    `recover_free_mb`, so traffic does not flap around the threshold.
+    """
 
-    def __init__(self, min_free_mb: int = 500) -> None:
-        self.min_free_bytes = min_free_mb * 1024 * 1024
+    def __init__(
+        self,
+        min_free_mb: int = 500,
+        *,
+        recover_free_mb: int | None = None,
+        sample_interval_seconds: float = 0.5,
+        cgroup_root: str = "/sys/fs/cgroup",
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.min_free_bytes = min_free_mb * _MB
+        if recover_free_mb is None:
+            recover_free_mb = int(min_free_mb * 1.2)
+        self.recover_free_bytes = max(self.min_free_bytes, recover_free_mb * _MB)
+        self.sample_interval_seconds = sample_interval_seconds
+        self.cgroup_root = cgroup_root
+        self._clock = clock
+        self.healthy = True
+        self.free_bytes: int | None = None
+        self.limit_bytes: int | None = None
+        self.source = "host"
+        self.trips = 0
+        self.sample_failures = 0
+        self._sampled_at: float | None = None
+        self._sampler: asyncio.Task | None = None
 
-    def snapshot(self) -> dict:
-        vm = psutil.virtual_memory()
-        free_mb = int(vm.available / (1024 * 1024))
+    def snapshot(self) -> dict[str, Any]:
+        self._ensure_sampling()
+        free_mb = None if self.free_bytes is None else int(self.free_bytes / _MB)
         return {
             "free_mb": free_mb,
-            "min_required_mb": int(self.min_free_bytes / (1024 * 1024)),
-            "healthy": vm.available >= self.min_free_bytes,
+            "min_required_mb": int(self.min_free_bytes / _MB),
+            "recover_mb": int(self.recover_free_bytes / _MB),
+            "healthy": self.healthy,
+            "source": self.source,
+            "limit_mb": None if self.limit_bytes is None else int(self.limit_bytes / _MB),
+            "sample_age_ms": (
+                None if self._sampled_at is None else int((self._clock() - self._sampled_at) * 1000)
+            ),
+            "trips": self.trips,
+            "sample_failures": self.sample_failures,
         }
 
     def enforce(self) -> None:
-        vm = psutil.virtual_memory()
-        if vm.available < self.min_free_bytes:
-            free_mb = int(vm.available / (1024 * 1024))
+        self._ensure_sampling()
+        if not self.healthy:
+            free_mb = int((self.free_bytes or 0) / _MB)
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail=f"Insufficient free RAM: {free_mb}MB available",
             )
+
+    def sample(self) -> None:
+        try:
+            cgroup = self._read_cgroup()
+            if cgroup is not None:
+                free, self.limit_bytes = cgroup
+                self.source = "cgroup"
+            else:
+                free = psutil.virtual_memory().available
+                self.limit_bytes = None
+                self.source = "host"
+        except Exception:
+            # Keep the last verdict; a guard that cannot read memory should not take traffic down.
+            self.sample_failures += 1
+            logger.exception("memory_guard.sample_failed")
+            return
+        self.free_bytes = free
+        self._sampled_at = self._clock()
+
+        if self.healthy and free < self.min_free_bytes:
+            self.healthy = False
+            self.trips += 1
+            logger.warning(
+                "memory_guard.tripped", extra={"free_mb": int(free / _MB), "source": self.source}
+            )
+        elif not self.healthy and free >= self.recover_free_bytes:
+            self.healthy = True
+            logger.info(
+                "memory_guard.recovered", extra={"free_mb": int(free / _MB), "source": self.source}
+            )
+
+    async def close(self) -> None:
+        if self._sampler is not None:
+            self._sampler.cancel()
+            await asyncio.gather(self._sampler, return_exceptions=True)
+            self._sampler = None
+
+    def _ensure_sampling(self) -> None:
+        if self._sampled_at is None and self.sample_failures == 0:
+            self.sample()
+        if self._sampler is not None and not self._sampler.done():
+            return
+        try:
+            self._sampler = asyncio.get_running_loop().create_task(self._sample_loop())
+        except RuntimeError:
+            # No event loop (scripts, sync tests): sample inline whenever the last one is stale.
+            stale = self._sampled_at is None or (
+                self._clock() - self._sampled_at >= self.sample_interval_seconds
+            )
+            if stale:
+                self.sample()
+
+    async def _sample_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sample_interval_seconds)
+            self.sample()
+
+    def _read_cgroup(self) -> tuple[int, int] | None:
+        """(free, limit) from cgroup v2; None when there is no cgroup v2 memory limit."""
+        try:
+            with open(os.path.join(self.cgroup_root, "memory.max"), encoding="ascii") as handle:
+                raw_limit = handle.read().strip()
+        except OSError:
+            return None
+        if raw_limit == "max":
+            return None
+        limit = int(raw_limit)
+        with open(os.path.join(self.cgroup_root, "memory.current"), encoding="ascii") as handle:
+            current = int(handle.read().strip())
+        # Inactive page cache is reclaimed before the OOM killer acts; the kubelet leaves it out too.
+        inactive_file = 0
+        try:
+            with open(os.path.join(self.cgroup_root, "memory.stat"), encoding="ascii") as handle:
+                for line in handle:
+                    key, _, value = line.partition(" ")
+                    if key == "inactive_file":
+                        inactive_file = int(value)
+                        break
+        except OSError:
+            pass
+        return max(0, limit - max(0, current - inactive_file)), limit
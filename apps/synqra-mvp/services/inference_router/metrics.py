@@ -0,0 +1,268 @@
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator
+
+try:
+    from .server_timing import ServerTiming
+except ImportError:
+    from server_timing import ServerTiming
+
+
+# Seconds; spans an L1 hit through a slow provider call under the 30 s global timeout.
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(pairs: Iterable[tuple[str, str]]) -> str:
+    body = ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+    return f"{{{body}}}" if body else ""
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self.bounds = bounds
+        # One slot per bound plus the +Inf overflow; made cumulative only when rendered.
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], Any] = {}
+
+    def labels(self, *values: Any) -> Any:
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            child = self._children[key] = self._new_child()
+        return child
+
+    def render(self, lines: list[str]) -> None:
+        lines.append(f"# HELP {self.name} {self.help}")
+        lines.append(f"# TYPE {self.name} {self.kind}")
+        for key, child in sorted(self._children.items()):
+            self._render_child(lines, list(zip(self.labelnames, key)), child)
+
+    def _new_child(self) -> Any:
+        return _Value()
+
+    def _render_child(self, lines: list[str], labels: list[tuple[str, str]], child: Any) -> None:
+        lines.append(f"{self.name}{_format_labels(labels)} {_format_value(child.value)}")
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        *,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def _render_child(
+        self, lines: list[str], labels: list[tuple[str, str]], child: _HistogramValue
+    ) -> None:
+        cumulative = 0
+        for bound, count in zip((*child.bounds, float("inf")), child.counts):
+            cumulative += count
+            le = _format_labels([*labels, ("le", _format_value(bound))])
+            lines.append(f"{self.name}_bucket{le} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {child.count}")
+
+
+class MetricsRegistry:
+    """
+    In-process metrics rendered in the Prometheus text exposition format.
+    Instruments are updated on the event loop and cost a dict lookup plus an add.
+    Collectors are called at scrape time to turn counters other components already
+    keep (breakers, limiters, caches) into metrics, so those stay off the request path.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list[Callable[[], Iterable[_Metric]]] = []
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        *,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets=buckets))
+
+    def add_collector(self, collect: Callable[[], Iterable[_Metric]]) -> None:
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            metric.render(lines)
+        for collect in self._collectors:
+            for metric in collect():
+                metric.render(lines)
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric: Any) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+
+class RouterMetrics:
+    """The router's own instruments; `registry` is what /metrics renders."""
+
+    def __init__(self, registry: MetricsRegistry | None = None) -> None:
+        self.registry = registry or MetricsRegistry()
+        self.requests_in_flight = self.registry.gauge(
+            "inference_requests_in_flight", "Requests currently inside the router"
+        )
+        self.request_seconds = self.registry.histogram(
+            "inference_request_seconds",
+            "Router latency by where the answer came from",
+            ("source",),
+        )
+        self.stage_seconds = self.registry.histogram(
+            "inference_stage_seconds", "Time spent in each stage of a request", ("stage",)
+        )
+        self.provider_seconds = self.registry.histogram(
+            "inference_provider_call_seconds",
+            "Provider call latency, including time queued for a concurrency slot",
+            ("provider", "outcome"),
+        )
+        self.provider_queue_seconds = self.registry.histogram(
+            "inference_provider_queue_seconds",
+            "Time spent waiting for a provider concurrency slot",
+            ("provider",),
+        )
+        self.cache_results = self.registry.counter(
+            "inference_cache_results_total", "Shared cache lookups by result", ("result",)
+        )
+        self.dedupe = self.registry.counter(
+            "inference_dedupe_total",
+            "Requests answered by another request's computation",
+            ("kind",),
+        )
+        self.claude_escalations = self.registry.counter(
+            "inference_claude_escalations_total", "Answers computed by Claude"
+        )
+        self.admission_wait_seconds = self.registry.histogram(
+            "inference_admission_wait_seconds",
+            "Time admitted requests spent in the admission queue",
+            ("product",),
+        )
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(name, time.perf_counter() - started)
+
+    def observe_stage(self, name: str, seconds: float) -> None:
+        """Feeds the stage histogram and the current request's Server-Timing, if any."""
+        self.stage_seconds.labels(name).observe(seconds)
+        timing = ServerTiming.current()
+        if timing is not None:
+            timing.add(name, seconds)
+
+    def observe_provider(self, provider: str, outcome: str, seconds: float) -> None:
+        self.provider_seconds.labels(provider, outcome).observe(seconds)
+        timing = ServerTiming.current()
+        if timing is not None:
+            timing.add(provider, seconds, outcome)
+
+    def observe_admission(self, product: str, seconds: float) -> None:
+        self.admission_wait_seconds.labels(product).observe(seconds)
+        timing = ServerTiming.current()
+        if timing is not None:
+            timing.add("admission", seconds)
+
+    def observe_queue_wait(self, provider: str, seconds: float) -> None:
+        self.provider_queue_seconds.labels(provider).observe(seconds)
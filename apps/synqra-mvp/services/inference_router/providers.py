@@ -1,9 +1,17 @@
-import asyncio
+import json
 import logging
-from typing import Any
+from typing import Any, AsyncIterator, Callable
 
 import httpx
 
+try:
+    from .concurrency_limiter import AdaptiveLimiter
+    from .deadline import Deadline
+    from .rate_limit import RateLimitShaper
+except ImportError:
+    from concurrency_limiter import AdaptiveLimiter
+    from deadline import Deadline
+    from rate_limit import RateLimitShaper
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +23,21 @@ class ProviderError(Exception):
         self.status_code = status_code
 
 
+class ProviderThrottled(ProviderError):
+    """Raised before the call when client-side shaping expects the provider to rate limit it."""
+
+
+class DeadlineExceeded(ProviderError):
+    """Raised when what is left of the request deadline is too short for this provider call."""
+
+
+def _is_overload_failure(exc: BaseException) -> bool:
+    """Client errors say nothing about provider load; everything else should back off."""
+    if isinstance(exc, ProviderError) and exc.status_code is not None:
+        return exc.status_code == 429 or exc.status_code >= 500
+    return not isinstance(exc, ProviderError)
+
+
 class ProviderClients:
     def __init__(
         self,
@@ -29,23 +52,82 @@ class ProviderClients:
         claude_model: str,
         kie_api_key: str | None,
         kie_base_url: str,
+        max_concurrency: dict[str, int] | None = None,
+        initial_concurrency: dict[str, int] | None = None,
+        groq_shaper: RateLimitShaper | None = None,
+        groq_output_tokens_estimate: int = 512,
+        request_timeout_seconds: float = 35.0,
+        min_call_seconds: dict[str, float] | None = None,
+        on_queue_wait: Callable[[str, float], None] | None = None,
     ) -> None:
         self.groq_api_key = groq_api_key
         self.groq_model = groq_model
         self.groq_timeout_seconds = groq_timeout_seconds
+        self.groq_shaper = groq_shaper or RateLimitShaper(enabled=False)
+        self.groq_output_tokens_estimate = groq_output_tokens_estimate
         self.ollama_base_url = ollama_base_url.rstrip("/")
         self.ollama_model = ollama_model
-        self._ollama_semaphore = asyncio.Semaphore(max(1, ollama_max_concurrency))
+        ceilings = {"groq": 64, "ollama": max(1, ollama_max_concurrency) * 4, "claude": 16, "kie": 16}
+        ceilings.update(max_concurrency or {})
+        # Hosted APIs start wide open and only narrow on 429/5xx; Ollama starts at what
+        # the local box was sized for.
+        initial = {"ollama": max(1, ollama_max_concurrency)}
+        initial.update(initial_concurrency or {})
+        self.limiters = {
+            name: AdaptiveLimiter(
+                name,
+                initial_limit=initial.get(name, ceiling),
+                max_limit=ceiling,
+                backoff_interval_seconds=1.0,
+                is_failure=_is_overload_failure,
+                on_wait=on_queue_wait,
+            )
+            for name, ceiling in ceilings.items()
+        }
         self.claude_api_key = claude_api_key
         self.claude_model = claude_model
         self.kie_api_key = kie_api_key
         self.kie_base_url = kie_base_url.rstrip("/")
-        self._client = httpx.AsyncClient(timeout=httpx.Timeout(35.0))
+        self.request_timeout_seconds = request_timeout_seconds
+        self.min_call_seconds = {"groq": 0.5, "ollama": 1.0, "claude": 2.0, "kie": 1.0}
+        self.min_call_seconds.update(min_call_seconds or {})
+        self._client = httpx.AsyncClient(timeout=httpx.Timeout(request_timeout_seconds))
 
     async def close(self) -> None:
         await self._client.aclose()
 
-    async def call_groq(self, prompt: str) -> str:
+    def limiter_status(self) -> dict[str, Any]:
+        return {name: limiter.status() for name, limiter in self.limiters.items()}
+
+    def time_budget(self, provider: str, deadline: Deadline | None) -> float | None:
+        """
+        Seconds this provider call may take, or None when the deadline cannot fit it.
+        A call needs at least its configured minimum and no less than the fastest
+        latency the limiter has seen for the provider.
+        """
+        cap = self.groq_timeout_seconds if provider == "groq" else self.request_timeout_seconds
+        if deadline is None:
+            return cap
+        limiter = self.limiters.get(provider)
+        needed = max(
+            self.min_call_seconds.get(provider, 0.0),
+            limiter.baseline_latency if limiter and limiter.baseline_latency else 0.0,
+        )
+        budget = deadline.budget(cap)
+        return budget if budget >= needed and budget > 0 else None
+
+    def _timeout(self, provider: str, deadline: Deadline | None) -> httpx.Timeout:
+        budget = self.time_budget(provider, deadline)
+        if budget is None:
+            raise DeadlineExceeded(provider, "Not enough time left before the request deadline")
+        return httpx.Timeout(budget)
+
+    async def _shape_groq(self, prompt: str) -> None:
+        estimated_tokens = (len(prompt) + 3) // 4 + self.groq_output_tokens_estimate
+        if not await self.groq_shaper.acquire(estimated_tokens):
+            raise ProviderThrottled("groq", "Groq quota exhausted until reset")
+
+    async def call_groq(self, prompt: str, deadline: Deadline | None = None) -> str:
         if not self.groq_api_key:
             raise ProviderError("groq", "GROQ_API_KEY is not configured")
 
@@ -57,14 +139,18 @@ class ProviderClients:
         }
         headers = {"Authorization": f"Bearer {self.groq_api_key}"}
 
-        response = await self._client.post(
-            url,
-            json=payload,
-            headers=headers,
-            timeout=httpx.Timeout(self.groq_timeout_seconds),
-        )
-        if response.status_code >= 400:
-            raise ProviderError("groq", response.text, response.status_code)
+        await self._shape_groq(prompt)
+        # Hosted call latency tracks output length, not load; only failures narrow the limit.
+        async with self.limiters["groq"].acquire(observe_latency=False):
+            response = await self._client.post(
+                url,
+                json=payload,
+                headers=headers,
+                timeout=self._timeout("groq", deadline),
+            )
+            self.groq_shaper.update(response.headers, response.status_code)
+            if response.status_code >= 400:
+                raise ProviderError("groq", response.text, response.status_code)
 
         data = response.json()
         try:
@@ -72,11 +158,13 @@ class ProviderClients:
         except (KeyError, IndexError, TypeError) as exc:
             raise ProviderError("groq", f"Malformed response: {data}") from exc
 
-    async def call_ollama(self, prompt: str) -> str:
-        async with self._ollama_semaphore:
+    async def call_ollama(self, prompt: str, deadline: Deadline | None = None) -> str:
+        async with self.limiters["ollama"].acquire():
             url = f"{self.ollama_base_url}/api/generate"
             payload = {"model": self.ollama_model, "prompt": prompt, "stream": False}
-            response = await self._client.post(url, json=payload)
+            response = await self._client.post(
+                url, json=payload, timeout=self._timeout("ollama", deadline)
+            )
             if response.status_code >= 400:
                 raise ProviderError("ollama", response.text, response.status_code)
 
@@ -85,7 +173,7 @@ class ProviderClients:
                 raise ProviderError("ollama", f"Malformed response: {data}")
             return str(data["response"])
 
-    async def call_claude(self, prompt: str) -> str:
+    async def call_claude(self, prompt: str, deadline: Deadline | None = None) -> str:
         if not self.claude_api_key:
             raise ProviderError("claude", "CLAUDE_API_KEY is not configured")
 
@@ -100,9 +188,12 @@ class ProviderClients:
             "max_tokens": 1024,
             "messages": [{"role": "user", "content": prompt}],
         }
-        response = await self._client.post(url, json=payload, headers=headers)
-        if response.status_code >= 400:
-            raise ProviderError("claude", response.text, response.status_code)
+        async with self.limiters["claude"].acquire(observe_latency=False):
+            response = await self._client.post(
+                url, json=payload, headers=headers, timeout=self._timeout("claude", deadline)
+            )
+            if response.status_code >= 400:
+                raise ProviderError("claude", response.text, response.status_code)
 
         data = response.json()
         try:
@@ -112,16 +203,142 @@ class ProviderClients:
         except (KeyError, TypeError) as exc:
             raise ProviderError("claude", f"Malformed response: {data}") from exc
 
-    async def call_kie(self, prompt: str, media_url: str, metadata: dict[str, Any]) -> Any:
+    async def stream_groq(
+        self, prompt: str, deadline: Deadline | None = None
+    ) -> AsyncIterator[str]:
+        if not self.groq_api_key:
+            raise ProviderError("groq", "GROQ_API_KEY is not configured")
+
+        url = "https://api.groq.com/openai/v1/chat/completions"
+        payload = {
+            "model": self.groq_model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.2,
+            "stream": True,
+        }
+        headers = {"Authorization": f"Bearer {self.groq_api_key}"}
+
+        await self._shape_groq(prompt)
+        async with self.limiters["groq"].acquire(observe_latency=False):
+            async with self._client.stream(
+                "POST",
+                url,
+                json=payload,
+                headers=headers,
+                timeout=self._timeout("groq", deadline),
+            ) as response:
+                self.groq_shaper.update(response.headers, response.status_code)
+                if response.status_code >= 400:
+                    body = await response.aread()
+                    raise ProviderError("groq", body.decode("utf-8", "replace"), response.status_code)
+
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        return
+                    try:
+                        text = json.loads(data)["choices"][0]["delta"].get("content")
+                    except (ValueError, KeyError, IndexError, TypeError) as exc:
+                        raise ProviderError("groq", f"Malformed stream chunk: {data}") from exc
+                    if text:
+                        yield text
+
+    async def stream_ollama(
+        self, prompt: str, deadline: Deadline | None = None
+    ) -> AsyncIterator[str]:
+        # Stream duration tracks output length, not load, so it is not fed to the limiter.
+        async with self.limiters["ollama"].acquire(observe_latency=False):
+            url = f"{self.ollama_base_url}/api/generate"
+            payload = {"model": self.ollama_model, "prompt": prompt, "stream": True}
+            async with self._client.stream(
+                "POST", url, json=payload, timeout=self._timeout("ollama", deadline)
+            ) as response:
+                if response.status_code >= 400:
+                    body = await response.aread()
+                    raise ProviderError("ollama", body.decode("utf-8", "replace"), response.status_code)
+
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    try:
+                        data = json.loads(line)
+                    except ValueError as exc:
+                        raise ProviderError("ollama", f"Malformed stream chunk: {line}") from exc
+                    if "error" in data:
+                        raise ProviderError("ollama", str(data["error"]))
+                    if data.get("response"):
+                        yield str(data["response"])
+                    if data.get("done"):
+                        return
+
+    async def stream_claude(
+        self, prompt: str, deadline: Deadline | None = None
+    ) -> AsyncIterator[str]:
+        if not self.claude_api_key:
+            raise ProviderError("claude", "CLAUDE_API_KEY is not configured")
+
+        url = "https://api.anthropic.com/v1/messages"
+        headers = {
+            "x-api-key": self.claude_api_key,
+            "anthropic-version": "2023-06-01",
+            "content-type": "application/json",
+        }
+        payload = {
+            "model": self.claude_model,
+            "max_tokens": 1024,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": True,
+        }
+        async with self.limiters["claude"].acquire(observe_latency=False):
+            async with self._client.stream(
+                "POST",
+                url,
+                json=payload,
+                headers=headers,
+                timeout=self._timeout("claude", deadline),
+            ) as response:
+                if response.status_code >= 400:
+                    body = await response.aread()
+                    raise ProviderError("claude", body.decode("utf-8", "replace"), response.status_code)
+
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    try:
+                        event = json.loads(line[len("data:"):].strip())
+                    except ValueError as exc:
+                        raise ProviderError("claude", f"Malformed stream chunk: {line}") from exc
+                    event_type = event.get("type")
+                    if event_type == "error":
+                        raise ProviderError("claude", str(event.get("error")))
+                    if event_type == "message_stop":
+                        return
+                    delta = event.get("delta") or {}
+                    if event_type == "content_block_delta" and delta.get("type") == "text_delta":
+                        if delta.get("text"):
+                            yield delta["text"]
+
+    async def call_kie(
+        self,
+        prompt: str,
+        media_url: str,
+        metadata: dict[str, Any],
+        deadline: Deadline | None = None,
+    ) -> Any:
         if not self.kie_api_key:
             raise ProviderError("kie", "KIE_API_KEY is not configured")
 
         url = f"{self.kie_base_url}/v1/media/infer"
         headers = {"Authorization": f"Bearer {self.kie_api_key}"}
         payload = {"prompt": prompt, "media_url": media_url, "metadata": metadata}
-        response = await self._client.post(url, json=payload, headers=headers)
-        if response.status_code >= 400:
-            raise ProviderError("kie", response.text, response.status_code)
+        async with self.limiters["kie"].acquire(observe_latency=False):
+            response = await self._client.post(
+                url, json=payload, headers=headers, timeout=self._timeout("kie", deadline)
+            )
+            if response.status_code >= 400:
+                raise ProviderError("kie", response.text, response.status_code)
 
         data = response.json()
         if isinstance(data, dict) and "output" in data:
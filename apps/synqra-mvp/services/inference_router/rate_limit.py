@@ -0,0 +1,160 @@
+import asyncio
+import re
+import time
+from typing import Any, Awaitable, Callable, Mapping
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def parse_reset_seconds(raw: str | None) -> float | None:
+    """Parses Groq reset values such as "2m59.56s", "7.66s", "120ms" or a bare number of seconds."""
+    if not raw:
+        return None
+    raw = raw.strip()
+    try:
+        return max(0.0, float(raw))
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(raw)
+    if not parts:
+        return None
+    return sum(float(value) * _DURATION_UNITS[unit] for value, unit in parts)
+
+
+class _Quota:
+    """One rate-limit dimension (requests or tokens) as last reported by the provider."""
+
+    def __init__(self, reserve: int) -> None:
+        self.reserve = reserve
+        self.limit: int | None = None
+        self.remaining: int | None = None
+        self.reset_at = 0.0
+        # Earliest start of the next call while this quota is being paced.
+        self.next_slot = 0.0
+
+    def update(self, limit: str | None, remaining: str | None, reset: str | None, now: float) -> None:
+        if remaining is None:
+            return
+        try:
+            self.remaining = int(float(remaining))
+            self.limit = int(float(limit)) if limit is not None else self.limit
+        except ValueError:
+            return
+        reset_seconds = parse_reset_seconds(reset)
+        self.reset_at = now + (reset_seconds if reset_seconds is not None else 1.0)
+
+    def known(self, now: float) -> bool:
+        if self.remaining is None:
+            return False
+        if now >= self.reset_at:
+            # Window replenished; wait for fresh headers instead of guessing.
+            self.remaining = None
+            return False
+        return True
+
+
+class RateLimitShaper:
+    """
+    Client-side pacing from x-ratelimit-* response headers.
+    Requests are spent from the last reported quota; below `pace_below_fraction`
+    of the limit they are spaced evenly over the reset window, and once only the
+    reserve is left they wait for the reset, or are refused when that is further
+    away than `max_defer_seconds`, so the provider never has to answer 429.
+    """
+
+    def __init__(
+        self,
+        *,
+        enabled: bool = True,
+        max_defer_seconds: float = 1.0,
+        reserve_requests: int = 1,
+        reserve_tokens: int = 0,
+        pace_below_fraction: float = 0.1,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+    ) -> None:
+        self.enabled = enabled
+        self.max_defer_seconds = max_defer_seconds
+        self.pace_below_fraction = pace_below_fraction
+        self._clock = clock
+        self._sleep = sleep
+        self.requests = _Quota(reserve_requests)
+        self.tokens = _Quota(reserve_tokens)
+        self.deferred = 0
+        self.refused = 0
+
+    async def acquire(self, estimated_tokens: int) -> bool:
+        """Waits for quota; returns False when the wait would exceed max_defer_seconds."""
+        if not self.enabled:
+            return True
+
+        now = self._clock()
+        planned = self._delay_for(estimated_tokens, now)
+        if planned is None:
+            self.refused += 1
+            return False
+        delay, paced = planned
+        # Claimed before sleeping so concurrent callers queue behind this one.
+        for quota, interval in paced:
+            quota.next_slot = now + delay + interval
+        if delay > 0:
+            self.deferred += 1
+            await self._sleep(delay)
+
+        if self.requests.remaining is not None:
+            self.requests.remaining -= 1
+        if self.tokens.remaining is not None:
+            self.tokens.remaining -= estimated_tokens
+        return True
+
+    def update(self, headers: Mapping[str, str], status_code: int | None = None) -> None:
+        now = self._clock()
+        self.requests.update(
+            headers.get("x-ratelimit-limit-requests"),
+            headers.get("x-ratelimit-remaining-requests"),
+            headers.get("x-ratelimit-reset-requests"),
+            now,
+        )
+        self.tokens.update(
+            headers.get("x-ratelimit-limit-tokens"),
+            headers.get("x-ratelimit-remaining-tokens"),
+            headers.get("x-ratelimit-reset-tokens"),
+            now,
+        )
+        if status_code == 429:
+            retry_after = parse_reset_seconds(headers.get("retry-after"))
+            if retry_after is not None:
+                self.requests.remaining = 0
+                self.requests.reset_at = max(self.requests.reset_at, now + retry_after)
+
+    def status(self) -> dict[str, Any]:
+        now = self._clock()
+        return {
+            "enabled": self.enabled,
+            "remaining_requests": self.requests.remaining if self.requests.known(now) else None,
+            "remaining_tokens": self.tokens.remaining if self.tokens.known(now) else None,
+            "deferred": self.deferred,
+            "refused": self.refused,
+        }
+
+    def _delay_for(
+        self, estimated_tokens: int, now: float
+    ) -> tuple[float, list[tuple[_Quota, float]]] | None:
+        """(delay, [(paced quota, interval)]), or None to refuse; claims nothing itself."""
+        delay = 0.0
+        paced: list[tuple[_Quota, float]] = []
+        for quota, needed in ((self.requests, 1), (self.tokens, estimated_tokens)):
+            if not quota.known(now):
+                continue
+            available = quota.remaining - quota.reserve
+            if available < needed:
+                delay = max(delay, quota.reset_at - now)
+            elif quota.limit and quota.remaining < quota.limit * self.pace_below_fraction:
+                interval = (quota.reset_at - now) / max(1, available // max(1, needed))
+                paced.append((quota, interval))
+                delay = max(delay, quota.next_slot - now)
+        if delay > self.max_defer_seconds:
+            return None
+        return delay, paced
@@ -1,15 +1,45 @@
 import asyncio
-import hashlib
+import base64
 import json
 import logging
+import math
+import random
 import time
+import zlib
+from dataclasses import dataclass
 from typing import Any
 
 import redis.asyncio as redis
 
+try:
+    from .disk_cache import DiskResultCache
+    from .local_cache import LocalResultCache
+    from .sliding_window import WINDOW_LUA, SlidingWindow
+except ImportError:
+    from disk_cache import DiskResultCache
+    from local_cache import LocalResultCache
+    from sliding_window import WINDOW_LUA, SlidingWindow
+
 
 logger = logging.getLogger(__name__)
 
+# Cache value formats. Anything not starting with a prefix is a JSON entry from before them.
+_ENTRY_V2 = "2:"
+_ENTRY_V2_ZLIB = "2z:"
+_ENTRY_REF = "2@"
+# Published on a signature's dedupe channel by lock owners only, since only they can have
+# waiters; waiters read the value themselves.
+_DEDUPE_NOTIFY = "1"
+
+
+@dataclass
+class AdmitResult:
+    cached: dict[str, Any] | None
+    lock_acquired: bool
+    lock: dict[str, Any] | None
+    refresh_due: bool = False
+    failure: dict[str, Any] | None = None
+
 
 class RedisCache:
     def __init__(
@@ -19,12 +49,49 @@ class RedisCache:
         cache_ttl_seconds: int = 300,
         claude_cap_ratio: float = 0.01,
         claude_window_seconds: int = 3600,
+        claude_window_bucket_seconds: int = 60,
         namespace: str = "synqra:inference",
+        local_cache: LocalResultCache | None = None,
+        dedupe_notify_enabled: bool = True,
+        stale_ttl_seconds: int = 0,
+        early_refresh_beta: float = 0.0,
+        negative_ttl_seconds: int = 0,
+        compress_min_bytes: int = 1024,
+        entry_version: int = 2,
+        disk_cache: DiskResultCache | None = None,
     ) -> None:
         self.cache_ttl_seconds = cache_ttl_seconds
+        self.stale_ttl_seconds = max(0, stale_ttl_seconds)
+        self.early_refresh_beta = early_refresh_beta
+        # 0 turns compression off.
+        self.compress_min_bytes = max(0, compress_min_bytes)
+        # 1 keeps writing the plain JSON envelope while older readers are still deployed.
+        self.entry_version = entry_version
         self.claude_cap_ratio = claude_cap_ratio
         self.claude_window_seconds = claude_window_seconds
+        self.window = SlidingWindow(claude_window_seconds, claude_window_bucket_seconds)
         self.namespace = namespace
+        # An empty LocalResultCache is falsy (__len__), so test for None explicitly.
+        self.local_cache = (
+            local_cache if local_cache is not None else LocalResultCache(max_entries=0)
+        )
+        self.disk_cache = disk_cache
+        self.dedupe_notify_enabled = dedupe_notify_enabled
+        self.negative_ttl_seconds = max(0, negative_ttl_seconds)
+        self.negative_local = LocalResultCache(
+            max_entries=1024 if self.negative_ttl_seconds else 0,
+            max_bytes=1024 * 1024,
+            ttl_seconds=self.negative_ttl_seconds,
+        )
+        self.negative_stored = 0
+        self.negative_local_hits = 0
+        self.negative_remote_hits = 0
+        self._dedupe_waiters: dict[str, set[asyncio.Future]] = {}
+        self._dedupe_pubsub: Any = None
+        self._dedupe_listener: asyncio.Task | None = None
+        self._dedupe_listener_lock = asyncio.Lock()
+        self.stale_hits = 0
+        self.early_refreshes = 0
         self._redis = redis.from_url(redis_url, encoding="utf-8", decode_responses=True)
         self._dedupe_unlock_script = """
 local raw = redis.call("GET", KEYS[1])
@@ -40,32 +107,141 @@ if payload["owner"] == ARGV[1] then
 end
 return 0
 """
-        self._claude_reserve_script = """
+        self._claude_reserve_script = self._redis.register_script(
+            WINDOW_LUA
+            + """
 local total_key = KEYS[1]
 local claude_key = KEYS[2]
-local now_ms = tonumber(ARGV[1])
-local cutoff_ms = tonumber(ARGV[2])
-local cap_ratio = tonumber(ARGV[3])
-local member = ARGV[4]
-
-redis.call("ZREMRANGEBYSCORE", total_key, 0, cutoff_ms)
-redis.call("ZREMRANGEBYSCORE", claude_key, 0, cutoff_ms)
+local bucket = tonumber(ARGV[1])
+local buckets = tonumber(ARGV[2])
+local ttl_seconds = tonumber(ARGV[3])
+local cap_ratio = tonumber(ARGV[4])
 
-local total_count = redis.call("ZCARD", total_key)
-local claude_count = redis.call("ZCARD", claude_key)
+local total_count = window_roll(total_key, bucket, buckets, ttl_seconds)
+local claude_count = window_roll(claude_key, bucket, buckets, ttl_seconds)
 if total_count == 0 then
   return {0, total_count, claude_count, "0"}
 end
 
 local projected_ratio = (claude_count + 1) / total_count
 if projected_ratio <= cap_ratio then
-  redis.call("ZADD", claude_key, now_ms, member)
+  window_add(claude_key, bucket, buckets, 1, ttl_seconds)
   return {1, total_count, claude_count, tostring(projected_ratio)}
 end
 return {0, total_count, claude_count, tostring(projected_ratio)}
 """
+        )
+        self._window_add_script = self._redis.register_script(
+            WINDOW_LUA
+            + """
+return window_add(KEYS[1], tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[4]), tonumber(ARGV[3]))
+"""
+        )
+        self._window_read_script = self._redis.register_script(
+            WINDOW_LUA
+            + """
+local bucket = tonumber(ARGV[1])
+local buckets = tonumber(ARGV[2])
+local ttl_seconds = tonumber(ARGV[3])
+return {window_roll(KEYS[1], bucket, buckets, ttl_seconds), window_roll(KEYS[2], bucket, buckets, ttl_seconds)}
+"""
+        )
+        self._window_remove_script = self._redis.register_script(
+            WINDOW_LUA
+            + """
+return window_remove(KEYS[1], tonumber(ARGV[1]), tonumber(ARGV[2]))
+"""
+        )
+        # Grants up to ARGV[5] reservations at once, returning an expired lease's leftovers first.
+        self._claude_lease_script = self._redis.register_script(
+            WINDOW_LUA
+            + """
+local total_key = KEYS[1]
+local claude_key = KEYS[2]
+local bucket = tonumber(ARGV[1])
+local buckets = tonumber(ARGV[2])
+local ttl_seconds = tonumber(ARGV[3])
+local cap_ratio = tonumber(ARGV[4])
+local requested = tonumber(ARGV[5])
+local return_bucket = tonumber(ARGV[6])
+local return_count = tonumber(ARGV[7])
+
+if return_count > 0 then
+  window_remove(claude_key, return_bucket, return_count)
+end
+
+local total_count = window_roll(total_key, bucket, buckets, ttl_seconds)
+local claude_count = window_roll(claude_key, bucket, buckets, ttl_seconds)
+if total_count == 0 then
+  return {0, total_count, claude_count, "0"}
+end
+
+local allowance = math.floor(total_count * cap_ratio + 1e-9) - claude_count
+local granted = math.max(0, math.min(requested, allowance))
+if granted > 0 then
+  window_add(claude_key, bucket, buckets, granted, ttl_seconds)
+end
+return {granted, total_count, claude_count, tostring((claude_count + math.max(granted, 1)) / total_count)}
+"""
+        )
+        # Cache-miss fast path: record + cache check + dedupe lock in one round trip.
+        self._admit_script = self._redis.register_script(
+            WINDOW_LUA
+            + """
+local total_key = KEYS[1]
+local cache_key = KEYS[2]
+local lock_key = KEYS[3]
+local negative_key = KEYS[4]
+
+window_add(total_key, tonumber(ARGV[1]), tonumber(ARGV[2]), 1, tonumber(ARGV[3]))
+
+local cached = redis.call("GET", cache_key)
+if cached then
+  return {"hit", cached, redis.call("PTTL", cache_key)}
+end
+local failed = redis.call("GET", negative_key)
+if failed then
+  return {"failed", failed, 0}
+end
+if redis.call("SET", lock_key, ARGV[4], "NX", "EX", ARGV[5]) then
+  return {"lock", "", 0}
+end
+return {"busy", redis.call("GET", lock_key) or "", 0}
+"""
+        )
+        # Lock owner's completion: cache + dedupe result + wakeup + unlock in one round trip.
+        self._publish_script = self._redis.register_script(
+            """
+local cache_key = KEYS[1]
+local result_key = KEYS[2]
+local lock_key = KEYS[3]
+
+redis.call("SET", cache_key, ARGV[1], "EX", ARGV[2])
+redis.call("SET", result_key, ARGV[6], "EX", ARGV[3])
+redis.call("PUBLISH", ARGV[4], ARGV[11])
+
+if ARGV[7] ~= "" then
+  redis.call("ZREMRANGEBYSCORE", KEYS[4], "-inf", ARGV[8])
+  redis.call("ZADD", KEYS[4], ARGV[9], ARGV[10])
+  redis.call("EXPIRE", KEYS[4], ARGV[2])
+  redis.call("SADD", KEYS[5], ARGV[7])
+end
+
+local raw = redis.call("GET", lock_key)
+if raw then
+  local ok, payload = pcall(cjson.decode, raw)
+  if ok and payload["owner"] == ARGV[5] then
+    redis.call("DEL", lock_key)
+  end
+end
+return 1
+"""
+        )
 
     async def close(self) -> None:
+        await self._stop_dedupe_listener()
+        if self.disk_cache is not None:
+            await self.disk_cache.close()
         await self._redis.aclose()
 
     async def ping(self) -> bool:
@@ -74,10 +250,6 @@ return {0, total_count, claude_count, tostring(projected_ratio)}
         except Exception:
             return False
 
-    def build_signature(self, payload: dict[str, Any]) -> str:
-        encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"))
-        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
-
     def _cache_key(self, signature: str) -> str:
         return f"{self.namespace}:cache:{signature}"
 
@@ -87,31 +259,482 @@ return {0, total_count, claude_count, tostring(projected_ratio)}
     def _dedupe_result_key(self, signature: str) -> str:
         return f"{self.namespace}:dedupe:result:{signature}"
 
+    def _dedupe_channel(self, signature: str) -> str:
+        return f"{self.namespace}:dedupe:notify:{signature}"
+
+    def _refresh_lock_key(self, signature: str) -> str:
+        return f"{self.namespace}:refresh:{signature}"
+
+    def _negative_key(self, signature: str) -> str:
+        return f"{self.namespace}:negative:{signature}"
+
+    @property
+    def _generations_key(self) -> str:
+        return f"{self.namespace}:generations"
+
+    def _product_index_key(self, product: str) -> str:
+        return f"{self.namespace}:index:{product}"
+
+    @property
+    def _products_key(self) -> str:
+        return f"{self.namespace}:products"
+
+    @property
+    def _hard_ttl_seconds(self) -> int:
+        return self.cache_ttl_seconds + self.stale_ttl_seconds
+
+    def _encode_entry(self, value: dict[str, Any], compute_ms: int) -> tuple[str, int]:
+        """
+        Returns (encoded, size_bytes) where size_bytes is the uncompressed length.
+        v2 is "2:[soft_expires_ms,compute_ms,value]" as compact JSON, or "2z:" plus
+        base64 zlib of the same once it reaches compress_min_bytes. Base64 keeps the
+        value a str for the decode_responses client and the publish script.
+        """
+        # Soft expiry travels with the value; Redis' own TTL is the hard expiry.
+        soft_expires_ms = int(time.time() * 1000) + self.cache_ttl_seconds * 1000
+        if self.entry_version < 2:
+            envelope = {
+                "value": value,
+                "soft_expires_ms": soft_expires_ms,
+                "compute_ms": max(0, compute_ms),
+            }
+            encoded = json.dumps(envelope, separators=(",", ":"))
+            return encoded, len(encoded)
+        plain = json.dumps(
+            [soft_expires_ms, max(0, compute_ms), value], separators=(",", ":"), ensure_ascii=False
+        )
+        if self.compress_min_bytes and len(plain) >= self.compress_min_bytes:
+            packed = base64.b64encode(zlib.compress(plain.encode("utf-8"))).decode("ascii")
+            if len(packed) + len(_ENTRY_V2_ZLIB) < len(plain):
+                return _ENTRY_V2_ZLIB + packed, len(plain)
+        return _ENTRY_V2 + plain, len(plain)
+
+    def _dedupe_result(self, signature: str, encoded: str) -> str:
+        if self.entry_version < 2:
+            return encoded
+        return _ENTRY_REF + self._cache_key(signature)
+
+    @staticmethod
+    def _decode_entry(raw: str) -> tuple[dict[str, Any], int | None, int, int]:
+        """
+        Returns (value, soft_expires_ms, compute_ms, size_bytes).
+        Raises on anything that is not a cache entry (bad base64 or zlib, wrong shape);
+        callers log it and treat the key as a miss.
+        """
+        decoded = RedisCache._parse_entry(raw)
+        if not isinstance(decoded[0], dict):
+            raise ValueError(f"cache entry holds {type(decoded[0]).__name__}, not an object")
+        return decoded
+
+    @staticmethod
+    def _parse_entry(raw: str) -> tuple[Any, int | None, int, int]:
+        """
+        Also reads the JSON envelope {"value", "soft_expires_ms", "compute_ms"} and plain
+        JSON values written before versioning; plain values have no soft expiry.
+        """
+        if raw.startswith(_ENTRY_V2_ZLIB):
+            plain = zlib.decompress(base64.b64decode(raw[len(_ENTRY_V2_ZLIB):])).decode("utf-8")
+        elif raw.startswith(_ENTRY_V2):
+            plain = raw[len(_ENTRY_V2):]
+        else:
+            data = json.loads(raw)
+            if isinstance(data, dict) and "soft_expires_ms" in data and "value" in data:
+                return (
+                    data["value"],
+                    int(data["soft_expires_ms"]),
+                    int(data.get("compute_ms", 0)),
+                    len(raw),
+                )
+            return data, None, 0, len(raw)
+        soft_expires_ms, compute_ms, value = json.loads(plain)
+        return value, int(soft_expires_ms), int(compute_ms), len(plain)
+
+    def _refresh_due(self, soft_expires_ms: int | None, compute_ms: int, now_ms: int) -> bool:
+        """Stale entries are always due; fresh ones are refreshed early with XFetch probability."""
+        if soft_expires_ms is None:
+            return False
+        if now_ms >= soft_expires_ms:
+            self.stale_hits += 1
+            return True
+        if self.early_refresh_beta <= 0 or compute_ms <= 0:
+            return False
+        gap_ms = -compute_ms * self.early_refresh_beta * math.log(1.0 - random.random())
+        if now_ms + gap_ms >= soft_expires_ms:
+            self.early_refreshes += 1
+            return True
+        return False
+
+    def _read_entry(
+        self, signature: str, raw: str, ttl_ms: int | None
+    ) -> tuple[dict[str, Any], bool]:
+        """Decodes a Redis entry, fills the local tier while it is fresh, and flags refreshes."""
+        value, soft_expires_ms, compute_ms, size_bytes = self._decode_entry(raw)
+        now_ms = int(time.time() * 1000)
+        local_ttl_ms = ttl_ms or 0
+        if soft_expires_ms is not None:
+            local_ttl_ms = min(local_ttl_ms, soft_expires_ms - now_ms)
+        if local_ttl_ms > 0:
+            self.local_cache.set(
+                signature, value, size_bytes=size_bytes, ttl_seconds=local_ttl_ms / 1000
+            )
+        return value, self._refresh_due(soft_expires_ms, compute_ms, now_ms)
+
     @property
     def _total_requests_key(self) -> str:
-        return f"{self.namespace}:metrics:requests:total"
+        return f"{self.namespace}:metrics:window:total"
 
     @property
     def _claude_requests_key(self) -> str:
-        return f"{self.namespace}:metrics:requests:claude"
+        return f"{self.namespace}:metrics:window:claude"
+
+    def _window_args(self) -> list[int]:
+        return [self.window.bucket_at(), self.window.buckets, self.window.ttl_seconds]
+
+    def get_local(self, signature: str) -> dict[str, Any] | None:
+        return self.local_cache.get(signature)
+
+    async def get_cached(self, signature: str, *, use_local: bool = True) -> dict[str, Any] | None:
+        if use_local:
+            local = self.local_cache.get(signature)
+            if local is not None:
+                return local
 
-    async def get_cached(self, signature: str) -> dict[str, Any] | None:
         try:
-            raw = await self._redis.get(self._cache_key(signature))
-            return json.loads(raw) if raw else None
+            # GET and PTTL share one round trip so the local copy never outlives Redis.
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.get(self._cache_key(signature))
+                pipe.pttl(self._cache_key(signature))
+                raw, ttl_ms = await pipe.execute()
         except Exception:
             logger.exception("cache.get_failed")
+            raw = None
+        if raw:
+            try:
+                value, _ = self._read_entry(signature, raw, ttl_ms)
+                return value
+            except Exception:
+                # Corrupt or unknown format: a miss, and the next write replaces it.
+                logger.exception("cache.decode_failed", extra={"signature": signature})
+        return await self._get_from_disk(signature)
+
+    async def set_cached(
+        self,
+        signature: str,
+        value: dict[str, Any],
+        compute_ms: int = 0,
+        *,
+        persist: bool = True,
+        product: str | None = None,
+    ) -> None:
+        encoded, size_bytes = self._encode_entry(value, compute_ms)
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.set(self._cache_key(signature), encoded, ex=self._hard_ttl_seconds)
+                if product:
+                    now_ms = int(time.time() * 1000)
+                    index_key = self._product_index_key(product)
+                    pipe.zremrangebyscore(index_key, "-inf", now_ms)
+                    pipe.zadd(index_key, {signature: now_ms + self._hard_ttl_seconds * 1000})
+                    pipe.expire(index_key, self._hard_ttl_seconds)
+                    pipe.sadd(self._products_key, product)
+                await pipe.execute()
+        except Exception:
+            self.local_cache.invalidate(signature)
+            logger.exception("cache.set_failed")
+            return
+        if persist and self.disk_cache is not None:
+            self.disk_cache.put(signature, value)
+        self.local_cache.set(
+            signature, value, size_bytes=size_bytes, ttl_seconds=self.cache_ttl_seconds
+        )
+
+    async def get_cached_many(
+        self, signatures: list[str], *, refresh_due: list[str] | None = None
+    ) -> dict[str, dict[str, Any]]:
+        """
+        Local tier first, then one MGET for everything it missed.
+        Signatures served stale or picked for early refresh are appended to `refresh_due`.
+        """
+        found: dict[str, dict[str, Any]] = {}
+        remote: list[str] = []
+        for signature in signatures:
+            local = self.local_cache.get(signature)
+            if local is not None:
+                found[signature] = local
+            else:
+                remote.append(signature)
+        if not remote:
+            return found
+
+        try:
+            raws = await self._redis.mget([self._cache_key(signature) for signature in remote])
+        except Exception:
+            logger.exception("cache.get_many_failed")
+            raws = [None] * len(remote)
+        now_ms = int(time.time() * 1000)
+        missing: list[str] = []
+        for signature, raw in zip(remote, raws):
+            if not raw:
+                missing.append(signature)
+                continue
+            try:
+                found[signature], soft_expires_ms, compute_ms, _ = self._decode_entry(raw)
+            except Exception:
+                logger.exception("cache.decode_failed", extra={"signature": signature})
+                missing.append(signature)
+                continue
+            if refresh_due is not None and self._refresh_due(soft_expires_ms, compute_ms, now_ms):
+                refresh_due.append(signature)
+        if missing and self.disk_cache is not None:
+            restored = await self.disk_cache.get_many(missing)
+            if restored:
+                await self._promote_many(restored)
+            found.update(restored)
+        return found
+
+    async def _promote_many(self, restored: dict[str, dict[str, Any]]) -> None:
+        """Writes disk-tier hits back to Redis in one pipeline, then to the local tier."""
+        encoded = {signature: self._encode_entry(value, 0) for signature, value in restored.items()}
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for signature, (entry, _) in encoded.items():
+                    pipe.set(self._cache_key(signature), entry, ex=self._hard_ttl_seconds)
+                await pipe.execute()
+        except Exception:
+            logger.exception("cache.set_failed")
+            return
+        for signature, value in restored.items():
+            self.local_cache.set(
+                signature, value, size_bytes=encoded[signature][1], ttl_seconds=self.cache_ttl_seconds
+            )
+
+    async def admit(
+        self, signature: str, request_id: str, lock_ttl_seconds: int = 35
+    ) -> AdmitResult:
+        """
+        Single round trip replacing record_total_request, get_cached,
+        try_acquire_dedupe_lock and get_dedupe_lock.
+        """
+        now_ms = int(time.time() * 1000)
+        lock_payload = json.dumps({"owner": request_id, "started_ms": now_ms}, separators=(",", ":"))
+        try:
+            outcome, raw, ttl_ms = await self._admit_script(
+                keys=[
+                    self._total_requests_key,
+                    self._cache_key(signature),
+                    self._dedupe_lock_key(signature),
+                    self._negative_key(signature),
+                ],
+                args=[*self._window_args(), lock_payload, lock_ttl_seconds],
+            )
+        except Exception:
+            logger.exception("cache.admit_failed")
+            # Same degradation as the individual calls: no cache, act as lock owner.
+            restored = await self._get_from_disk(signature, promote=False)
+            return AdmitResult(cached=restored, lock_acquired=restored is None, lock=None)
+
+        try:
+            if outcome == "hit":
+                value, refresh_due = self._read_entry(signature, raw, int(ttl_ms))
+                return AdmitResult(
+                    cached=value, lock_acquired=False, lock=None, refresh_due=refresh_due
+                )
+            if outcome == "failed":
+                failure = self._read_failure(signature, raw)
+                return AdmitResult(cached=None, lock_acquired=False, lock=None, failure=failure)
+        except Exception:
+            logger.exception("cache.decode_failed", extra={"signature": signature})
+            # The script stopped before the lock; taking it here lets this request
+            # recompute and overwrite the bad value instead of every request failing on it.
+            acquired = await self.try_acquire_dedupe_lock(signature, request_id, lock_ttl_seconds)
+            return AdmitResult(cached=None, lock_acquired=acquired, lock=None)
+        if outcome == "lock":
+            restored = await self._get_from_disk(signature, promote=False)
+            if restored is not None:
+                # Put it back into Redis and hand the lock straight back to any waiters.
+                await self.publish_result(signature, restored, request_id, persist=False)
+                return AdmitResult(cached=restored, lock_acquired=False, lock=None)
+            return AdmitResult(cached=None, lock_acquired=True, lock=None)
+        restored = await self._get_from_disk(signature, promote=False)
+        if restored is not None:
+            return AdmitResult(cached=restored, lock_acquired=False, lock=None)
+        return AdmitResult(cached=None, lock_acquired=False, lock=self._read_lock(raw))
+
+    @staticmethod
+    def _read_lock(raw: str) -> dict[str, Any] | None:
+        """A lock we cannot read is treated as absent; the caller then computes on its own."""
+        if not raw:
             return None
+        try:
+            lock = json.loads(raw)
+        except ValueError:
+            logger.exception("dedupe.lock_decode_failed")
+            return None
+        return lock if isinstance(lock, dict) else None
 
-    async def set_cached(self, signature: str, value: dict[str, Any]) -> None:
+    async def publish_result(
+        self,
+        signature: str,
+        value: dict[str, Any],
+        owner_id: str,
+        dedupe_ttl_seconds: int = 35,
+        compute_ms: int = 0,
+        *,
+        persist: bool = True,
+        product: str | None = None,
+    ) -> None:
+        """
+        Single round trip replacing set_cached, set_dedupe_result and release_dedupe_lock.
+        The dedupe result only references the cache entry instead of holding a second copy.
+        With a product, the entry is also counted in that product's size index.
+        """
+        encoded, size_bytes = self._encode_entry(value, compute_ms)
+        now_ms = int(time.time() * 1000)
         try:
-            await self._redis.set(
-                self._cache_key(signature),
-                json.dumps(value, separators=(",", ":")),
-                ex=self.cache_ttl_seconds,
+            await self._publish_script(
+                keys=[
+                    self._cache_key(signature),
+                    self._dedupe_result_key(signature),
+                    self._dedupe_lock_key(signature),
+                    self._product_index_key(product or ""),
+                    self._products_key,
+                ],
+                args=[
+                    encoded,
+                    self._hard_ttl_seconds,
+                    dedupe_ttl_seconds,
+                    self._dedupe_channel(signature),
+                    owner_id,
+                    self._dedupe_result(signature, encoded),
+                    product or "",
+                    now_ms,
+                    now_ms + self._hard_ttl_seconds * 1000,
+                    signature,
+                    _DEDUPE_NOTIFY,
+                ],
             )
         except Exception:
-            logger.exception("cache.set_failed")
+            self.local_cache.invalidate(signature)
+            logger.exception("cache.publish_failed")
+            # The lock must not outlive a failed publish.
+            await self.release_dedupe_lock(signature, owner_id)
+            return
+        if persist and self.disk_cache is not None:
+            self.disk_cache.put(signature, value)
+        self.local_cache.set(
+            signature, value, size_bytes=size_bytes, ttl_seconds=self.cache_ttl_seconds
+        )
+
+    async def _get_from_disk(
+        self, signature: str, *, promote: bool = True
+    ) -> dict[str, Any] | None:
+        """Redis missed; the disk tier may still have it. Hits are written back to Redis."""
+        if self.disk_cache is None:
+            return None
+        value = await self.disk_cache.get(signature)
+        if value is not None and promote:
+            await self.set_cached(signature, value, persist=False)
+        return value
+
+    async def get_generations(self) -> dict[str, int]:
+        raw = await self._redis.hgetall(self._generations_key)
+        return {field: int(value) for field, value in raw.items()}
+
+    async def bump_generation(self, field: str) -> int:
+        return int(await self._redis.hincrby(self._generations_key, field, 1))
+
+    async def cache_sizes(self) -> dict[str, int]:
+        """Live entries per product, from the sorted-set index written alongside each entry."""
+        now_ms = int(time.time() * 1000)
+        products = sorted(await self._redis.smembers(self._products_key))
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for product in products:
+                pipe.zremrangebyscore(self._product_index_key(product), "-inf", now_ms)
+                pipe.zcard(self._product_index_key(product))
+            results = await pipe.execute()
+        return {product: int(count) for product, count in zip(products, results[1::2])}
+
+    def disk_stats(self) -> dict[str, Any]:
+        if self.disk_cache is None:
+            return {"enabled": False}
+        return self.disk_cache.stats()
+
+    def get_local_failure(self, signature: str) -> dict[str, Any] | None:
+        failure = self.negative_local.get(signature)
+        if failure is not None:
+            self.negative_local_hits += 1
+        return failure
+
+    async def set_failure(
+        self, signature: str, status_code: int, detail: Any, *, notify: bool = False
+    ) -> dict[str, Any] | None:
+        """
+        Remembers that every provider failed for this signature for negative_ttl_seconds.
+        With `notify` (the caller held the dedupe lock, so there may be waiters) remote
+        dedupe waiters are woken to read the failure instead of retrying.
+        """
+        if not self.negative_ttl_seconds:
+            return None
+        failure = {
+            "status_code": status_code,
+            "detail": detail,
+            "expires_ms": int(time.time() * 1000) + self.negative_ttl_seconds * 1000,
+        }
+        encoded = json.dumps({"failure": failure}, separators=(",", ":"), default=str)
+        self.negative_local.set(signature, failure, size_bytes=len(encoded))
+        self.negative_stored += 1
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.set(self._negative_key(signature), encoded, ex=self.negative_ttl_seconds)
+                if notify:
+                    pipe.publish(self._dedupe_channel(signature), _DEDUPE_NOTIFY)
+                await pipe.execute()
+        except Exception:
+            logger.exception("cache.negative_set_failed")
+        return failure
+
+    def _read_failure(self, signature: str, raw: str) -> dict[str, Any]:
+        failure = json.loads(raw)["failure"]
+        self.negative_remote_hits += 1
+        ttl_seconds = (int(failure["expires_ms"]) - int(time.time() * 1000)) / 1000
+        if ttl_seconds > 0:
+            self.negative_local.set(
+                signature, failure, size_bytes=len(raw), ttl_seconds=ttl_seconds
+            )
+        return failure
+
+    def negative_stats(self) -> dict[str, Any]:
+        return {
+            "ttl_seconds": self.negative_ttl_seconds,
+            "stored": self.negative_stored,
+            "local_hits": self.negative_local_hits,
+            "remote_hits": self.negative_remote_hits,
+            "local_entries": len(self.negative_local),
+        }
+
+    async def claim_refresh(self, signature: str, ttl_seconds: int = 35) -> bool:
+        """One refresher per signature across processes; the claim expires on its own."""
+        try:
+            return bool(
+                await self._redis.set(self._refresh_lock_key(signature), "1", nx=True, ex=ttl_seconds)
+            )
+        except Exception:
+            logger.exception("cache.refresh_claim_failed")
+            return False
+
+    async def release_refresh(self, signature: str) -> None:
+        try:
+            await self._redis.delete(self._refresh_lock_key(signature))
+        except Exception:
+            logger.exception("cache.refresh_release_failed")
+
+    def refresh_stats(self) -> dict[str, Any]:
+        return {
+            "stale_ttl_seconds": self.stale_ttl_seconds,
+            "early_refresh_beta": self.early_refresh_beta,
+            "stale_hits": self.stale_hits,
+            "early_refreshes": self.early_refreshes,
+        }
 
     async def try_acquire_dedupe_lock(
         self, signature: str, owner_id: str, lock_ttl_seconds: int = 35
@@ -135,7 +758,7 @@ return {0, total_count, claude_count, tostring(projected_ratio)}
     async def get_dedupe_lock(self, signature: str) -> dict[str, Any] | None:
         try:
             raw = await self._redis.get(self._dedupe_lock_key(signature))
-            return json.loads(raw) if raw else None
+            return self._read_lock(raw)
         except Exception:
             logger.exception("dedupe.lock_get_failed")
             return None
@@ -150,26 +773,19 @@ return {0, total_count, claude_count, tostring(projected_ratio)}
     async def try_reserve_claude_request(
         self, request_id: str
     ) -> tuple[bool, int, int, float, str | None]:
-        now_ms = int(time.time() * 1000)
-        cutoff_ms = int((time.time() - self.claude_window_seconds) * 1000)
-        reservation_member = f"{now_ms}:{request_id}"
-        try:
-            result = await self._redis.eval(
-                self._claude_reserve_script,
-                2,
-                self._total_requests_key,
-                self._claude_requests_key,
-                str(now_ms),
-                str(cutoff_ms),
-                str(self.claude_cap_ratio),
-                reservation_member,
+        bucket, buckets, ttl_seconds = self._window_args()
+        try:
+            result = await self._claude_reserve_script(
+                keys=[self._total_requests_key, self._claude_requests_key],
+                args=[bucket, buckets, ttl_seconds, str(self.claude_cap_ratio)],
             )
             allowed = bool(int(result[0]))
             total_count = int(result[1])
             claude_count = int(result[2])
             projected_ratio = float(result[3])
+            # The reservation is identified by its bucket so a release decrements the right slot.
             return allowed, total_count, claude_count, projected_ratio, (
-                reservation_member if allowed else None
+                str(bucket) if allowed else None
             )
         except Exception:
             logger.exception("claude.reserve_failed")
@@ -177,55 +793,204 @@ return {0, total_count, claude_count, tostring(projected_ratio)}
 
     async def release_claude_reservation(self, reservation_member: str) -> None:
         try:
-            await self._redis.zrem(self._claude_requests_key, reservation_member)
+            await self._window_remove_script(
+                keys=[self._claude_requests_key], args=[int(reservation_member), 1]
+            )
         except Exception:
             logger.exception("claude.release_reservation_failed")
 
+    async def lease_claude_requests(
+        self,
+        requested: int,
+        *,
+        cap_ratio: float | None = None,
+        return_bucket: str | None = None,
+        return_count: int = 0,
+    ) -> tuple[int, int, int, float, str]:
+        """
+        Reserves up to `requested` Claude calls in one go for local spending.
+        Returns (granted, total_count, claude_count, projected_ratio, bucket).
+        """
+        bucket, buckets, ttl_seconds = self._window_args()
+        try:
+            result = await self._claude_lease_script(
+                keys=[self._total_requests_key, self._claude_requests_key],
+                args=[
+                    bucket,
+                    buckets,
+                    ttl_seconds,
+                    str(self.claude_cap_ratio if cap_ratio is None else cap_ratio),
+                    requested,
+                    int(return_bucket or 0),
+                    return_count if return_bucket else 0,
+                ],
+            )
+            return int(result[0]), int(result[1]), int(result[2]), float(result[3]), str(bucket)
+        except Exception:
+            logger.exception("claude.lease_failed")
+            return 0, 0, 0, 0.0, str(bucket)
+
+    async def return_claude_requests(self, bucket: str, count: int) -> None:
+        if count <= 0:
+            return
+        try:
+            await self._window_remove_script(
+                keys=[self._claude_requests_key], args=[int(bucket), count]
+            )
+        except Exception:
+            logger.exception("claude.lease_return_failed")
+
     async def set_dedupe_result(
         self, signature: str, value: dict[str, Any], ttl_seconds: int = 35
     ) -> None:
+        """Points the dedupe result at the entry set_cached wrote; waiters get the value by pub/sub."""
+        encoded, _ = self._encode_entry(value, 0)
+        result = self._dedupe_result(signature, encoded)
         try:
-            await self._redis.set(
-                self._dedupe_result_key(signature),
-                json.dumps(value, separators=(",", ":")),
-                ex=ttl_seconds,
-            )
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.set(self._dedupe_result_key(signature), result, ex=ttl_seconds)
+                pipe.publish(self._dedupe_channel(signature), _DEDUPE_NOTIFY)
+                await pipe.execute()
         except Exception:
             logger.exception("dedupe.result_set_failed")
 
     async def wait_for_dedupe_result(
-        self, signature: str, timeout_ms: int, poll_ms: int = 25
+        self,
+        signature: str,
+        timeout_ms: int,
+        poll_ms: int = 25,
+        fallback_poll_ms: int = 1000,
     ) -> dict[str, Any] | None:
+        """
+        Wait for the lock owner's result; {"failure": ...} when the owner failed on every provider.
+        Wakes on the per-signature notification and re-reads the keys; polling only runs as a fallback,
+        every `fallback_poll_ms` while subscribed or every `poll_ms` when pub/sub is unavailable.
+        """
         deadline = time.monotonic() + (timeout_ms / 1000)
-        cache_key = self._cache_key(signature)
-        result_key = self._dedupe_result_key(signature)
-        while time.monotonic() < deadline:
+        waiter = registered = await self._register_dedupe_waiter(signature)
+        interval = (poll_ms if waiter is None else fallback_poll_ms) / 1000
+        try:
+            while True:
+                # Checked after subscribing so a result published in between is never missed.
+                try:
+                    cached_raw, dedupe_raw, failed_raw = await self._redis.mget(
+                        self._cache_key(signature),
+                        self._dedupe_result_key(signature),
+                        self._negative_key(signature),
+                    )
+                    if cached_raw:
+                        return self._decode_entry(cached_raw)[0]
+                    # A reference whose cache entry is gone has nothing left to return.
+                    if dedupe_raw and not dedupe_raw.startswith(_ENTRY_REF):
+                        return self._decode_entry(dedupe_raw)[0]
+                    if failed_raw:
+                        return {"failure": self._read_failure(signature, failed_raw)}
+                except Exception:
+                    logger.exception("dedupe.wait_failed")
+                    return None
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                if waiter is not None and not self._dedupe_listener_alive():
+                    interval = poll_ms / 1000
+                    waiter = None
+                if waiter is None:
+                    await asyncio.sleep(min(interval, remaining))
+                    continue
+                try:
+                    await asyncio.wait_for(asyncio.shield(waiter), min(interval, remaining))
+                except asyncio.TimeoutError:
+                    continue
+                # Re-armed before the re-read, so a write landing in between still wakes us.
+                self._unregister_dedupe_waiter(signature, registered)
+                waiter = registered = await self._register_dedupe_waiter(signature)
+                if waiter is None:
+                    interval = poll_ms / 1000
+        finally:
+            if registered is not None:
+                self._unregister_dedupe_waiter(signature, registered)
+
+    async def _register_dedupe_waiter(self, signature: str) -> asyncio.Future | None:
+        if not self.dedupe_notify_enabled or not await self._ensure_dedupe_listener():
+            return None
+        waiter = asyncio.get_running_loop().create_future()
+        self._dedupe_waiters.setdefault(signature, set()).add(waiter)
+        return waiter
+
+    def _unregister_dedupe_waiter(self, signature: str, waiter: asyncio.Future) -> None:
+        waiters = self._dedupe_waiters.get(signature)
+        if waiters is None:
+            return
+        waiters.discard(waiter)
+        if not waiters:
+            self._dedupe_waiters.pop(signature, None)
+
+    def _dedupe_listener_alive(self) -> bool:
+        return self._dedupe_listener is not None and not self._dedupe_listener.done()
+
+    async def _ensure_dedupe_listener(self) -> bool:
+        if self._dedupe_listener_alive():
+            return True
+        async with self._dedupe_listener_lock:
+            if self._dedupe_listener_alive():
+                return True
             try:
-                cached_raw = await self._redis.get(cache_key)
-                if cached_raw:
-                    return json.loads(cached_raw)
-                dedupe_raw = await self._redis.get(result_key)
-                if dedupe_raw:
-                    return json.loads(dedupe_raw)
+                # One pattern subscription per process instead of a connection per waiter.
+                pubsub = self._redis.pubsub()
+                await pubsub.psubscribe(self._dedupe_channel("*"))
             except Exception:
-                logger.exception("dedupe.wait_failed")
-                return None
-            await asyncio.sleep(poll_ms / 1000)
-        return None
+                logger.exception("dedupe.subscribe_failed")
+                return False
+            self._dedupe_pubsub = pubsub
+            self._dedupe_listener = asyncio.create_task(self._listen_dedupe(pubsub))
+            return True
+
+    async def _listen_dedupe(self, pubsub: Any) -> None:
+        prefix = self._dedupe_channel("")
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") != "pmessage":
+                    continue
+                signature = str(message["channel"])[len(prefix):]
+                # Any payload is only a wake-up; waiters stay registered until they re-arm.
+                for waiter in self._dedupe_waiters.get(signature, ()):
+                    if not waiter.done():
+                        waiter.set_result(None)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Waiters keep falling back to polling; the next wait re-subscribes.
+            logger.exception("dedupe.listener_failed")
+
+    async def _stop_dedupe_listener(self) -> None:
+        if self._dedupe_listener is not None:
+            self._dedupe_listener.cancel()
+            await asyncio.gather(self._dedupe_listener, return_exceptions=True)
+            self._dedupe_listener = None
+        if self._dedupe_pubsub is not None:
+            try:
+                await self._dedupe_pubsub.aclose()
+            except Exception:
+                logger.exception("dedupe.unsubscribe_failed")
+            self._dedupe_pubsub = None
 
     async def record_total_request(self, request_id: str) -> None:
-        await self._record_metric(self._total_requests_key, request_id)
+        await self._record_metric(self._total_requests_key, 1)
+
+    async def record_total_requests(self, request_ids: list[str]) -> None:
+        await self._record_metric(self._total_requests_key, len(request_ids))
 
     async def record_claude_request(self, request_id: str) -> None:
-        await self._record_metric(self._claude_requests_key, request_id)
+        await self._record_metric(self._claude_requests_key, 1)
 
     async def can_use_claude(self) -> tuple[bool, int, int, float]:
         try:
-            await self._trim_metrics(self._total_requests_key)
-            await self._trim_metrics(self._claude_requests_key)
-
-            total_count = int(await self._redis.zcard(self._total_requests_key))
-            claude_count = int(await self._redis.zcard(self._claude_requests_key))
+            total_count, claude_count = await self._window_read_script(
+                keys=[self._total_requests_key, self._claude_requests_key], args=self._window_args()
+            )
+            total_count = int(total_count)
+            claude_count = int(claude_count)
 
             if total_count == 0:
                 return False, total_count, claude_count, 0.0
@@ -236,18 +1001,10 @@ return {0, total_count, claude_count, tostring(projected_ratio)}
             logger.exception("claude.cap_check_failed")
             return False, 0, 0, 0.0
 
-    async def _record_metric(self, key: str, request_id: str) -> None:
-        now_ms = int(time.time() * 1000)
-        member = f"{now_ms}:{request_id}"
+    async def _record_metric(self, key: str, amount: int) -> None:
+        if amount <= 0:
+            return
         try:
-            await self._redis.zadd(key, {member: now_ms})
-            await self._trim_metrics(key)
+            await self._window_add_script(keys=[key], args=[*self._window_args(), amount])
         except Exception:
             logger.exception("metrics.record_failed")
-
-    async def _trim_metrics(self, key: str) -> None:
-        cutoff_ms = int((time.time() - self.claude_window_seconds) * 1000)
-        try:
-            await self._redis.zremrangebyscore(key, 0, cutoff_ms)
-        except Exception:
-            logger.exception("metrics.trim_failed")
@@ -1,27 +1,63 @@
+import asyncio
+import json
 import logging
 import os
 import time
-from typing import Any
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable
 
 from fastapi import HTTPException, status
 
 try:
-    from .circuit_breaker import CircuitBreaker
+    from .admission import AdmissionController, AdmissionRejected
+    from .circuit_breaker import CircuitBreakerRegistry, is_breaker_failure
+    from .claude_budget import ClaudeBudget
     from .classifier import RequestClassifier
+    from .coalescer import RequestCoalescer
+    from .config import parse_limits
+    from .deadline import Deadline
+    from .disk_cache import DiskResultCache
+    from .generations import CacheGenerations
+    from .hedging import HedgePolicy
+    from .local_cache import LocalResultCache
     from .memory_guard import MemoryGuard
-    from .providers import ProviderClients, ProviderError
+    from .metrics import Counter, Gauge, RouterMetrics
+    from .providers import DeadlineExceeded, ProviderClients, ProviderError, ProviderThrottled
+    from .rate_limit import RateLimitShaper
     from .redis_cache import RedisCache
+    from .server_timing import ServerTiming
+    from .signature import SignatureBuilder
+    from .similarity_cache import SimilarityCache
 except ImportError:
-    from circuit_breaker import CircuitBreaker
+    from admission import AdmissionController, AdmissionRejected
+    from circuit_breaker import CircuitBreakerRegistry, is_breaker_failure
+    from claude_budget import ClaudeBudget
     from classifier import RequestClassifier
+    from coalescer import RequestCoalescer
+    from config import parse_limits
+    from deadline import Deadline
+    from disk_cache import DiskResultCache
+    from generations import CacheGenerations
+    from hedging import HedgePolicy
+    from local_cache import LocalResultCache
     from memory_guard import MemoryGuard
-    from providers import ProviderClients, ProviderError
+    from metrics import Counter, Gauge, RouterMetrics
+    from providers import DeadlineExceeded, ProviderClients, ProviderError, ProviderThrottled
+    from rate_limit import RateLimitShaper
     from redis_cache import RedisCache
+    from server_timing import ServerTiming
+    from signature import SignatureBuilder
+    from similarity_cache import SimilarityCache
 
 
 logger = logging.getLogger(__name__)
 
 
+def _is_breaker_failure(exc: BaseException) -> bool:
+    # Shaped-away calls never reached the provider; deadline cut-offs are our budget running out.
+    return not isinstance(exc, (ProviderThrottled, DeadlineExceeded)) and is_breaker_failure(exc)
+
+
 class InferenceRouter:
     _PRODUCT_INPUT_TOKEN_CEILINGS = {
         "synqra": 1500,
@@ -35,24 +71,48 @@ class InferenceRouter:
         *,
         providers: ProviderClients,
         classifier: RequestClassifier,
-        breaker: CircuitBreaker,
         memory_guard: MemoryGuard,
         redis_cache: RedisCache,
         global_timeout_seconds: int = 30,
         dedupe_window_ms: int = 100,
+        coalescer: RequestCoalescer | None = None,
+        batch_max_concurrency: int = 8,
+        claude_budget: ClaudeBudget | None = None,
+        hedging: HedgePolicy | None = None,
+        breakers: CircuitBreakerRegistry | None = None,
+        signatures: SignatureBuilder | None = None,
+        similarity: SimilarityCache | None = None,
+        generations: CacheGenerations | None = None,
+        metrics: RouterMetrics | None = None,
+        admission: AdmissionController | None = None,
     ) -> None:
         self.providers = providers
         self.classifier = classifier
-        self.breaker = breaker
         self.memory_guard = memory_guard
         self.redis_cache = redis_cache
         self.global_timeout_seconds = global_timeout_seconds
         self.dedupe_window_ms = dedupe_window_ms
+        self.coalescer = coalescer or RequestCoalescer()
+        self.batch_max_concurrency = max(1, batch_max_concurrency)
+        self.claude_budget = claude_budget or ClaudeBudget(redis_cache, lease_size=0)
+        self.hedging = hedging or HedgePolicy()
+        self.breakers = breakers or CircuitBreakerRegistry(is_failure=_is_breaker_failure)
+        self.signatures = signatures or SignatureBuilder()
+        self.similarity = similarity if similarity is not None else SimilarityCache()
+        self.generations = generations or CacheGenerations(redis_cache)
+        self.metrics = metrics or RouterMetrics()
+        self.admission = admission or AdmissionController()
+        self.metrics.registry.add_collector(self._collect_metrics)
+        self._background_tasks: set[asyncio.Task] = set()
+        self._refreshing: set[str] = set()
+        self.cache_refreshes = 0
+        self.cache_refresh_failures = 0
 
     @classmethod
     def from_env(cls) -> "InferenceRouter":
         groq_timeout_seconds = float(os.getenv("GROQ_TIMEOUT_SECONDS", "8"))
         global_timeout_seconds = int(os.getenv("GLOBAL_TIMEOUT_SECONDS", "30"))
+        metrics = RouterMetrics()
 
         providers = ProviderClients(
             groq_api_key=os.getenv("GROQ_API_KEY"),
@@ -65,92 +125,645 @@ class InferenceRouter:
             claude_model=os.getenv("CLAUDE_MODEL", "claude-3-5-sonnet-20241022"),
             kie_api_key=os.getenv("KIE_API_KEY"),
             kie_base_url=os.getenv("KIE_BASE_URL", "https://api.kie.ai"),
+            max_concurrency=parse_limits(os.getenv("PROVIDER_MAX_CONCURRENCY", "")),
+            initial_concurrency=parse_limits(os.getenv("PROVIDER_INITIAL_CONCURRENCY", "")),
+            groq_shaper=RateLimitShaper(
+                enabled=os.getenv("GROQ_SHAPER_ENABLED", "true").lower() == "true",
+                max_defer_seconds=int(os.getenv("GROQ_SHAPER_MAX_DEFER_MS", "1000")) / 1000,
+                reserve_requests=int(os.getenv("GROQ_SHAPER_RESERVE_REQUESTS", "1")),
+                reserve_tokens=int(os.getenv("GROQ_SHAPER_RESERVE_TOKENS", "0")),
+            ),
+            on_queue_wait=metrics.observe_queue_wait,
         )
         classifier = RequestClassifier()
-        breaker = CircuitBreaker(
-            threshold_429=int(os.getenv("GROQ_429_BREAKER_THRESHOLD", "2")),
+        slow_call_ms = parse_limits(os.getenv("BREAKER_SLOW_CALL_MS", ""))
+        breaker_overrides: dict[str, dict[str, Any]] = {
+            name: {"slow_call_seconds": value / 1000} for name, value in slow_call_ms.items()
+        }
+        breaker_overrides.setdefault("groq", {}).update(
+            rate_limit_threshold=int(os.getenv("GROQ_429_BREAKER_THRESHOLD", "2")),
             open_seconds=int(os.getenv("GROQ_429_BREAKER_OPEN_SECONDS", "60")),
         )
-        memory_guard = MemoryGuard(min_free_mb=int(os.getenv("MIN_FREE_RAM_MB", "500")))
+        breakers = CircuitBreakerRegistry(
+            breaker_overrides,
+            window_seconds=int(os.getenv("BREAKER_WINDOW_SECONDS", "30")),
+            min_calls=int(os.getenv("BREAKER_MIN_CALLS", "10")),
+            error_rate_threshold=float(os.getenv("BREAKER_ERROR_RATE", "0.5")),
+            slow_call_rate_threshold=float(os.getenv("BREAKER_SLOW_CALL_RATE", "0.8")),
+            open_seconds=int(os.getenv("BREAKER_OPEN_SECONDS", "30")),
+            half_open_probes=int(os.getenv("BREAKER_HALF_OPEN_PROBES", "1")),
+            is_failure=_is_breaker_failure,
+        )
+        recover_free_mb = os.getenv("MEMORY_RECOVER_FREE_MB", "")
+        memory_guard = MemoryGuard(
+            min_free_mb=int(os.getenv("MIN_FREE_RAM_MB", "500")),
+            recover_free_mb=int(recover_free_mb) if recover_free_mb else None,
+            sample_interval_seconds=int(os.getenv("MEMORY_SAMPLE_INTERVAL_MS", "500")) / 1000,
+        )
+        disk_cache_path = os.getenv("DISK_CACHE_PATH", "")
+        disk_cache = (
+            DiskResultCache(
+                disk_cache_path,
+                max_bytes=int(os.getenv("DISK_CACHE_MAX_BYTES", str(512 * 1024 * 1024))),
+                ttl_seconds=float(os.getenv("DISK_CACHE_TTL_SECONDS", "86400")),
+            )
+            if disk_cache_path
+            else None
+        )
         redis_cache = RedisCache(
             redis_url=os.getenv("REDIS_URL", "redis://localhost:6379/0"),
             cache_ttl_seconds=int(os.getenv("CACHE_TTL_SECONDS", "300")),
             claude_cap_ratio=float(os.getenv("CLAUDE_CAP_RATIO", "0.01")),
             claude_window_seconds=int(os.getenv("CLAUDE_ROLLING_WINDOW_SECONDS", "3600")),
+            claude_window_bucket_seconds=int(os.getenv("CLAUDE_WINDOW_BUCKET_SECONDS", "60")),
             namespace=os.getenv("REDIS_NAMESPACE", "synqra:inference"),
+            local_cache=LocalResultCache(
+                max_entries=int(os.getenv("L1_CACHE_MAX_ENTRIES", "2048")),
+                max_bytes=int(os.getenv("L1_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+                ttl_seconds=float(os.getenv("L1_CACHE_TTL_SECONDS", "60")),
+            ),
+            dedupe_notify_enabled=os.getenv("DEDUPE_NOTIFY_ENABLED", "true").lower() == "true",
+            stale_ttl_seconds=int(os.getenv("CACHE_STALE_TTL_SECONDS", "60")),
+            early_refresh_beta=float(os.getenv("CACHE_EARLY_REFRESH_BETA", "1.0")),
+            negative_ttl_seconds=int(os.getenv("NEGATIVE_CACHE_TTL_SECONDS", "5")),
+            compress_min_bytes=int(os.getenv("CACHE_COMPRESS_MIN_BYTES", "1024")),
+            entry_version=int(os.getenv("CACHE_ENTRY_VERSION", "2")),
+            disk_cache=disk_cache,
+        )
+        similarity = SimilarityCache(
+            enabled=os.getenv("SIMILARITY_CACHE_ENABLED", "false").lower() == "true",
+            default_threshold=float(os.getenv("SIMILARITY_THRESHOLD", "0.85")),
+            thresholds=parse_limits(os.getenv("SIMILARITY_THRESHOLDS", ""), float),
+            max_entries=int(os.getenv("SIMILARITY_MAX_ENTRIES", "10000")),
+            ttl_seconds=redis_cache.cache_ttl_seconds + redis_cache.stale_ttl_seconds,
+            min_tokens=int(os.getenv("SIMILARITY_MIN_TOKENS", "4")),
         )
         return cls(
             providers=providers,
             classifier=classifier,
-            breaker=breaker,
             memory_guard=memory_guard,
             redis_cache=redis_cache,
             global_timeout_seconds=global_timeout_seconds,
             dedupe_window_ms=int(os.getenv("DEDUPE_WINDOW_MS", "100")),
+            coalescer=RequestCoalescer(
+                enabled=os.getenv("LOCAL_COALESCE_ENABLED", "true").lower() == "true"
+            ),
+            batch_max_concurrency=int(os.getenv("BATCH_MAX_CONCURRENCY", "8")),
+            claude_budget=ClaudeBudget(
+                redis_cache,
+                lease_size=int(os.getenv("CLAUDE_LEASE_SIZE", "5")),
+                lease_seconds=float(os.getenv("CLAUDE_LEASE_SECONDS", "30")),
+                tolerance=float(os.getenv("CLAUDE_LEASE_TOLERANCE", "0")),
+            ),
+            hedging=HedgePolicy(
+                enabled=os.getenv("HEDGE_ENABLED", "false").lower() == "true",
+                percentile=float(os.getenv("HEDGE_PERCENTILE", "0.95")),
+                min_delay_seconds=int(os.getenv("HEDGE_MIN_DELAY_MS", "250")) / 1000,
+                max_delay_seconds=min(
+                    groq_timeout_seconds, int(os.getenv("HEDGE_MAX_DELAY_MS", "4000")) / 1000
+                ),
+                max_hedge_ratio=float(os.getenv("HEDGE_MAX_RATIO", "0.1")),
+            ),
+            breakers=breakers,
+            signatures=SignatureBuilder.from_json(os.getenv("SIGNATURE_SCHEMAS", "")),
+            similarity=similarity,
+            generations=CacheGenerations(
+                redis_cache,
+                refresh_seconds=float(os.getenv("CACHE_GENERATION_REFRESH_SECONDS", "1")),
+            ),
+            metrics=metrics,
+            admission=AdmissionController(
+                enabled=os.getenv("ADMISSION_ENABLED", "true").lower() == "true",
+                max_concurrency=int(os.getenv("ADMISSION_MAX_CONCURRENCY", "128")),
+                max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "256")),
+                priorities=parse_limits(os.getenv("ADMISSION_PRIORITIES", "")) or None,
+            ),
         )
 
+    async def start(self) -> None:
+        """Loads state the request path needs before the first request is served."""
+        await self.generations.refresh()
+
     async def close(self) -> None:
+        if self._background_tasks:
+            await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        await self.generations.close()
+        await self.memory_guard.close()
+        await self.claude_budget.close()
         await self.providers.close()
         await self.redis_cache.close()
 
-    async def route_request(self, payload: dict[str, Any], request_id: str) -> dict[str, Any]:
+    async def route_request(
+        self, payload: dict[str, Any], request_id: str, deadline: Deadline | None = None
+    ) -> dict[str, Any]:
+        deadline = deadline or Deadline(self.global_timeout_seconds)
+        started = time.perf_counter()
+        source = "error"
+        self.metrics.requests_in_flight.inc()
+        try:
+            with self.metrics.stage("memory_guard"):
+                self.memory_guard.enforce()
+            self._enforce_input_token_ceiling(payload)
+
+            with self.metrics.stage("signature"):
+                signature = self._signature(payload)
+
+            with self.metrics.stage("local_cache"):
+                local = self.redis_cache.get_local(signature)
+            if local is not None:
+                source = "local_cache"
+                # The Claude cap still needs this request in its denominator, just not on the hot path.
+                self._spawn_background(self.redis_cache.record_total_request(request_id))
+                return self._build_response(request_id, local, cached=True, deduped=False)
+
+            waited = time.perf_counter()
+            (base_result, source), coalesced = await self.coalescer.run(
+                signature, lambda: self._resolve(payload, signature, request_id, deadline)
+            )
+            if coalesced:
+                self.metrics.dedupe.labels("local").inc()
+                self.metrics.observe_stage("coalesce_wait", time.perf_counter() - waited)
+                self._spawn_background(self.redis_cache.record_total_request(request_id))
+            return self._build_response(
+                request_id,
+                base_result,
+                cached=source == "cache",
+                deduped=source == "dedupe" or (coalesced and source != "cache"),
+            )
+        finally:
+            self.metrics.requests_in_flight.dec()
+            self.metrics.request_seconds.labels(source).observe(time.perf_counter() - started)
+
+    def route_batch(
+        self, payloads: list[dict[str, Any]], request_id: str, deadline: Deadline | None = None
+    ) -> AsyncIterator[tuple[int, dict[str, Any]]]:
+        """
+        Yields (index, {"response": ...} | {"error": ...}) as items complete.
+        Identical items are collapsed by signature, cache hits are served from one
+        multi-key lookup, and misses fan out at most batch_max_concurrency at a time.
+        The memory guard is checked on the call itself, before any result is streamed.
+        """
         self.memory_guard.enforce()
-        self._enforce_input_token_ceiling(payload)
-        await self.redis_cache.record_total_request(request_id)
+        return self._route_batch(payloads, request_id, deadline or Deadline(self.global_timeout_seconds))
 
-        signature_payload = {
-            "product": payload.get("product", ""),
-            "prompt": payload.get("prompt", ""),
-            "media_url": payload.get("media_url", ""),
-            "metadata": payload.get("metadata") or {},
-        }
-        signature = self.redis_cache.build_signature(signature_payload)
+    async def _route_batch(
+        self, payloads: list[dict[str, Any]], request_id: str, deadline: Deadline
+    ) -> AsyncIterator[tuple[int, dict[str, Any]]]:
+        groups: dict[str, list[int]] = {}
+        for index, payload in enumerate(payloads):
+            try:
+                self._enforce_input_token_ceiling(payload)
+            except HTTPException as exc:
+                yield index, self._batch_error(exc)
+                continue
+            groups.setdefault(self._signature(payload), []).append(index)
 
-        cached = await self.redis_cache.get_cached(signature)
-        if cached is not None:
-            return self._build_response(request_id, cached, cached=True, deduped=False)
+        refresh_due: list[str] = []
+        cached = await self.redis_cache.get_cached_many(list(groups), refresh_due=refresh_due)
+        for signature in refresh_due:
+            self._schedule_refresh(payloads[groups[signature][0]], signature, request_id)
+        # Misses are counted by admit(); everything else still feeds the Claude cap denominator.
+        unrecorded = [
+            f"{request_id}:{index}"
+            for signature, indices in groups.items()
+            for index in (indices if signature in cached else indices[1:])
+        ]
+        if unrecorded:
+            self._spawn_background(self.redis_cache.record_total_requests(unrecorded))
+
+        for signature, value in cached.items():
+            for index in groups[signature]:
+                yield index, {
+                    "response": self._build_response(
+                        f"{request_id}:{index}", value, cached=True, deduped=False
+                    )
+                }
+
+        semaphore = asyncio.Semaphore(self.batch_max_concurrency)
+
+        async def run_group(signature: str, indices: list[int]) -> list[tuple[int, dict[str, Any]]]:
+            leader_id = f"{request_id}:{indices[0]}"
+            async with semaphore:
+                try:
+                    (base_result, source), coalesced = await self.coalescer.run(
+                        signature,
+                        lambda: self._resolve(payloads[indices[0]], signature, leader_id, deadline),
+                    )
+                except HTTPException as exc:
+                    return [(index, self._batch_error(exc)) for index in indices]
+                except Exception:
+                    logger.exception("batch.item_failed", extra={"request_id": leader_id})
+                    error = {"error": {"status_code": 502, "detail": "Inference failed"}}
+                    return [(index, error) for index in indices]
+
+            if coalesced:
+                self._spawn_background(self.redis_cache.record_total_request(leader_id))
+            return [
+                (
+                    index,
+                    {
+                        "response": self._build_response(
+                            f"{request_id}:{index}",
+                            base_result,
+                            cached=source == "cache",
+                            deduped=source != "cache" and (position > 0 or coalesced or source == "dedupe"),
+                        )
+                    },
+                )
+                for position, index in enumerate(indices)
+            ]
+
+        tasks = [
+            asyncio.create_task(run_group(signature, indices))
+            for signature, indices in groups.items()
+            if signature not in cached
+        ]
+        try:
+            for completed in asyncio.as_completed(tasks):
+                for item in await completed:
+                    yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _resolve(
+        self, payload: dict[str, Any], signature: str, request_id: str, deadline: Deadline
+    ) -> tuple[dict[str, Any], str]:
+        """Returns (base_result, source) where source is cache, dedupe or provider."""
+        self._raise_if_recently_failed(signature, request_id)
+        with self.metrics.stage("admit"):
+            admitted = await self.redis_cache.admit(signature, request_id)
+        self._count_admitted(admitted)
+        if admitted.cached is not None:
+            if admitted.refresh_due:
+                self._schedule_refresh(payload, signature, request_id)
+            return admitted.cached, "cache"
+        if admitted.failure is not None:
+            self._raise_cached_failure(admitted.failure)
 
         classification = self.classifier.classify(payload)
-        lock_acquired = await self.redis_cache.try_acquire_dedupe_lock(signature, request_id)
-
-        if not lock_acquired:
-            lock = await self.redis_cache.get_dedupe_lock(signature)
-            if lock:
-                started_ms = int(lock.get("started_ms", 0))
-                age_ms = int(time.time() * 1000) - started_ms
-                if age_ms <= self.dedupe_window_ms:
+        with self.metrics.stage("similarity"):
+            similar = await self._find_similar(payload, classification, request_id)
+        if similar is not None:
+            if admitted.lock_acquired:
+                await self.redis_cache.publish_result(
+                    signature, similar, request_id, product=self._product_of(payload)
+                )
+            return similar, "cache"
+
+        if admitted.lock_acquired:
+            try:
+                async with self._admission_slot(payload, deadline):
+                    started = time.perf_counter()
+                    with self.metrics.stage("execute"):
+                        base_result = await self._execute(
+                            payload, classification, request_id, deadline
+                        )
+            except BaseException as exc:
+                await self._remember_failure(signature, exc, lock_held=True)
+                await self.redis_cache.release_dedupe_lock(signature, request_id)
+                raise
+            with self.metrics.stage("cache_write"):
+                await self.redis_cache.publish_result(
+                    signature,
+                    base_result,
+                    request_id,
+                    compute_ms=self._elapsed_ms(started),
+                    product=self._product_of(payload),
+                )
+            self._index_prompt(payload, signature, classification)
+            return base_result, "provider"
+
+        lock = admitted.lock
+        if lock:
+            started_ms = int(lock.get("started_ms", 0))
+            age_ms = int(time.time() * 1000) - started_ms
+            if age_ms <= self.dedupe_window_ms:
+                with self.metrics.stage("dedupe_wait"):
                     deduped = await self.redis_cache.wait_for_dedupe_result(
                         signature,
-                        timeout_ms=self.global_timeout_seconds * 1000,
+                        timeout_ms=int(deadline.remaining() * 1000),
                     )
-                    if deduped is not None:
-                        return self._build_response(request_id, deduped, cached=False, deduped=True)
+                if deduped is not None and "failure" in deduped:
+                    self._raise_cached_failure(deduped["failure"])
+                if deduped is not None:
+                    self.coalescer.record_remote_dedupe()
+                    self.metrics.dedupe.labels("remote").inc()
+                    return deduped, "dedupe"
+
+        try:
+            async with self._admission_slot(payload, deadline):
+                started = time.perf_counter()
+                with self.metrics.stage("execute"):
+                    base_result = await self._execute(payload, classification, request_id, deadline)
+        except HTTPException as exc:
+            await self._remember_failure(signature, exc)
+            raise
+        with self.metrics.stage("cache_write"):
+            await self.redis_cache.set_cached(
+                signature,
+                base_result,
+                compute_ms=self._elapsed_ms(started),
+                product=self._product_of(payload),
+            )
+        self._index_prompt(payload, signature, classification)
+        return base_result, "provider"
+
+    @asynccontextmanager
+    async def _admission_slot(
+        self, payload: dict[str, Any], deadline: Deadline, *, observe_service_time: bool = True
+    ) -> AsyncIterator[None]:
+        # Only provider work queues: cache and negative hits, similarity matches and dedupe
+        # waits never take a slot, and coalesced followers share their leader's.
+        product = self._product_of(payload)
+        async with self.admission.admit(
+            product, deadline, observe_service_time=observe_service_time
+        ) as waited:
+            self.metrics.observe_admission(self.admission.label(product), waited)
+            yield
+
+    def _count_admitted(self, admitted: Any) -> None:
+        if admitted.cached is not None:
+            result = "stale" if admitted.refresh_due else "hit"
+        elif admitted.failure is not None:
+            result = "negative"
+        else:
+            result = "miss"
+        self.metrics.cache_results.labels(result).inc()
+
+    async def _find_similar(
+        self, payload: dict[str, Any], classification: Any, request_id: str
+    ) -> dict[str, Any] | None:
+        """Cached answer of an indexed near-duplicate text prompt, if there is one."""
+        if not self.similarity.enabled or classification.route != "text":
+            return None
+        product = str(payload.get("product", "")).strip().lower()
+        match = self.similarity.lookup(
+            self._similarity_partition(payload), product, str(payload.get("prompt", ""))
+        )
+        if match is None:
+            return None
+        matched_signature, similarity = match
+        cached = await self.redis_cache.get_cached(matched_signature)
+        if cached is None:
+            self.similarity.record_stale(matched_signature)
+            return None
+        self.similarity.record_hit(product, similarity)
+        logger.info(
+            "similarity_cache.hit",
+            extra={"request_id": request_id, "product": product, "similarity": round(similarity, 4)},
+        )
+        return cached
 
-        if lock_acquired:
+    def _index_prompt(self, payload: dict[str, Any], signature: str, classification: Any) -> None:
+        # Only provider answers are indexed, so approximate hits never chain into each other.
+        if self.similarity.enabled and classification.route == "text":
+            self.similarity.add(
+                self._similarity_partition(payload), str(payload.get("prompt", "")), signature
+            )
+
+    def _similarity_partition(self, payload: dict[str, Any]) -> str:
+        """Everything in the cache key except the prompt; near-duplicates must match on it exactly."""
+        return self.signatures.build(
+            {**payload, "prompt": ""}, generation=self._generation(payload)
+        )
+
+    async def _remember_failure(
+        self, signature: str, exc: BaseException, *, lock_held: bool = False
+    ) -> None:
+        # Only upstream exhaustion is cached; 4xx are instant and 504 depends on the caller's budget.
+        if isinstance(exc, AdmissionRejected):
+            return
+        if isinstance(exc, HTTPException) and exc.status_code in (502, 503):
+            await self.redis_cache.set_failure(
+                signature, exc.status_code, exc.detail, notify=lock_held
+            )
+
+    def _raise_if_recently_failed(self, signature: str, request_id: str) -> None:
+        failure = self.redis_cache.get_local_failure(signature)
+        if failure is not None:
+            self._spawn_background(self.redis_cache.record_total_request(request_id))
+            self._raise_cached_failure(failure)
+
+    @staticmethod
+    def _raise_cached_failure(failure: dict[str, Any]) -> None:
+        retry_after = (int(failure["expires_ms"]) - int(time.time() * 1000)) / 1000
+        raise HTTPException(
+            status_code=int(failure["status_code"]),
+            detail=failure["detail"],
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+        )
+
+    def _schedule_refresh(self, payload: dict[str, Any], signature: str, request_id: str) -> None:
+        """Serves the cached value now and recomputes it once in the background."""
+        if signature in self._refreshing:
+            return
+        self._refreshing.add(signature)
+        self._spawn_background(self._refresh(payload, signature, f"{request_id}:refresh"))
+
+    async def _refresh(self, payload: dict[str, Any], signature: str, request_id: str) -> None:
+        # Outlives the request that scheduled it; keep its stages out of that request's timing.
+        ServerTiming.detach()
+        try:
+            if not await self.redis_cache.claim_refresh(signature, self.global_timeout_seconds):
+                return
             try:
-                base_result = await self._execute(payload, classification, request_id)
-                await self.redis_cache.set_cached(signature, base_result)
-                await self.redis_cache.set_dedupe_result(signature, base_result)
-                return self._build_response(request_id, base_result, cached=False, deduped=False)
+                started = time.perf_counter()
+                classification = self.classifier.classify(payload)
+                base_result = await self._execute(
+                    payload, classification, request_id, Deadline(self.global_timeout_seconds)
+                )
+                await self.redis_cache.set_cached(
+                    signature,
+                    base_result,
+                    compute_ms=self._elapsed_ms(started),
+                    product=self._product_of(payload),
+                )
+                self._index_prompt(payload, signature, classification)
+                self.cache_refreshes += 1
             finally:
+                await self.redis_cache.release_refresh(signature)
+        except Exception as exc:
+            # The stale entry keeps serving until its hard expiry; the next hit retries.
+            self.cache_refresh_failures += 1
+            logger.warning(
+                "cache.refresh_failed", extra={"request_id": request_id, "error": str(exc)}
+            )
+        finally:
+            self._refreshing.discard(signature)
+
+    @staticmethod
+    def _elapsed_ms(started: float) -> int:
+        return int((time.perf_counter() - started) * 1000)
+
+    async def stream_request(
+        self, payload: dict[str, Any], request_id: str, deadline: Deadline | None = None
+    ) -> AsyncIterator[dict[str, Any]]:
+        """
+        Yields {"event": "token", "text": ...} chunks followed by one {"event": "done", ...}.
+        Fallback to the next provider only happens before the first token; a failure after
+        output has been sent ends the stream with the provider's exception.
+        """
+        deadline = deadline or Deadline(self.global_timeout_seconds)
+        with self.metrics.stage("memory_guard"):
+            self.memory_guard.enforce()
+        self._enforce_input_token_ceiling(payload)
+        with self.metrics.stage("signature"):
+            signature = self._signature(payload)
+
+        with self.metrics.stage("local_cache"):
+            cached = self.redis_cache.get_local(signature)
+        if cached is not None:
+            self._spawn_background(self.redis_cache.record_total_request(request_id))
+            yield {"event": "token", "text": self._output_text(cached["output"])}
+            yield self._done_event(request_id, cached, cached=True)
+            return
+
+        self._raise_if_recently_failed(signature, request_id)
+        with self.metrics.stage("admit"):
+            admitted = await self.redis_cache.admit(signature, request_id)
+        self._count_admitted(admitted)
+        if admitted.refresh_due:
+            self._schedule_refresh(payload, signature, request_id)
+        if admitted.failure is not None:
+            self._raise_cached_failure(admitted.failure)
+        if admitted.cached is not None:
+            yield {"event": "token", "text": self._output_text(admitted.cached["output"])}
+            yield self._done_event(request_id, admitted.cached, cached=True)
+            return
+
+        lock_acquired = admitted.lock_acquired
+        classification = self.classifier.classify(payload)
+        with self.metrics.stage("similarity"):
+            similar = await self._find_similar(payload, classification, request_id)
+        if similar is not None:
+            if lock_acquired:
+                await self.redis_cache.publish_result(
+                    signature, similar, request_id, product=self._product_of(payload)
+                )
+            yield {"event": "token", "text": self._output_text(similar["output"])}
+            yield self._done_event(request_id, similar, cached=True)
+            return
+
+        try:
+            # Held until the stream ends, as the provider is busy that long; its duration is
+            # paced by the client, so it does not feed the service-time estimate.
+            async with self._admission_slot(payload, deadline, observe_service_time=False):
+                started = time.perf_counter()
+                if classification.route == "media":
+                    base_result = await self._execute(payload, classification, request_id, deadline)
+                    yield {"event": "token", "text": self._output_text(base_result["output"])}
+                else:
+                    base_result = None
+                    async for event in self._stream_text(
+                        payload, classification, request_id, deadline
+                    ):
+                        if "result" in event:
+                            base_result = event["result"]
+                        else:
+                            yield event
+        except BaseException as exc:
+            await self._remember_failure(signature, exc, lock_held=lock_acquired)
+            if lock_acquired:
                 await self.redis_cache.release_dedupe_lock(signature, request_id)
+            raise
 
-        base_result = await self._execute(payload, classification, request_id)
-        await self.redis_cache.set_cached(signature, base_result)
-        return self._build_response(request_id, base_result, cached=False, deduped=False)
+        # Written once fully assembled so later identical requests hit the cache.
+        compute_ms = self._elapsed_ms(started)
+        self.metrics.observe_stage("execute", compute_ms / 1000)
+        product = self._product_of(payload)
+        with self.metrics.stage("cache_write"):
+            if lock_acquired:
+                await self.redis_cache.publish_result(
+                    signature, base_result, request_id, compute_ms=compute_ms, product=product
+                )
+            else:
+                await self.redis_cache.set_cached(
+                    signature, base_result, compute_ms=compute_ms, product=product
+                )
+        self._index_prompt(payload, signature, classification)
+        yield self._done_event(request_id, base_result, cached=False)
+
+    async def _stream_text(
+        self, payload: dict[str, Any], classification: Any, request_id: str, deadline: Deadline
+    ) -> AsyncIterator[dict[str, Any]]:
+        prompt = self._prepare_prompt(payload)
+        providers = ["groq", "ollama", "claude"]
+        if classification.escalate_to_claude:
+            providers.insert(0, "claude")
+
+        skipped: dict[str, str] = {}
+        for provider in providers:
+            breaker = self.breakers.get(provider)
+            if not self._can_call(provider, deadline, request_id, skipped):
+                continue
+            if provider == "claude":
+                allowed, reservation_member = await self._reserve_claude(request_id)
+                if not allowed:
+                    breaker.record_ignored()
+                    continue
+                chunks = self.providers.stream_claude(prompt, deadline)
+            elif provider == "groq":
+                chunks = self.providers.stream_groq(prompt, deadline)
+            else:
+                chunks = self.providers.stream_ollama(prompt, deadline)
+
+            parts: list[str] = []
+            started = time.perf_counter()
+            try:
+                async with breaker.track(observe_latency=False):
+                    async for text in chunks:
+                        parts.append(text)
+                        yield {"event": "token", "text": text}
+            except Exception as exc:
+                self.metrics.observe_provider(provider, "error", time.perf_counter() - started)
+                if parts:
+                    logger.warning(
+                        "stream.provider_failed_mid_stream",
+                        extra={"request_id": request_id, "provider": provider},
+                    )
+                    raise
+                if provider == "groq":
+                    self._log_groq_failure(exc, request_id)
+                elif provider == "claude":
+                    await self._handle_claude_failure(exc, reservation_member, request_id)
+                else:
+                    logger.exception(f"{provider}.failed", extra={"request_id": request_id})
+                continue
+
+            self.metrics.observe_provider(provider, "ok", time.perf_counter() - started)
+            if provider == "claude":
+                self.metrics.claude_escalations.inc()
+            yield {
+                "result": {
+                    "provider": provider,
+                    "route": "text",
+                    "output": "".join(parts),
+                    "claude_escalated": provider == "claude",
+                }
+            }
+            return
+
+        self._raise_all_failed(skipped, ["groq", "ollama"])
 
     async def _execute(
-        self, payload: dict[str, Any], classification: Any, request_id: str
+        self, payload: dict[str, Any], classification: Any, request_id: str, deadline: Deadline
     ) -> dict[str, Any]:
         prompt = str(payload.get("prompt", "")).strip()
-        product = str(payload.get("product", "")).strip().lower()
         media_url = payload.get("media_url")
         metadata = payload.get("metadata") or {}
 
         if classification.route == "media":
             if not media_url:
                 raise HTTPException(status_code=422, detail="media_url is required for media route")
-            output = await self.providers.call_kie(prompt, str(media_url), metadata)
+            skipped: dict[str, str] = {}
+            if not self._can_call("kie", deadline, request_id, skipped):
+                self._raise_all_failed(skipped, ["kie"])
+            output = await self._call_tracked(
+                "kie",
+                lambda: self.providers.call_kie(prompt, str(media_url), metadata, deadline),
+                deadline,
+            )
             return {
                 "provider": "kie",
                 "route": "media",
@@ -158,86 +771,229 @@ class InferenceRouter:
                 "claude_escalated": False,
             }
 
-        if product == "synqra":
-            prompt = self._apply_voice_calibration(prompt)
+        prompt = self._prepare_prompt(payload)
 
+        skipped: dict[str, str] = {}
         if classification.escalate_to_claude:
-            claude_result = await self._try_claude(prompt, request_id)
+            claude_result = await self._try_claude(prompt, request_id, deadline, skipped)
             if claude_result:
                 return claude_result
 
-        if await self.breaker.is_open():
-            logger.warning("groq.circuit_open", extra={"request_id": request_id})
-            breaker_status = await self.breaker.status()
-            retry_after = max(1, int(breaker_status.get("retry_after_seconds", 1)))
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail="Groq cooldown active",
-                headers={"Retry-After": str(retry_after)},
-            )
+        hedge_task = None
+        if self._can_call("groq", deadline, request_id, skipped):
+            groq_task = asyncio.create_task(self._call_groq_observed(prompt, deadline))
+            try:
+                delay = self.hedging.delay_seconds()
+                if delay is not None:
+                    done, _ = await asyncio.wait({groq_task}, timeout=delay)
+                    ollama_breaker = self.breakers.get("ollama")
+                    # Breaker first, so an open Ollama breaker does not spend hedge budget.
+                    if (
+                        not done
+                        and not ollama_breaker.is_open()
+                        and self.providers.time_budget("ollama", deadline) is not None
+                        and ollama_breaker.allow()
+                    ):
+                        if self.hedging.try_acquire():
+                            logger.info(
+                                "groq.hedged",
+                                extra={"request_id": request_id, "delay_seconds": delay},
+                            )
+                            hedge_task = asyncio.create_task(
+                                self._call_tracked(
+                                    "ollama",
+                                    lambda: self.providers.call_ollama(prompt, deadline),
+                                    deadline,
+                                )
+                            )
+                        else:
+                            # Hand back the half-open probe slot allow() may have taken.
+                            ollama_breaker.record_ignored()
+                result = await self._race_groq(groq_task, hedge_task, request_id)
+            finally:
+                for task in (groq_task, hedge_task):
+                    if task is None:
+                        continue
+                    if not task.done():
+                        task.cancel()
+                    elif not task.cancelled():
+                        # The loser's error was never awaited; mark it retrieved.
+                        task.exception()
+            if result is not None:
+                return result
 
-        try:
-            output = await self.providers.call_groq(prompt)
-            await self.breaker.record_success()
-            return {
-                "provider": "groq",
-                "route": "text",
-                "output": output,
-                "claude_escalated": False,
-            }
-        except ProviderError as exc:
-            if exc.status_code == 429:
-                await self.breaker.record_rate_limited()
-                logger.warning(
-                    "groq.rate_limited",
-                    extra={"request_id": request_id, "status_code": exc.status_code},
-                )
-                if await self.breaker.is_open():
-                    breaker_status = await self.breaker.status()
-                    retry_after = max(1, int(breaker_status.get("retry_after_seconds", 1)))
-                    raise HTTPException(
-                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                        detail="Groq cooldown active",
-                        headers={"Retry-After": str(retry_after)},
-                    )
-            else:
-                await self.breaker.record_non_429()
-                logger.warning(
-                    "groq.failed",
-                    extra={"request_id": request_id, "status_code": exc.status_code},
+        if hedge_task is None and self._can_call("ollama", deadline, request_id, skipped):
+            try:
+                output = await self._call_tracked(
+                    "ollama", lambda: self.providers.call_ollama(prompt, deadline), deadline
                 )
-        except Exception:
-            await self.breaker.record_non_429()
-            logger.exception("groq.unexpected_failure", extra={"request_id": request_id})
-
-        try:
-            output = await self.providers.call_ollama(prompt)
-            return {
-                "provider": "ollama",
-                "route": "text",
-                "output": output,
-                "claude_escalated": False,
-            }
-        except ProviderError:
-            logger.exception("ollama.failed", extra={"request_id": request_id})
+                return {
+                    "provider": "ollama",
+                    "route": "text",
+                    "output": output,
+                    "claude_escalated": False,
+                }
+            except ProviderError:
+                logger.exception("ollama.failed", extra={"request_id": request_id})
 
-        claude_fallback = await self._try_claude(prompt, request_id)
+        claude_fallback = await self._try_claude(prompt, request_id, deadline, skipped)
         if claude_fallback:
             return claude_fallback
 
+        self._raise_all_failed(skipped, ["groq", "ollama"])
+
+    async def _call_groq_observed(self, prompt: str, deadline: Deadline) -> str:
+        # Failed, timed-out and cancelled calls count too (cancelled ones took at least this
+        # long), so the hedge delay follows Groq up when it degrades.
+        started = time.perf_counter()
+        try:
+            return await self._call_tracked(
+                "groq", lambda: self.providers.call_groq(prompt, deadline), deadline
+            )
+        finally:
+            self.hedging.observe_primary(time.perf_counter() - started)
+
+    async def _call_tracked(
+        self, provider: str, call: Callable[[], Awaitable[Any]], deadline: Deadline
+    ) -> Any:
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            async with self.breakers.get(provider).track():
+                try:
+                    output = await asyncio.wait_for(call(), timeout=deadline.remaining())
+                except asyncio.TimeoutError as exc:
+                    outcome = "deadline"
+                    raise DeadlineExceeded(provider, "Request deadline reached mid-call") from exc
+            outcome = "ok"
+            if provider == "claude":
+                self.metrics.claude_escalations.inc()
+            return output
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            self.metrics.observe_provider(provider, outcome, time.perf_counter() - started)
+
+    def _can_call(
+        self, provider: str, deadline: Deadline, request_id: str, skipped: dict[str, str]
+    ) -> bool:
+        """Checks the deadline, then the breaker; records why a provider was skipped."""
+        if self.providers.time_budget(provider, deadline) is None:
+            logger.info(
+                f"{provider}.deadline_skip",
+                extra={"request_id": request_id, "remaining_ms": int(deadline.remaining() * 1000)},
+            )
+            skipped[provider] = "deadline"
+            return False
+        if not self.breakers.get(provider).allow():
+            logger.warning(f"{provider}.circuit_open", extra={"request_id": request_id})
+            skipped[provider] = "circuit_open"
+            return False
+        return True
+
+    async def _race_groq(
+        self, groq_task: asyncio.Task, hedge_task: asyncio.Task | None, request_id: str
+    ) -> dict[str, Any] | None:
+        """First successful answer from Groq or its Ollama hedge; None when all of them failed."""
+        pending = {task for task in (groq_task, hedge_task) if task is not None}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                provider = "groq" if task is groq_task else "ollama"
+                try:
+                    output = task.result()
+                except Exception as exc:
+                    if provider == "ollama":
+                        logger.warning(
+                            "ollama.hedge_failed",
+                            extra={"request_id": request_id, "error": str(exc)},
+                        )
+                        continue
+                    self._log_groq_failure(exc, request_id)
+                    continue
+
+                if provider == "ollama":
+                    self.hedging.record_hedge_win()
+                return {
+                    "provider": provider,
+                    "route": "text",
+                    "output": output,
+                    "claude_escalated": False,
+                }
+        return None
+
+    def _log_groq_failure(self, exc: Exception, request_id: str) -> None:
+        if isinstance(exc, ProviderThrottled):
+            # Shaped away before reaching Groq: not a provider failure, just fall through.
+            logger.info("groq.shaped", extra={"request_id": request_id})
+        elif not isinstance(exc, ProviderError):
+            logger.exception("groq.unexpected_failure", extra={"request_id": request_id})
+        elif exc.status_code == 429:
+            logger.warning(
+                "groq.rate_limited",
+                extra={"request_id": request_id, "status_code": exc.status_code},
+            )
+        else:
+            logger.warning(
+                "groq.failed",
+                extra={"request_id": request_id, "status_code": exc.status_code},
+            )
+
+    def _raise_all_failed(self, skipped: dict[str, str], required: list[str]) -> None:
+        # Nothing required was even tried: tell the client when a breaker will let it through again.
+        if all(skipped.get(provider) == "circuit_open" for provider in required):
+            self._raise_unavailable(required)
+        if "deadline" in skipped.values():
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="Request deadline reached before a provider could answer",
+            )
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
             detail="All providers failed for this request",
         )
 
-    async def _try_claude(self, prompt: str, request_id: str) -> dict[str, Any] | None:
+    def _raise_unavailable(self, providers: list[str]) -> None:
+        retry_after = min(self.breakers.get(name).retry_after_seconds() for name in providers)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Circuit open for {', '.join(providers)}",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+        )
+
+    async def _try_claude(
+        self, prompt: str, request_id: str, deadline: Deadline, skipped: dict[str, str]
+    ) -> dict[str, Any] | None:
+        if "claude" in skipped or not self._can_call("claude", deadline, request_id, skipped):
+            return None
+        allowed, reservation_member = await self._reserve_claude(request_id)
+        if not allowed:
+            self.breakers.get("claude").record_ignored()
+            return None
+
+        try:
+            output = await self._call_tracked(
+                "claude", lambda: self.providers.call_claude(prompt, deadline), deadline
+            )
+            return {
+                "provider": "claude",
+                "route": "text",
+                "output": output,
+                "claude_escalated": True,
+            }
+        except Exception as exc:
+            await self._handle_claude_failure(exc, reservation_member, request_id)
+            return None
+
+    async def _reserve_claude(self, request_id: str) -> tuple[bool, str | None]:
         (
             allowed,
             total_count,
             claude_count,
             projected_ratio,
             reservation_member,
-        ) = await self.redis_cache.try_reserve_claude_request(request_id)
+        ) = await self.claude_budget.reserve(request_id)
         if not allowed:
             logger.info(
                 "claude.cap_reached",
@@ -248,26 +1004,47 @@ class InferenceRouter:
                     "projected_ratio": projected_ratio,
                 },
             )
-            return None
+        return allowed, reservation_member
 
-        try:
-            output = await self.providers.call_claude(prompt)
-            return {
-                "provider": "claude",
-                "route": "text",
-                "output": output,
-                "claude_escalated": True,
-            }
-        except ProviderError:
-            if reservation_member:
-                await self.redis_cache.release_claude_reservation(reservation_member)
+    async def _handle_claude_failure(
+        self, exc: Exception, reservation_member: str | None, request_id: str
+    ) -> None:
+        if reservation_member:
+            await self.claude_budget.release(reservation_member)
+        if isinstance(exc, ProviderError):
             logger.exception("claude.failed", extra={"request_id": request_id})
-            return None
-        except Exception:
-            if reservation_member:
-                await self.redis_cache.release_claude_reservation(reservation_member)
+        else:
             logger.exception("claude.unexpected_failure", extra={"request_id": request_id})
-            return None
+
+    def _spawn_background(self, coro: Any) -> None:
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    def _signature(self, payload: dict[str, Any]) -> str:
+        return self.signatures.build(payload, generation=self._generation(payload))
+
+    def _generation(self, payload: dict[str, Any]) -> str:
+        return self.generations.key_for(self._product_of(payload), self._template_of(payload))
+
+    @staticmethod
+    def _product_of(payload: dict[str, Any]) -> str:
+        return str(payload.get("product", "")).strip().lower()
+
+    @staticmethod
+    def _template_of(payload: dict[str, Any]) -> str:
+        """Prompt template behind a request: metadata["template"], else the product's built-in one."""
+        template = (payload.get("metadata") or {}).get("template")
+        if template:
+            return str(template).strip().lower()
+        return "synqra_voice" if InferenceRouter._product_of(payload) == "synqra" else "plain"
+
+    def _prepare_prompt(self, payload: dict[str, Any]) -> str:
+        prompt = str(payload.get("prompt", "")).strip()
+        product = str(payload.get("product", "")).strip().lower()
+        if product == "synqra":
+            prompt = self._apply_voice_calibration(prompt)
+        return prompt
 
     @staticmethod
     def _apply_voice_calibration(prompt: str) -> str:
@@ -298,16 +1075,101 @@ class InferenceRouter:
                 f"({estimated_tokens}>{ceiling})",
             )
 
+    def _collect_metrics(self) -> list[Any]:
+        """Scrape-time metrics from the counters breakers, limiters and caches already keep."""
+        breaker_trips = Counter(
+            "inference_breaker_trips_total", "Times a provider's circuit opened", ("provider",)
+        )
+        breaker_open = Gauge(
+            "inference_breaker_open", "1 while a provider's circuit is open", ("provider",)
+        )
+        for provider, breaker in self.breakers.status().items():
+            breaker_trips.labels(provider).inc(breaker["opened"])
+            breaker_open.labels(provider).set(1 if breaker["open"] else 0)
+
+        in_flight = Gauge(
+            "inference_provider_in_flight", "Provider calls holding a concurrency slot", ("provider",)
+        )
+        queue_depth = Gauge(
+            "inference_provider_queue_depth", "Provider calls waiting for a slot", ("provider",)
+        )
+        limit = Gauge(
+            "inference_provider_concurrency_limit", "Current adaptive concurrency limit", ("provider",)
+        )
+        for provider, limiter in self.providers.limiter_status().items():
+            in_flight.labels(provider).set(limiter["in_flight"])
+            queue_depth.labels(provider).set(limiter["queue_depth"])
+            limit.labels(provider).set(limiter["limit"])
+
+        lookups = Counter(
+            "inference_cache_tier_lookups_total", "Lookups per cache tier", ("tier", "result")
+        )
+        tiers = {
+            "local": self.redis_cache.local_cache.stats(),
+            "disk": self.redis_cache.disk_stats(),
+            "similarity": self.similarity.stats(),
+        }
+        for tier, stats in tiers.items():
+            if not stats["enabled"]:
+                continue
+            misses = stats.get("misses", stats.get("lookups", 0) - stats["hits"])
+            lookups.labels(tier, "hit").inc(stats["hits"])
+            lookups.labels(tier, "miss").inc(misses)
+        admission = self.admission.stats()
+        admission_queue = Gauge(
+            "inference_admission_queue_depth", "Requests waiting for admission"
+        )
+        admission_queue.set(admission["queue_depth"])
+        admission_in_flight = Gauge(
+            "inference_admission_in_flight", "Requests holding an admission slot"
+        )
+        admission_in_flight.set(admission["in_flight"])
+        admission_outcomes = Counter(
+            "inference_admission_total",
+            "Admission decisions: admitted, deadline, queue_full or displaced",
+            ("product", "outcome"),
+        )
+        for product, counts in admission["outcomes"].items():
+            for outcome, count in counts.items():
+                admission_outcomes.labels(product, outcome).inc(count)
+        return [
+            breaker_trips,
+            breaker_open,
+            in_flight,
+            queue_depth,
+            limit,
+            lookups,
+            admission_queue,
+            admission_in_flight,
+            admission_outcomes,
+        ]
+
     async def health(self) -> dict[str, Any]:
         redis_ok = await self.redis_cache.ping()
-        breaker_status = await self.breaker.status()
         memory = self.memory_guard.snapshot()
         healthy = redis_ok and memory["healthy"]
         return {
             "status": "ok" if healthy else "degraded",
             "redis": {"ok": redis_ok},
             "memory": memory,
-            "circuit_breaker": breaker_status,
+            "circuit_breakers": self.breakers.status(),
+            "local_cache": self.redis_cache.local_cache.stats(),
+            "cache_refresh": {
+                **self.redis_cache.refresh_stats(),
+                "in_flight": len(self._refreshing),
+                "refreshes": self.cache_refreshes,
+                "failures": self.cache_refresh_failures,
+            },
+            "negative_cache": self.redis_cache.negative_stats(),
+            "disk_cache": self.redis_cache.disk_stats(),
+            "similarity_cache": self.similarity.stats(),
+            "cache_generations": self.generations.snapshot(),
+            "coalescing": self.coalescer.stats(),
+            "admission": self.admission.stats(),
+            "claude_budget": self.claude_budget.stats(),
+            "hedging": self.hedging.stats(),
+            "providers": self.providers.limiter_status(),
+            "groq_rate_limit": self.providers.groq_shaper.status(),
             "timeouts": {
                 "groq_seconds": self.providers.groq_timeout_seconds,
                 "global_seconds": self.global_timeout_seconds,
@@ -315,10 +1177,41 @@ class InferenceRouter:
             "policy": {
                 "cache_ttl_seconds": self.redis_cache.cache_ttl_seconds,
                 "dedupe_window_ms": self.dedupe_window_ms,
+                "batch_max_concurrency": self.batch_max_concurrency,
                 "claude_cap_ratio": self.redis_cache.claude_cap_ratio,
             },
         }
 
+    async def bump_cache_generation(self, scope: str, name: str = "") -> dict[str, Any]:
+        """Invalidates every cached answer in the scope by moving it to a new generation."""
+        generation = await self.generations.bump(scope, name)
+        logger.info(
+            "cache.generation_bumped",
+            extra={"scope": scope, "scope_name": name, "generation": generation},
+        )
+        return {"scope": scope, "name": name, "generation": generation}
+
+    async def cache_report(self) -> dict[str, Any]:
+        await self.generations.refresh()
+        return {
+            "generations": self.generations.snapshot(),
+            "entries_by_product": await self.redis_cache.cache_sizes(),
+        }
+
+    @staticmethod
+    def _batch_error(exc: HTTPException) -> dict[str, Any]:
+        return {"error": {"status_code": exc.status_code, "detail": exc.detail}}
+
+    @classmethod
+    def _done_event(cls, request_id: str, base: dict[str, Any], *, cached: bool) -> dict[str, Any]:
+        response = cls._build_response(request_id, base, cached=cached, deduped=False)
+        response.pop("output")
+        return {"event": "done", **response}
+
+    @staticmethod
+    def _output_text(output: Any) -> str:
+        return output if isinstance(output, str) else json.dumps(output, default=str)
+
     @staticmethod
     def _build_response(
         request_id: str, base: dict[str, Any], *, cached: bool, deduped: bool
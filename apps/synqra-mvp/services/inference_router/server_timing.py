@@ -0,0 +1,69 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+
+
+class ServerTiming:
+    """
+    Latency breakdown of one request, rendered as a Server-Timing header.
+    While `activate()` is in effect the router's stages and provider calls add
+    themselves through `current()`; tasks spawned inside inherit it.
+    """
+
+    def __init__(self) -> None:
+        # (name, milliseconds, description) in the order they finished.
+        self.entries: list[tuple[str, float, str]] = []
+
+    def __bool__(self) -> bool:
+        return bool(self.entries)
+
+    @staticmethod
+    def current() -> "ServerTiming | None":
+        return _current.get()
+
+    @staticmethod
+    def detach() -> None:
+        """Stops the calling task recording into a timing it inherited from its request."""
+        _current.set(None)
+
+    @contextmanager
+    def activate(self) -> Iterator["ServerTiming"]:
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    @contextmanager
+    def measure(self, name: str, description: str = "") -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started, description)
+
+    def add(self, name: str, seconds: float, description: str = "") -> None:
+        self.entries.append((name, round(seconds * 1000, 2), description))
+
+    def header(self) -> str:
+        metrics = []
+        for name, duration_ms, description in self.entries:
+            metric = f"{name};dur={duration_ms:g}"
+            if description:
+                escaped = description.replace("\\", "\\\\").replace('"', '\\"')
+                metric += f';desc="{escaped}"'
+            metrics.append(metric)
+        return ", ".join(metrics)
+
+    def as_list(self) -> list[dict[str, Any]]:
+        entries = []
+        for name, duration_ms, description in self.entries:
+            entry: dict[str, Any] = {"name": name, "duration_ms": duration_ms}
+            if description:
+                entry["description"] = description
+            entries.append(entry)
+        return entries
+
+
+_current: ContextVar[ServerTiming | None] = ContextVar("server_timing", default=None)
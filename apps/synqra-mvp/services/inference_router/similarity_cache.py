@@ -0,0 +1,160 @@
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+
+_WORD = re.compile(r"\w+")
+_FINGERPRINT_BITS = 64
+
+
+def simhash(prompt: str) -> tuple[int, int]:
+    """
+    Returns (fingerprint, token_count) for a prompt.
+    Features are words and word pairs after lowercasing, so punctuation and case
+    never count, a swapped word moves only a few bits and word order still matters.
+    """
+    tokens = _WORD.findall(prompt.lower())
+    shingles = tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+    weights = [0] * _FINGERPRINT_BITS
+    for shingle in shingles:
+        digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+        feature = int.from_bytes(digest, "big")
+        for bit in range(_FINGERPRINT_BITS):
+            weights[bit] += 1 if feature >> bit & 1 else -1
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint, len(tokens)
+
+
+class SimilarityCache:
+    """
+    In-process near-duplicate index for text prompts.
+    Each computed answer is indexed by the SimHash of its prompt under its exact
+    cache signature, partitioned by everything else that makes up the key. The
+    fingerprint is split into `bands`; candidates are the prompts sharing at least
+    one band, which always includes anything within bands - 1 differing bits and
+    most prompts a few bits further out, so no scan is needed. The answer itself
+    stays in the exact cache; this only maps a prompt to the signature of its
+    nearest neighbour.
+    """
+
+    def __init__(
+        self,
+        *,
+        enabled: bool = False,
+        default_threshold: float = 0.85,
+        thresholds: dict[str, float] | None = None,
+        max_entries: int = 10_000,
+        ttl_seconds: float = 360.0,
+        min_tokens: int = 4,
+        bands: int = 8,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.enabled = enabled
+        self.default_threshold = default_threshold
+        self.thresholds = {product.lower(): value for product, value in (thresholds or {}).items()}
+        self.max_entries = max(0, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.min_tokens = min_tokens
+        self.bands = bands
+        self._band_bits = _FINGERPRINT_BITS // bands
+        self._band_mask = (1 << self._band_bits) - 1
+        self._clock = clock
+        # signature -> (partition, fingerprint, expires_at); least recently added first.
+        self._entries: OrderedDict[str, tuple[str, int, float]] = OrderedDict()
+        self._buckets: dict[tuple[str, int, int], set[str]] = {}
+        self.lookups = 0
+        self.hits = 0
+        self.stale = 0
+        self.evictions = 0
+        self.hits_by_product: dict[str, int] = {}
+        self._similarity_total = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def threshold_for(self, product: str) -> float:
+        return self.thresholds.get(product, self.default_threshold)
+
+    def lookup(self, partition: str, product: str, prompt: str) -> tuple[str, float] | None:
+        """Returns (signature, similarity) of the closest indexed prompt above the product's threshold."""
+        if not self.enabled:
+            return None
+        fingerprint, token_count = simhash(prompt)
+        if token_count < self.min_tokens:
+            return None
+
+        self.lookups += 1
+        now = self._clock()
+        max_distance = int((1.0 - self.threshold_for(product)) * _FINGERPRINT_BITS)
+        best: tuple[str, int] | None = None
+        for key in self._band_keys(partition, fingerprint):
+            for signature in self._buckets.get(key, ()):
+                _, candidate, expires_at = self._entries[signature]
+                if now >= expires_at:
+                    continue
+                distance = (fingerprint ^ candidate).bit_count()
+                if distance <= max_distance and (best is None or distance < best[1]):
+                    best = (signature, distance)
+        if best is None:
+            return None
+        return best[0], 1.0 - best[1] / _FINGERPRINT_BITS
+
+    def add(self, partition: str, prompt: str, signature: str) -> None:
+        if not self.enabled or self.max_entries == 0:
+            return
+        fingerprint, token_count = simhash(prompt)
+        if token_count < self.min_tokens:
+            return
+        self.discard(signature)
+        while len(self._entries) >= self.max_entries:
+            self.discard(next(iter(self._entries)))
+            self.evictions += 1
+        self._entries[signature] = (partition, fingerprint, self._clock() + self.ttl_seconds)
+        for key in self._band_keys(partition, fingerprint):
+            self._buckets.setdefault(key, set()).add(signature)
+
+    def discard(self, signature: str) -> None:
+        entry = self._entries.pop(signature, None)
+        if entry is None:
+            return
+        partition, fingerprint, _ = entry
+        for key in self._band_keys(partition, fingerprint):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(signature)
+                if not bucket:
+                    del self._buckets[key]
+
+    def record_hit(self, product: str, similarity: float) -> None:
+        self.hits += 1
+        self.hits_by_product[product] = self.hits_by_product.get(product, 0) + 1
+        self._similarity_total += similarity
+
+    def record_stale(self, signature: str) -> None:
+        """The matched signature has left the exact cache; forget it."""
+        self.stale += 1
+        self.discard(signature)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "mean_similarity": round(self._similarity_total / self.hits, 4) if self.hits else 0.0,
+            "hits_by_product": dict(self.hits_by_product),
+            "stale": self.stale,
+            "evictions": self.evictions,
+        }
+
+    def _band_keys(self, partition: str, fingerprint: int) -> list[tuple[str, int, int]]:
+        return [
+            (partition, band, fingerprint >> (band * self._band_bits) & self._band_mask)
+            for band in range(self.bands)
+        ]
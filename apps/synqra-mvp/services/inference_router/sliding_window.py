@@ -0,0 +1,82 @@
+import time
+from dataclasses import dataclass
+
+
+# Shared Lua helpers, prepended to every script that touches a window.
+# A window is one hash: a field per bucket id, plus "head" (oldest live bucket)
+# and "sum" (running total of live buckets). Rolling only visits buckets that
+# expired since the last touch, so each bucket is dropped once and reads are O(1).
+# Every write sets the TTL, so a window that is only ever read still expires.
+WINDOW_LUA = """
+local function window_roll(key, bucket, buckets, ttl_seconds)
+  local floor = bucket - buckets + 1
+  local head = tonumber(redis.call("HGET", key, "head"))
+  if head == nil then
+    redis.call("HSET", key, "head", floor, "sum", 0)
+    redis.call("EXPIRE", key, ttl_seconds)
+    return 0
+  end
+  local sum = tonumber(redis.call("HGET", key, "sum") or "0")
+  if head >= floor then
+    return sum
+  end
+  if floor - head >= buckets then
+    redis.call("DEL", key)
+    redis.call("HSET", key, "head", floor, "sum", 0)
+    redis.call("EXPIRE", key, ttl_seconds)
+    return 0
+  end
+  for stale = head, floor - 1 do
+    local field = tostring(stale)
+    local count = redis.call("HGET", key, field)
+    if count then
+      sum = sum - tonumber(count)
+      redis.call("HDEL", key, field)
+    end
+  end
+  redis.call("HSET", key, "head", floor, "sum", sum)
+  redis.call("EXPIRE", key, ttl_seconds)
+  return sum
+end
+
+local function window_add(key, bucket, buckets, amount, ttl_seconds)
+  window_roll(key, bucket, buckets, ttl_seconds)
+  redis.call("HINCRBY", key, tostring(bucket), amount)
+  local sum = redis.call("HINCRBY", key, "sum", amount)
+  redis.call("EXPIRE", key, ttl_seconds)
+  return sum
+end
+
+local function window_remove(key, bucket, amount)
+  local head = tonumber(redis.call("HGET", key, "head"))
+  local field = tostring(bucket)
+  local count = tonumber(redis.call("HGET", key, field) or "0")
+  if head == nil or bucket < head or count <= 0 then
+    return 0
+  end
+  local removed = math.min(count, amount)
+  redis.call("HINCRBY", key, field, -removed)
+  redis.call("HINCRBY", key, "sum", -removed)
+  return removed
+end
+"""
+
+
+@dataclass(frozen=True)
+class SlidingWindow:
+    """Bucketed sliding-window geometry shared by the Redis counters."""
+
+    window_seconds: int = 3600
+    bucket_seconds: int = 60
+
+    @property
+    def buckets(self) -> int:
+        return max(1, -(-self.window_seconds // max(1, self.bucket_seconds)))
+
+    @property
+    def ttl_seconds(self) -> int:
+        return self.window_seconds + 2 * self.bucket_seconds
+
+    def bucket_at(self, timestamp: float | None = None) -> int:
+        now = time.time() if timestamp is None else timestamp
+        return int(now // max(1, self.bucket_seconds))
@@ -0,0 +1,154 @@
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import threading
+import time
+from typing import Any, Callable
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _dumps(payload: dict[str, Any]) -> str:
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload, default=str).decode("utf-8")
+        except TypeError:
+            # Integers beyond 64 bits, non-string keys: let the stdlib encoder have a go.
+            pass
+    return json.dumps(payload, default=str, separators=(",", ":"))
+
+
+class JsonFormatter(logging.Formatter):
+    _reserved = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__.keys())
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: dict[str, Any] = {
+            "ts": self.formatTime(record, datefmt="%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in self._reserved and not key.startswith("_"):
+                payload[key] = value
+
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+
+        return _dumps(payload)
+
+
+class EventSampler(logging.Filter):
+    """
+    Per-event sampling and rate limiting, keyed on the event name (the log message).
+    `sample_rates` keeps a fraction of an event ({"http.request": 0.1}); `rate_limits`
+    lets at most N records of an event through per second ({"cache.get_failed": 5}).
+    The first record let through after a capped second carries `suppressed`, the number
+    dropped in between, so an outage stays visible without flooding the log.
+    """
+
+    def __init__(
+        self,
+        sample_rates: dict[str, float] | None = None,
+        rate_limits: dict[str, int] | None = None,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Callable[[], float] = random.random,
+    ) -> None:
+        super().__init__()
+        self.sample_rates = dict(sample_rates or {})
+        self.rate_limits = dict(rate_limits or {})
+        self._clock = clock
+        self._rng = rng
+        # event -> [window_started, passed, suppressed]
+        self._windows: dict[str, list[float]] = {}
+        self.sampled_out = 0
+        self.rate_limited = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = record.msg
+        if not isinstance(event, str):
+            return True
+        rate = self.sample_rates.get(event)
+        if rate is not None and self._rng() >= rate:
+            self.sampled_out += 1
+            return False
+
+        limit = self.rate_limits.get(event)
+        if limit is None:
+            return True
+        now = self._clock()
+        window = self._windows.get(event)
+        if window is None or now - window[0] >= 1.0:
+            if window is not None and window[2]:
+                record.suppressed = int(window[2])
+            window = self._windows[event] = [now, 0, 0]
+        if window[1] >= limit:
+            window[2] += 1
+            self.rate_limited += 1
+            return False
+        window[1] += 1
+        return True
+
+
+class BackgroundLogHandler(logging.handlers.QueueHandler):
+    """
+    Queues records for a worker thread that formats and writes them through `target`,
+    so the event loop never encodes JSON, formats a traceback or blocks on stdout.
+    A full queue drops the record and counts it rather than stalling the caller.
+    """
+
+    def __init__(self, target: logging.Handler, *, max_queue: int = 10_000) -> None:
+        super().__init__(queue.Queue(max_queue))
+        self.target = target
+        self.dropped = 0
+        self._worker: threading.Thread | None = threading.Thread(
+            target=self._drain, name="log-writer", daemon=True
+        )
+        self._worker.start()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only the message is resolved here, since its args may change once we return;
+        # extras and exc_info travel as they are and are formatted by the worker.
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self) -> None:
+        """Waits until every queued record has been written."""
+        if self._worker is not None:
+            self.queue.join()
+
+    def close(self) -> None:
+        try:
+            if self._worker is not None:
+                # Blocks for a free slot: a full queue must still receive the stop marker.
+                self.queue.put(None)
+                self._worker.join()
+                self._worker = None
+                self.target.close()
+        finally:
+            super().close()
+
+    def _drain(self) -> None:
+        while True:
+            record = self.queue.get()
+            try:
+                if record is None:
+                    return
+                if record.levelno >= self.target.level:
+                    self.target.handle(record)
+            finally:
+                self.queue.task_done()
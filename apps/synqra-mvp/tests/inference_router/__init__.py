@@ -0,0 +1 @@
+"""Unit tests for inference router modules."""
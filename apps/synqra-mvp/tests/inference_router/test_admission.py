@@ -0,0 +1,230 @@
+import asyncio
+import selectors
+import unittest
+
+from fastapi import HTTPException
+
+from services.inference_router.admission import AdmissionController
+from services.inference_router.deadline import Deadline
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _SkipAheadSelector(selectors.DefaultSelector):
+    """Moves the clock forward by the loop's idle timeout instead of blocking for it."""
+
+    def __init__(self, clock: _Clock) -> None:
+        super().__init__()
+        self.clock = clock
+
+    def select(self, timeout: float | None = None):
+        if timeout:
+            self.clock.now += timeout
+        return super().select(0)
+
+
+class _VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """Sleeps and timeouts take no wall time, so results do not depend on machine load."""
+
+    def __init__(self, clock: _Clock) -> None:
+        super().__init__(_SkipAheadSelector(clock))
+        self.clock = clock
+
+    def time(self) -> float:
+        return self.clock()
+
+
+async def _hold(controller: AdmissionController, product: str, release: asyncio.Event, order: list) -> None:
+    async with controller.admit(product, Deadline(5)):
+        order.append(product)
+        await release.wait()
+
+
+class AdmissionControllerTests(unittest.IsolatedAsyncioTestCase):
+    async def test_admits_immediately_below_capacity(self) -> None:
+        controller = AdmissionController(max_concurrency=2)
+
+        async with controller.admit("synqra", Deadline(5)) as waited:
+            self.assertEqual(waited, 0.0)
+            self.assertEqual(controller.in_flight, 1)
+
+        self.assertEqual(controller.in_flight, 0)
+        self.assertEqual(controller.stats()["outcomes"], {"synqra": {"admitted": 1}})
+
+    async def test_disabled_controller_never_queues(self) -> None:
+        controller = AdmissionController(enabled=False, max_concurrency=1, max_queue=0)
+
+        async with controller.admit("noid", Deadline(5)):
+            async with controller.admit("noid", Deadline(5)) as waited:
+                self.assertEqual(waited, 0.0)
+
+    async def test_higher_priority_products_are_admitted_first(self) -> None:
+        controller = AdmissionController(max_concurrency=1)
+        release = asyncio.Event()
+        order: list[str] = []
+
+        holder = asyncio.create_task(_hold(controller, "aurafx", release, order))
+        await asyncio.sleep(0)
+        noid = asyncio.create_task(_hold(controller, "noid", release, order))
+        await asyncio.sleep(0)
+        synqra = asyncio.create_task(_hold(controller, "synqra", release, order))
+        await asyncio.sleep(0)
+        self.assertEqual(controller.queue_depth, 2)
+
+        release.set()
+        await asyncio.gather(holder, noid, synqra)
+
+        self.assertEqual(order, ["aurafx", "synqra", "noid"])
+        self.assertEqual(controller.queue_depth, 0)
+        self.assertEqual(controller.in_flight, 0)
+
+    async def test_full_queue_displaces_lower_priority_then_rejects(self) -> None:
+        controller = AdmissionController(max_concurrency=1, max_queue=1)
+        release = asyncio.Event()
+        order: list[str] = []
+
+        holder = asyncio.create_task(_hold(controller, "synqra", release, order))
+        await asyncio.sleep(0)
+        noid = asyncio.create_task(_hold(controller, "noid", release, order))
+        await asyncio.sleep(0)
+        synqra = asyncio.create_task(_hold(controller, "synqra", release, order))
+        await asyncio.sleep(0)
+
+        with self.assertRaises(HTTPException) as displaced:
+            await noid
+        self.assertEqual(displaced.exception.status_code, 503)
+        self.assertIn("Retry-After", displaced.exception.headers)
+
+        with self.assertRaises(HTTPException) as rejected:
+            async with controller.admit("aurafx", Deadline(5)):
+                pass
+        self.assertEqual(rejected.exception.detail, "Admission queue is full")
+
+        release.set()
+        await asyncio.gather(holder, synqra)
+        outcomes = controller.stats()["outcomes"]
+        self.assertEqual(outcomes["noid"], {"displaced": 1})
+        self.assertEqual(outcomes["aurafx"], {"queue_full": 1})
+        self.assertEqual(outcomes["synqra"], {"admitted": 2})
+
+    async def test_rejects_up_front_when_deadline_cannot_cover_the_wait(self) -> None:
+        controller = AdmissionController(max_concurrency=1)
+        controller.service_seconds = 1.0
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, "synqra", release, []))
+        await asyncio.sleep(0)
+
+        with self.assertRaises(HTTPException) as rejected:
+            async with controller.admit("synqra", Deadline(1.5)):
+                pass
+
+        self.assertEqual(rejected.exception.status_code, 503)
+        self.assertEqual(controller.queue_depth, 0)
+        self.assertEqual(controller.stats()["outcomes"]["synqra"]["deadline"], 1)
+        release.set()
+        await holder
+
+    async def test_gives_up_while_queued_once_the_deadline_is_too_close(self) -> None:
+        controller = AdmissionController(max_concurrency=1)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, "synqra", release, []))
+        await asyncio.sleep(0)
+
+        with self.assertRaises(HTTPException) as rejected:
+            async with controller.admit("noid", Deadline(0.05)):
+                pass
+
+        self.assertEqual(rejected.exception.detail, "Request deadline reached while queued")
+        self.assertEqual(controller.queue_depth, 0)
+        release.set()
+        await holder
+        self.assertEqual(controller.in_flight, 0)
+
+    async def test_cancelled_waiter_leaves_the_queue(self) -> None:
+        controller = AdmissionController(max_concurrency=1)
+        release = asyncio.Event()
+        order: list[str] = []
+        holder = asyncio.create_task(_hold(controller, "synqra", release, order))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(_hold(controller, "synqra", release, order))
+        await asyncio.sleep(0)
+        self.assertEqual(controller.queue_depth, 1)
+
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+        self.assertEqual(controller.queue_depth, 0)
+
+        release.set()
+        await holder
+        async with controller.admit("noid", Deadline(5)) as waited:
+            self.assertEqual(waited, 0.0)
+        self.assertEqual(order, ["synqra"])
+
+    async def test_unknown_products_are_pooled_in_stats(self) -> None:
+        controller = AdmissionController()
+
+        async with controller.admit("some-client-supplied-name", Deadline(5)):
+            pass
+
+        self.assertEqual(controller.stats()["outcomes"], {"other": {"admitted": 1}})
+        self.assertEqual(controller.priority_for("some-client-supplied-name"), 3)
+
+
+class OverloadTests(unittest.TestCase):
+    def _overload(self, make_controller) -> tuple[dict[str, int], AdmissionController]:
+        clock = _Clock()
+        loop = _VirtualTimeLoop(clock)
+        try:
+            controller = make_controller(clock)
+            return loop.run_until_complete(self._drive(controller, clock)), controller
+        finally:
+            loop.close()
+
+    async def _drive(self, controller: AdmissionController, clock: _Clock) -> dict[str, int]:
+        results = {"in_time": 0, "late": 0, "rejected": 0}
+
+        async def request(index: int) -> None:
+            deadline = Deadline(0.2, clock=clock)
+            try:
+                async with controller.admit("noid" if index % 2 else "synqra", deadline):
+                    # Four workers' worth of capacity, however many are admitted.
+                    async with workers:
+                        await asyncio.sleep(0.02)
+            except HTTPException:
+                results["rejected"] += 1
+                return
+            results["late" if deadline.expired() else "in_time"] += 1
+
+        workers = asyncio.Semaphore(4)
+        # A request a millisecond: five times what four 20ms workers can serve.
+        tasks = []
+        for index in range(300):
+            tasks.append(asyncio.create_task(request(index)))
+            await asyncio.sleep(0.001)
+        await asyncio.gather(*tasks)
+        return results
+
+    def test_overload_spends_capacity_on_requests_that_meet_their_deadline(self) -> None:
+        unshed, _ = self._overload(lambda clock: AdmissionController(enabled=False, clock=clock))
+        shed, controller = self._overload(
+            lambda clock: AdmissionController(max_concurrency=4, max_queue=64, clock=clock)
+        )
+
+        # Without admission everything queues and most answers arrive after the deadline.
+        self.assertGreater(unshed["late"], unshed["in_time"])
+        # With it nothing admitted misses its deadline and nearly twice as many are served in time.
+        self.assertEqual(shed["late"], 0)
+        self.assertGreater(shed["in_time"], 3 * unshed["in_time"] // 2)
+        self.assertEqual(controller.in_flight, 0)
+        self.assertEqual(controller.queue_depth, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
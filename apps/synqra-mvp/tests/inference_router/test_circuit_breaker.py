@@ -0,0 +1,130 @@
+import unittest
+
+from services.inference_router.circuit_breaker import CircuitBreaker, CircuitBreakerRegistry
+from services.inference_router.providers import ProviderError
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _breaker(clock: _Clock, **kwargs) -> CircuitBreaker:
+    options = {"min_calls": 4, "error_rate_threshold": 0.5, "open_seconds": 10, "clock": clock}
+    options.update(kwargs)
+    return CircuitBreaker("ollama", **options)
+
+
+class CircuitBreakerTests(unittest.IsolatedAsyncioTestCase):
+    def test_opens_on_error_rate_once_min_calls_seen(self) -> None:
+        clock = _Clock()
+        breaker = _breaker(clock)
+
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_success(0.1)
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.status()["retry_after_seconds"], 10)
+
+    def test_old_failures_age_out_of_window(self) -> None:
+        clock = _Clock()
+        breaker = _breaker(clock, window_seconds=5)
+        for _ in range(3):
+            breaker.record_failure()
+        clock.now += 6
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, "closed")
+        self.assertEqual(breaker.status()["window_calls"], 1)
+
+    def test_slow_calls_open_breaker(self) -> None:
+        clock = _Clock()
+        breaker = _breaker(clock, slow_call_seconds=1.0, slow_call_rate_threshold=0.75)
+        for latency in (2.0, 2.0, 0.1, 2.0):
+            breaker.record_success(latency)
+
+        self.assertEqual(breaker.state, "open")
+
+    def test_consecutive_rate_limits_open_immediately(self) -> None:
+        clock = _Clock()
+        breaker = _breaker(clock, rate_limit_threshold=2, min_calls=100)
+        breaker.record_rate_limited()
+        breaker.record_success(0.1)
+        breaker.record_rate_limited()
+        self.assertEqual(breaker.state, "closed")
+
+        breaker.record_rate_limited()
+        self.assertEqual(breaker.state, "open")
+
+    def test_half_open_limits_probes_and_closes_after_successes(self) -> None:
+        clock = _Clock()
+        breaker = _breaker(clock, min_calls=1, half_open_probes=2)
+        breaker.record_failure()
+        clock.now += 10
+
+        self.assertEqual(breaker.state, "half_open")
+        self.assertTrue(breaker.allow())
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        self.assertTrue(breaker.is_open())
+
+        breaker.record_success(0.1)
+        self.assertEqual(breaker.state, "half_open")
+        breaker.record_success(0.1)
+        self.assertEqual(breaker.state, "closed")
+
+    def test_failed_probe_reopens(self) -> None:
+        clock = _Clock()
+        breaker = _breaker(clock, min_calls=1)
+        breaker.record_failure()
+        clock.now += 10
+
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, "open")
+        self.assertEqual(breaker.status()["opened"], 2)
+
+    def test_unreported_probe_does_not_wedge_half_open(self) -> None:
+        clock = _Clock()
+        breaker = _breaker(clock, min_calls=1)
+        breaker.record_failure()
+        clock.now += 10
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+        clock.now += 10
+        self.assertTrue(breaker.allow())
+
+    async def test_track_classifies_outcomes(self) -> None:
+        clock = _Clock()
+        breaker = _breaker(clock, min_calls=1, rate_limit_threshold=5)
+
+        with self.assertRaises(ProviderError):
+            async with breaker.track():
+                raise ProviderError("ollama", "bad prompt", 400)
+        self.assertEqual(breaker.state, "closed")
+
+        with self.assertRaises(ProviderError):
+            async with breaker.track():
+                raise ProviderError("ollama", "down", 503)
+        self.assertEqual(breaker.state, "open")
+
+    def test_registry_applies_overrides(self) -> None:
+        registry = CircuitBreakerRegistry({"groq": {"open_seconds": 60}}, open_seconds=30)
+
+        self.assertEqual(registry.get("groq").open_seconds, 60)
+        self.assertEqual(registry.get("kie").open_seconds, 30)
+        self.assertIs(registry.get("kie"), registry.get("kie"))
+        self.assertEqual(sorted(registry.status()), ["groq", "kie"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+
+from services.inference_router.claude_budget import ClaudeBudget
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _FakeCache:
+    claude_cap_ratio = 0.1
+
+    def __init__(self, allowance: int) -> None:
+        self.allowance = allowance
+        self.lease_calls: list[tuple[int, str | None, int]] = []
+        self.returned: list[tuple[str, int]] = []
+        self.released: list[str] = []
+        self.direct_reserves = 0
+
+    async def lease_claude_requests(self, requested, *, cap_ratio, return_bucket, return_count):
+        self.lease_calls.append((requested, return_bucket, return_count))
+        self.allowance += return_count
+        granted = min(requested, self.allowance)
+        self.allowance -= granted
+        return granted, 100, 0, 0.01, "42"
+
+    async def return_claude_requests(self, bucket: str, count: int) -> None:
+        self.returned.append((bucket, count))
+
+    async def release_claude_reservation(self, member: str) -> None:
+        self.released.append(member)
+
+    async def try_reserve_claude_request(self, request_id: str):
+        self.direct_reserves += 1
+        return True, 100, 0, 0.01, "42"
+
+
+class ClaudeBudgetTests(unittest.IsolatedAsyncioTestCase):
+    async def test_spends_lease_locally_before_returning_to_redis(self) -> None:
+        cache = _FakeCache(allowance=10)
+        budget = ClaudeBudget(cache, lease_size=5)
+
+        results = [await budget.reserve(f"r{i}") for i in range(6)]
+
+        self.assertTrue(all(result[0] for result in results))
+        self.assertEqual(len(cache.lease_calls), 2)
+        self.assertEqual(budget.stats()["spent_locally"], 6)
+
+    async def test_denies_when_redis_grants_nothing(self) -> None:
+        budget = ClaudeBudget(_FakeCache(allowance=0), lease_size=5)
+        allowed, *_, member = await budget.reserve("r1")
+        self.assertFalse(allowed)
+        self.assertIsNone(member)
+
+    async def test_expired_lease_leftovers_are_returned_with_next_lease(self) -> None:
+        clock = _Clock()
+        cache = _FakeCache(allowance=10)
+        budget = ClaudeBudget(cache, lease_size=5, lease_seconds=30, clock=clock)
+
+        await budget.reserve("r1")
+        clock.now = 31
+        await budget.reserve("r2")
+
+        self.assertEqual(cache.lease_calls[1], (5, "42", 4))
+        self.assertEqual(budget.stats()["returned"], 4)
+
+    async def test_failed_call_refunds_to_active_lease(self) -> None:
+        cache = _FakeCache(allowance=10)
+        budget = ClaudeBudget(cache, lease_size=5)
+
+        *_, member = await budget.reserve("r1")
+        await budget.release(member)
+
+        self.assertEqual(cache.released, [])
+        self.assertEqual(budget.stats()["remaining"], 5)
+
+    async def test_close_returns_unused_reservations(self) -> None:
+        cache = _FakeCache(allowance=10)
+        budget = ClaudeBudget(cache, lease_size=5)
+
+        await budget.reserve("r1")
+        await budget.close()
+
+        self.assertEqual(cache.returned, [("42", 4)])
+
+    async def test_disabled_reserves_directly(self) -> None:
+        cache = _FakeCache(allowance=10)
+        budget = ClaudeBudget(cache, lease_size=0)
+
+        await budget.reserve("r1")
+
+        self.assertEqual(cache.direct_reserves, 1)
+        self.assertEqual(cache.lease_calls, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
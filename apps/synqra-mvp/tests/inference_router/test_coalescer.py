@@ -0,0 +1,70 @@
+import asyncio
+import unittest
+
+from services.inference_router.coalescer import RequestCoalescer
+
+
+class RequestCoalescerTests(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_callers_share_one_computation(self) -> None:
+        coalescer = RequestCoalescer()
+        calls = {"count": 0}
+        release = asyncio.Event()
+
+        async def work() -> str:
+            calls["count"] += 1
+            await release.wait()
+            return "done"
+
+        tasks = [asyncio.create_task(coalescer.run("sig", work)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*tasks)
+
+        self.assertEqual(calls["count"], 1)
+        self.assertEqual([value for value, _ in results], ["done"] * 5)
+        self.assertEqual(sum(1 for _, coalesced in results if coalesced), 4)
+        self.assertEqual(coalescer.stats()["local_coalesced"], 4)
+        self.assertEqual(coalescer.stats()["in_flight"], 0)
+
+    async def test_errors_propagate_to_every_caller(self) -> None:
+        coalescer = RequestCoalescer()
+
+        async def work() -> str:
+            await asyncio.sleep(0)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(
+            coalescer.run("sig", work), coalescer.run("sig", work), return_exceptions=True
+        )
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+
+    async def test_cancelled_caller_does_not_cancel_shared_work(self) -> None:
+        coalescer = RequestCoalescer()
+        release = asyncio.Event()
+
+        async def work() -> str:
+            await release.wait()
+            return "done"
+
+        leader = asyncio.create_task(coalescer.run("sig", work))
+        follower = asyncio.create_task(coalescer.run("sig", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        release.set()
+
+        self.assertEqual(await follower, ("done", True))
+
+    async def test_disabled_runs_every_caller(self) -> None:
+        coalescer = RequestCoalescer(enabled=False)
+        calls = {"count": 0}
+
+        async def work() -> int:
+            calls["count"] += 1
+            return calls["count"]
+
+        await asyncio.gather(coalescer.run("sig", work), coalescer.run("sig", work))
+        self.assertEqual(calls["count"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+import asyncio
+import unittest
+
+import httpx
+
+from services.inference_router.concurrency_limiter import AdaptiveLimiter
+from services.inference_router.providers import ProviderClients, ProviderError
+
+
+class AdaptiveLimiterTests(unittest.IsolatedAsyncioTestCase):
+    async def test_queues_beyond_limit_in_fifo_order(self) -> None:
+        limiter = AdaptiveLimiter("ollama", initial_limit=2, max_limit=2)
+        release = asyncio.Event()
+        order: list[int] = []
+
+        async def work(index: int) -> None:
+            async with limiter.acquire(observe_latency=False):
+                order.append(index)
+                await release.wait()
+
+        tasks = [asyncio.create_task(work(index)) for index in range(4)]
+        await asyncio.sleep(0)
+        self.assertEqual(limiter.status()["in_flight"], 2)
+        self.assertEqual(limiter.status()["queue_depth"], 2)
+
+        release.set()
+        await asyncio.gather(*tasks)
+        self.assertEqual(order, [0, 1, 2, 3])
+        self.assertEqual(limiter.status()["in_flight"], 0)
+
+    async def test_reports_queue_wait_for_every_acquisition(self) -> None:
+        waits: list[tuple[str, float]] = []
+        limiter = AdaptiveLimiter(
+            "ollama", initial_limit=1, max_limit=1, on_wait=lambda name, seconds: waits.append((name, seconds))
+        )
+
+        async def work() -> None:
+            async with limiter.acquire(observe_latency=False):
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(work(), work())
+
+        self.assertEqual([name for name, _ in waits], ["ollama", "ollama"])
+        self.assertEqual(waits[0][1], 0.0)
+        self.assertGreater(waits[1][1], 0.005)
+
+    async def test_grows_while_saturated_and_latency_flat(self) -> None:
+        limiter = AdaptiveLimiter("groq", initial_limit=1, max_limit=4)
+
+        async def work() -> None:
+            async with limiter.acquire():
+                await asyncio.sleep(0.001)
+
+        for _ in range(10):
+            await asyncio.gather(*(work() for _ in range(4)))
+
+        self.assertGreater(limiter.limit, 2)
+        self.assertLessEqual(limiter.limit, 4)
+
+    async def test_backs_off_on_failures_but_not_below_min(self) -> None:
+        limiter = AdaptiveLimiter("kie", initial_limit=10, min_limit=2, backoff_ratio=0.5)
+
+        for _ in range(10):
+            with self.assertRaises(RuntimeError):
+                async with limiter.acquire():
+                    raise RuntimeError("boom")
+
+        self.assertEqual(limiter.limit, 2)
+        self.assertEqual(limiter.status()["failures"], 10)
+
+    async def test_backoff_interval_stops_a_failure_burst_collapsing_the_limit(self) -> None:
+        limiter = AdaptiveLimiter("groq", initial_limit=64, max_limit=64, backoff_interval_seconds=60)
+
+        for _ in range(10):
+            with self.assertRaises(RuntimeError):
+                async with limiter.acquire(observe_latency=False):
+                    raise RuntimeError("503")
+
+        self.assertAlmostEqual(limiter.limit, 64 * 0.9)
+        self.assertEqual(limiter.status()["backoffs"], 1)
+
+    async def test_grows_back_without_latency_samples(self) -> None:
+        limiter = AdaptiveLimiter("groq", initial_limit=2, max_limit=4)
+
+        async def work() -> None:
+            async with limiter.acquire(observe_latency=False):
+                await asyncio.sleep(0.001)
+
+        for _ in range(10):
+            await asyncio.gather(*(work() for _ in range(4)))
+
+        self.assertGreater(limiter.limit, 3)
+        self.assertIsNone(limiter.baseline_latency)
+
+    async def test_ignored_failures_do_not_back_off(self) -> None:
+        limiter = AdaptiveLimiter("claude", initial_limit=4, is_failure=lambda exc: False)
+
+        with self.assertRaises(ValueError):
+            async with limiter.acquire():
+                raise ValueError("client error")
+
+        self.assertEqual(limiter.limit, 4)
+
+    async def test_cancelled_waiter_leaves_queue(self) -> None:
+        limiter = AdaptiveLimiter("ollama", initial_limit=1, max_limit=1)
+        release = asyncio.Event()
+
+        async def hold() -> None:
+            async with limiter.acquire(observe_latency=False):
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+
+        self.assertEqual(limiter.queue_depth, 0)
+        release.set()
+        await holder
+        self.assertEqual(limiter.in_flight, 0)
+
+
+def _providers(**kwargs) -> ProviderClients:
+    options = {
+        "groq_api_key": "key",
+        "groq_model": "m",
+        "groq_timeout_seconds": 8.0,
+        "ollama_base_url": "http://ollama",
+        "ollama_model": "m",
+        "ollama_max_concurrency": 2,
+        "claude_api_key": "key",
+        "claude_model": "m",
+        "kie_api_key": "key",
+        "kie_base_url": "http://kie",
+    }
+    options.update(kwargs)
+    return ProviderClients(**options)
+
+
+class ProviderLimiterTests(unittest.IsolatedAsyncioTestCase):
+    async def test_hosted_providers_start_at_their_ceiling(self) -> None:
+        providers = _providers(initial_concurrency={"claude": 4})
+        await providers.close()
+
+        limits = {name: status["limit"] for name, status in providers.limiter_status().items()}
+        self.assertEqual(limits, {"groq": 64, "ollama": 2, "claude": 4, "kie": 16})
+
+    async def test_long_completions_do_not_narrow_the_hosted_limit(self) -> None:
+        providers = _providers()
+        status_codes = [200, 200, 503]
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            code = status_codes.pop(0)
+            # A short answer, then one twenty times longer.
+            await asyncio.sleep(0.005 if len(status_codes) == 2 else 0.1)
+            return httpx.Response(code, json={"choices": [{"message": {"content": "x"}}]})
+
+        await providers._client.aclose()
+        providers._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        await providers.call_groq("short")
+        await providers.call_groq("long")
+        self.assertEqual(providers.limiters["groq"].limit, 64)
+
+        with self.assertRaises(ProviderError):
+            await providers.call_groq("overloaded")
+        await providers.close()
+        self.assertLess(providers.limiters["groq"].limit, 64)
+
+
+if __name__ == "__main__":
+    unittest.main()
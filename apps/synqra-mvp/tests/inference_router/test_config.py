@@ -0,0 +1,17 @@
+import unittest
+
+from services.inference_router.config import parse_limits
+
+
+class ParseLimitsTests(unittest.TestCase):
+    def test_parses_named_values(self) -> None:
+        self.assertEqual(parse_limits("groq=64, Ollama = 20"), {"groq": 64, "ollama": 20})
+        self.assertEqual(parse_limits("http.request=0.1", float), {"http.request": 0.1})
+
+    def test_skips_blank_and_incomplete_items(self) -> None:
+        self.assertEqual(parse_limits(""), {})
+        self.assertEqual(parse_limits("groq=,=5,,kie=3"), {"kie": 3})
+
+
+if __name__ == "__main__":
+    unittest.main()
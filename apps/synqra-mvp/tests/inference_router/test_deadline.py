@@ -0,0 +1,62 @@
+import unittest
+
+from services.inference_router.deadline import Deadline
+from services.inference_router.providers import DeadlineExceeded, ProviderClients
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 50.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _providers() -> ProviderClients:
+    return ProviderClients(
+        groq_api_key="key",
+        groq_model="m",
+        groq_timeout_seconds=8.0,
+        ollama_base_url="http://ollama",
+        ollama_model="m",
+        ollama_max_concurrency=2,
+        claude_api_key="key",
+        claude_model="m",
+        kie_api_key=None,
+        kie_base_url="http://kie",
+    )
+
+
+class DeadlineTests(unittest.IsolatedAsyncioTestCase):
+    def test_budget_is_capped_by_remaining_time(self) -> None:
+        clock = _Clock()
+        deadline = Deadline(10, clock=clock)
+
+        self.assertEqual(deadline.budget(8.0), 8.0)
+        clock.now += 7
+        self.assertEqual(deadline.budget(8.0), 3.0)
+        clock.now += 4
+        self.assertEqual(deadline.remaining(), 0.0)
+        self.assertTrue(deadline.expired())
+
+    async def test_time_budget_skips_hops_that_cannot_finish(self) -> None:
+        clock = _Clock()
+        deadline = Deadline(1.5, clock=clock)
+        providers = _providers()
+        try:
+            self.assertEqual(providers.time_budget("groq", None), 8.0)
+            self.assertEqual(providers.time_budget("groq", deadline), 1.5)
+            self.assertEqual(providers.time_budget("ollama", deadline), 1.5)
+            self.assertIsNone(providers.time_budget("claude", deadline))
+
+            providers.limiters["ollama"]._baseline = 2.0
+            self.assertIsNone(providers.time_budget("ollama", deadline))
+
+            with self.assertRaises(DeadlineExceeded):
+                await providers.call_claude("hello", deadline)
+        finally:
+            await providers.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
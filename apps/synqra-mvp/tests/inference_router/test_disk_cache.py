@@ -0,0 +1,123 @@
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+
+from services.inference_router.disk_cache import DiskResultCache
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _FailingInserts:
+    """Connection stand-in whose INSERTs fail, forcing the write transaction to roll back."""
+
+    def __init__(self, db: sqlite3.Connection) -> None:
+        self.db = db
+
+    def execute(self, *args):
+        return self.db.execute(*args)
+
+    def executemany(self, sql: str, rows):
+        if sql.startswith("INSERT"):
+            raise sqlite3.OperationalError("disk I/O error")
+        return self.db.executemany(sql, rows)
+
+
+class DiskResultCacheTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "l2", "cache.db")
+        self.clock = _Clock()
+
+    async def asyncTearDown(self) -> None:
+        self.directory.cleanup()
+
+    def _cache(self, **options) -> DiskResultCache:
+        return DiskResultCache(self.path, clock=self.clock, **options)
+
+    async def test_survives_restart(self) -> None:
+        cache = self._cache()
+        cache.put("sig", {"output": "persisted"})
+        await cache.close()
+
+        reopened = self._cache()
+        try:
+            self.assertEqual(await reopened.get("sig"), {"output": "persisted"})
+            self.assertEqual(reopened.stats()["hits"], 1)
+        finally:
+            await reopened.close()
+
+    async def test_entries_expire(self) -> None:
+        cache = self._cache(ttl_seconds=60)
+        try:
+            cache.put("sig", {"output": "x"})
+            await cache.flush()
+
+            self.clock.now += 60
+            self.assertIsNone(await cache.get("sig"))
+            self.assertEqual(cache.stats()["expirations"], 1)
+        finally:
+            await cache.close()
+
+    async def test_evicts_least_recently_read_over_size_budget(self) -> None:
+        rng = random.Random(1)
+        cache = self._cache(max_bytes=200)
+        try:
+            for name in ("sig-0", "sig-1"):
+                self.clock.now += 1
+                cache.put(name, {"output": "%x" % rng.getrandbits(256)})
+                await cache.flush()
+            self.clock.now += 1
+            await cache.get("sig-0")
+
+            self.clock.now += 1
+            cache.put("sig-2", {"output": "%x" % rng.getrandbits(256)})
+            await cache.flush()
+
+            found = await cache.get_many(["sig-0", "sig-1", "sig-2"])
+            self.assertEqual(sorted(found), ["sig-0", "sig-2"])
+            self.assertLessEqual(cache.stats()["bytes"], 200)
+            self.assertEqual(cache.stats()["evictions"], 1)
+        finally:
+            await cache.close()
+
+    async def test_full_queue_drops_writes(self) -> None:
+        cache = self._cache(max_pending_writes=1)
+        try:
+            cache.put("a", {"output": "a"})
+            cache.put("b", {"output": "b"})
+
+            self.assertEqual(cache.stats()["dropped_writes"], 1)
+            await cache.flush()
+            self.assertEqual(await cache.get("a"), {"output": "a"})
+        finally:
+            await cache.close()
+
+    async def test_rolled_back_write_leaves_the_byte_count_alone(self) -> None:
+        cache = self._cache()
+        try:
+            cache.put("sig", {"output": "kept"})
+            await cache.flush()
+            stored = cache.stats()["bytes"]
+            db = cache._db
+            cache._connection = lambda: _FailingInserts(db)
+
+            cache.put("sig", {"output": "replacement"})
+            await cache.flush()
+
+            self.assertEqual(cache.stats()["errors"], 1)
+            self.assertEqual(cache.stats()["bytes"], stored)
+            self.assertEqual(await cache.get("sig"), {"output": "kept"})
+        finally:
+            await cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
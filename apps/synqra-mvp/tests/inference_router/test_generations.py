@@ -0,0 +1,93 @@
+import asyncio
+import unittest
+
+from services.inference_router.generations import CacheGenerations
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _Store:
+    def __init__(self) -> None:
+        self.values: dict[str, int] = {}
+        self.reads = 0
+
+    async def get_generations(self) -> dict[str, int]:
+        self.reads += 1
+        return dict(self.values)
+
+    async def bump_generation(self, field: str) -> int:
+        self.values[field] = self.values.get(field, 0) + 1
+        return self.values[field]
+
+
+class CacheGenerationsTests(unittest.IsolatedAsyncioTestCase):
+    async def test_key_is_empty_until_something_is_bumped(self) -> None:
+        generations = CacheGenerations(_Store())
+        await generations.refresh()
+
+        self.assertEqual(generations.key_for("synqra", "synqra_voice"), "")
+
+    async def test_bump_changes_only_covered_keys(self) -> None:
+        generations = CacheGenerations(_Store())
+        await generations.refresh()
+
+        await generations.bump("product", "Synqra")
+        self.assertEqual(generations.key_for("synqra", "plain"), "g0.1.0")
+        self.assertEqual(generations.key_for("aurafx", "plain"), "")
+
+        await generations.bump("template", "plain")
+        await generations.bump("global")
+        self.assertEqual(generations.key_for("aurafx", "plain"), "g1.0.1")
+
+    async def test_other_processes_bumps_are_picked_up_after_refresh_interval(self) -> None:
+        store = _Store()
+        clock = _Clock()
+        generations = CacheGenerations(store, refresh_seconds=1.0, clock=clock)
+        await generations.refresh()
+        store.values["product:noid"] = 3
+
+        self.assertEqual(generations.key_for("noid", "plain"), "")
+        self.assertEqual(store.reads, 1)
+
+        clock.now = 1.0
+        generations.key_for("noid", "plain")
+        await generations.close()
+        self.assertEqual(generations.key_for("noid", "plain"), "g0.3.0")
+        self.assertEqual(store.reads, 2)
+
+    async def test_refresh_started_before_a_bump_does_not_undo_it(self) -> None:
+        store = _Store()
+        generations = CacheGenerations(store)
+        await generations.refresh()
+        stale_read = asyncio.Event()
+        original = store.get_generations
+
+        async def slow_read() -> dict[str, int]:
+            values = await original()
+            await stale_read.wait()
+            return values
+
+        store.get_generations = slow_read
+        refreshing = asyncio.create_task(generations.refresh())
+        await asyncio.sleep(0)
+        await generations.bump("product", "synqra")
+        stale_read.set()
+        await refreshing
+
+        self.assertEqual(generations.key_for("synqra", "plain"), "g0.1.0")
+
+    def test_rejects_unknown_scope_and_missing_name(self) -> None:
+        with self.assertRaises(ValueError):
+            CacheGenerations.field("tenant", "x")
+        with self.assertRaises(ValueError):
+            CacheGenerations.field("product")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+from services.inference_router.hedging import HedgePolicy, LatencyTracker
+
+
+class LatencyTrackerTests(unittest.TestCase):
+    def test_percentile_over_bounded_window(self) -> None:
+        tracker = LatencyTracker(window=100)
+        for value in range(1, 201):
+            tracker.observe(float(value))
+
+        self.assertEqual(len(tracker), 100)
+        self.assertEqual(tracker.percentile(0.0), 101.0)
+        self.assertEqual(tracker.percentile(0.95), 195.0)
+
+    def test_empty_tracker_has_no_percentile(self) -> None:
+        self.assertIsNone(LatencyTracker().percentile(0.95))
+
+
+class HedgePolicyTests(unittest.TestCase):
+    def test_disabled_policy_never_delays(self) -> None:
+        self.assertIsNone(HedgePolicy(enabled=False).delay_seconds())
+
+    def test_delay_uses_default_until_enough_samples(self) -> None:
+        policy = HedgePolicy(enabled=True, default_delay_seconds=2.0, min_samples=3)
+        self.assertEqual(policy.delay_seconds(), 2.0)
+
+        for value in (0.4, 0.5, 0.6):
+            policy.observe_primary(value)
+        self.assertEqual(policy.delay_seconds(), 0.6)
+
+    def test_delay_is_clamped(self) -> None:
+        policy = HedgePolicy(enabled=True, min_delay_seconds=0.5, max_delay_seconds=1.0, min_samples=1)
+        policy.observe_primary(0.01)
+        self.assertEqual(policy.delay_seconds(), 0.5)
+        policy.primary_latency = LatencyTracker()
+        policy.observe_primary(30.0)
+        self.assertEqual(policy.delay_seconds(), 1.0)
+
+    def test_hedge_rate_is_capped(self) -> None:
+        policy = HedgePolicy(enabled=True, max_hedge_ratio=0.1, burst=1.0)
+        policy._tokens = 0.0
+
+        granted = 0
+        for _ in range(100):
+            policy.delay_seconds()
+            granted += policy.try_acquire()
+
+        self.assertEqual(granted, 10)
+        self.assertEqual(policy.stats()["hedges_denied"], 90)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+from services.inference_router.local_cache import LocalResultCache
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class LocalResultCacheTests(unittest.TestCase):
+    def test_hit_then_expire(self) -> None:
+        clock = _Clock()
+        cache = LocalResultCache(max_entries=4, max_bytes=1024, ttl_seconds=10, clock=clock)
+
+        cache.set("a", {"output": "x"}, size_bytes=10)
+        self.assertEqual(cache.get("a"), {"output": "x"})
+
+        clock.now = 10.0
+        self.assertIsNone(cache.get("a"))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["expirations"]), (1, 1, 1))
+        self.assertEqual(stats["bytes"], 0)
+
+    def test_ttl_is_capped_by_remaining_redis_ttl(self) -> None:
+        clock = _Clock()
+        cache = LocalResultCache(max_entries=4, max_bytes=1024, ttl_seconds=60, clock=clock)
+
+        cache.set("a", {"output": "x"}, size_bytes=10, ttl_seconds=2)
+        clock.now = 2.5
+        self.assertIsNone(cache.get("a"))
+
+    def test_evicts_least_recently_used_by_count(self) -> None:
+        cache = LocalResultCache(max_entries=2, max_bytes=1024, ttl_seconds=60)
+
+        cache.set("a", 1, size_bytes=1)
+        cache.set("b", 2, size_bytes=1)
+        cache.get("a")
+        cache.set("c", 3, size_bytes=1)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_evicts_by_bytes_and_skips_oversized_values(self) -> None:
+        cache = LocalResultCache(max_entries=10, max_bytes=100, ttl_seconds=60)
+
+        cache.set("a", 1, size_bytes=60)
+        cache.set("b", 2, size_bytes=60)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("b"), 2)
+
+        cache.set("huge", 3, size_bytes=101)
+        self.assertIsNone(cache.get("huge"))
+        self.assertEqual(cache.stats()["bytes"], 60)
+
+    def test_disabled_cache_stores_nothing(self) -> None:
+        cache = LocalResultCache(max_entries=0)
+        cache.set("a", 1, size_bytes=1)
+        self.assertEqual(len(cache), 0)
+        self.assertFalse(cache.stats()["enabled"])
+
+
+if __name__ == "__main__":
+    unittest.main()
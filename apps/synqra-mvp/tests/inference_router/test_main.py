@@ -0,0 +1,196 @@
+import unittest
+from unittest import mock
+
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from services.inference_router import main
+from tests.inference_router.test_router import _build_router
+
+
+class StreamEndpointTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.router, self.cache, self.providers = _build_router()
+        main.app.state.router = self.router
+        self.client = TestClient(main.app)
+
+    def test_streams_server_sent_events(self) -> None:
+        response = self.client.post("/infer/stream", json={"product": "aurafx", "prompt": "hello"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        blocks = [block for block in response.text.split("\n\n") if block]
+        self.assertEqual([block.split("\n")[0] for block in blocks], ["event: token", "event: token", "event: done"])
+        self.assertIn('"provider":"groq"', blocks[-1])
+
+    def test_errors_before_first_token_use_http_status(self) -> None:
+        response = self.client.post("/infer/stream", json={"product": "aurafx"})
+        self.assertEqual(response.status_code, 422)
+
+
+class BatchEndpointTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.router, self.cache, self.providers = _build_router()
+        main.app.state.router = self.router
+        self.client = TestClient(main.app)
+
+    def test_returns_results_in_request_order(self) -> None:
+        response = self.client.post(
+            "/infer/batch",
+            json={"items": [{"product": "aurafx", "prompt": "a"}, {"product": "aurafx"}, {"product": "aurafx", "prompt": "a"}]},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([result["index"] for result in results], [0, 1, 2])
+        self.assertEqual(results[1]["error"]["status_code"], 422)
+        self.assertTrue(results[2]["response"]["deduped"])
+        self.assertEqual(self.providers.calls, ["groq"])
+
+    def test_streams_ndjson_when_requested(self) -> None:
+        response = self.client.post(
+            "/infer/batch",
+            json={"items": [{"product": "aurafx", "prompt": "a"}, {"product": "aurafx", "prompt": "b"}], "stream": True},
+        )
+
+        lines = [line for line in response.text.splitlines() if line]
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(response.headers["content-type"].startswith("application/x-ndjson"))
+
+    def test_tripped_memory_guard_rejects_streamed_batch_with_503(self) -> None:
+        tripped = HTTPException(status_code=503, detail="Insufficient free RAM: 0MB available")
+        with mock.patch.object(self.router.memory_guard, "enforce", side_effect=tripped):
+            response = self.client.post(
+                "/infer/batch",
+                json={"items": [{"product": "aurafx", "prompt": "a"}], "stream": True},
+            )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.providers.calls, [])
+
+    def test_streamed_batch_reports_a_failure_on_every_unfinished_item(self) -> None:
+        with mock.patch.object(self.router.redis_cache, "get_cached_many", side_effect=RuntimeError("boom")):
+            response = self.client.post(
+                "/infer/batch",
+                json={"items": [{"product": "aurafx", "prompt": "a"}, {"product": "aurafx", "prompt": "b"}], "stream": True},
+            )
+
+        self.assertEqual(response.status_code, 200)
+        lines = [line for line in response.text.splitlines() if line]
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(all('"status_code":502' in line for line in lines))
+
+
+class MetricsEndpointTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.router, self.cache, self.providers = _build_router()
+        main.app.state.router = self.router
+        self.client = TestClient(main.app)
+
+    def test_exposes_prometheus_text(self) -> None:
+        self.client.post("/infer", json={"product": "aurafx", "prompt": "hello"})
+
+        response = self.client.get("/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn("# TYPE inference_stage_seconds histogram", response.text)
+        self.assertIn('inference_request_seconds_count{source="provider"} 1', response.text)
+
+
+class ServerTimingTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.router, self.cache, self.providers = _build_router()
+        main.app.state.router = self.router
+        self.client = TestClient(main.app)
+
+    def test_infer_returns_server_timing_header(self) -> None:
+        response = self.client.post("/infer", json={"product": "aurafx", "prompt": "hello"})
+
+        self.assertEqual(response.status_code, 200)
+        names = [metric.split(";")[0] for metric in response.headers["server-timing"].split(", ")]
+        for name in ("memory_guard", "signature", "local_cache", "admit", "groq", "execute", "serialize"):
+            self.assertIn(name, names)
+        self.assertIn('groq;dur=', response.headers["server-timing"])
+        self.assertNotIn("debug", response.json())
+
+    def test_null_fields_are_kept(self) -> None:
+        async def route_request(**kwargs):
+            return {
+                "request_id": kwargs["request_id"],
+                "provider": "kie",
+                "route": "media",
+                "output": None,
+                "cached": False,
+                "deduped": False,
+                "claude_escalated": False,
+            }
+
+        self.router.route_request = route_request
+        response = self.client.post("/infer", json={"product": "aurafx", "prompt": "hello"})
+
+        self.assertIn("output", response.json())
+        self.assertIsNone(response.json()["output"])
+        self.assertNotIn("debug", response.json())
+
+    def test_batch_items_carry_no_debug_field(self) -> None:
+        for stream in (False, True):
+            response = self.client.post(
+                "/infer/batch", json={"items": [{"product": "aurafx", "prompt": "a"}], "stream": stream}
+            )
+            self.assertNotIn('"debug"', response.text)
+
+    def test_debug_field_is_opt_in(self) -> None:
+        response = self.client.post("/infer?debug=true", json={"product": "aurafx", "prompt": "hello"})
+
+        timings = response.json()["debug"]["timings"]
+        groq = next(entry for entry in timings if entry["name"] == "groq")
+        self.assertEqual(groq["description"], "ok")
+        self.assertGreaterEqual(groq["duration_ms"], 0)
+
+    def test_stream_header_covers_time_to_first_token(self) -> None:
+        response = self.client.post("/infer/stream", json={"product": "aurafx", "prompt": "hello"})
+
+        self.assertIn("admit;dur=", response.headers["server-timing"])
+
+
+class AdminEndpointTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.router, self.cache, self.providers = _build_router()
+        main.app.state.router = self.router
+        self.client = TestClient(main.app)
+        self.original_token = main.ADMIN_TOKEN
+        main.ADMIN_TOKEN = "secret"
+
+    def tearDown(self) -> None:
+        main.ADMIN_TOKEN = self.original_token
+
+    def test_bump_requires_token(self) -> None:
+        response = self.client.post("/admin/cache/generations", json={"scope": "global"})
+        self.assertEqual(response.status_code, 401)
+
+    def test_bump_then_report(self) -> None:
+        headers = {"x-admin-token": "secret"}
+        response = self.client.post(
+            "/admin/cache/generations", json={"scope": "product", "name": "synqra"}, headers=headers
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["generation"], 1)
+
+        report = self.client.get("/admin/cache", headers=headers).json()
+        self.assertEqual(report["generations"], {"product:synqra": 1})
+
+    def test_missing_name_is_rejected(self) -> None:
+        response = self.client.post(
+            "/admin/cache/generations", json={"scope": "template"}, headers={"x-admin-token": "secret"}
+        )
+        self.assertEqual(response.status_code, 422)
+
+    def test_disabled_without_configured_token(self) -> None:
+        main.ADMIN_TOKEN = ""
+        response = self.client.get("/admin/cache", headers={"x-admin-token": ""})
+        self.assertEqual(response.status_code, 403)
+
+
+if __name__ == "__main__":
+    unittest.main()
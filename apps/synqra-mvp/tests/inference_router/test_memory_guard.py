@@ -0,0 +1,107 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from fastapi import HTTPException
+
+from services.inference_router.memory_guard import MemoryGuard
+
+MB = 1024 * 1024
+
+
+class MemoryGuardTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        self.root = self._dir.name
+
+    def tearDown(self) -> None:
+        self._dir.cleanup()
+
+    def _write_cgroup(self, *, limit: str, current_mb: int, inactive_file_mb: int = 0) -> None:
+        files = {
+            "memory.max": limit,
+            "memory.current": str(current_mb * MB),
+            "memory.stat": f"anon 1\ninactive_file {inactive_file_mb * MB}\nactive_file 0\n",
+        }
+        for name, content in files.items():
+            with open(os.path.join(self.root, name), "w", encoding="ascii") as handle:
+                handle.write(content + "\n")
+
+    async def test_uses_cgroup_limit_minus_working_set(self) -> None:
+        self._write_cgroup(limit=str(1024 * MB), current_mb=900, inactive_file_mb=200)
+        guard = MemoryGuard(min_free_mb=100, cgroup_root=self.root)
+
+        guard.enforce()
+
+        snapshot = guard.snapshot()
+        self.assertEqual(snapshot["source"], "cgroup")
+        self.assertEqual(snapshot["limit_mb"], 1024)
+        self.assertEqual(snapshot["free_mb"], 324)
+        await guard.close()
+
+    async def test_falls_back_to_host_memory_without_a_limit(self) -> None:
+        self._write_cgroup(limit="max", current_mb=900)
+        guard = MemoryGuard(min_free_mb=100, cgroup_root=self.root)
+
+        with mock.patch("psutil.virtual_memory") as virtual_memory:
+            virtual_memory.return_value.available = 50 * MB
+            with self.assertRaises(HTTPException) as ctx:
+                guard.enforce()
+
+        self.assertEqual(ctx.exception.status_code, 503)
+        self.assertEqual(guard.snapshot()["source"], "host")
+        await guard.close()
+
+    async def test_enforce_reads_the_last_sample_only(self) -> None:
+        self._write_cgroup(limit=str(1024 * MB), current_mb=100)
+        guard = MemoryGuard(min_free_mb=100, sample_interval_seconds=60, cgroup_root=self.root)
+        guard.enforce()
+
+        with mock.patch.object(guard, "_read_cgroup", side_effect=AssertionError("sampled inline")):
+            for _ in range(100):
+                guard.enforce()
+        await guard.close()
+
+    async def test_hysteresis_needs_recovery_margin(self) -> None:
+        self._write_cgroup(limit=str(1000 * MB), current_mb=950)
+        guard = MemoryGuard(min_free_mb=100, recover_free_mb=200, cgroup_root=self.root)
+        guard.sample()
+        self.assertFalse(guard.healthy)
+
+        self._write_cgroup(limit=str(1000 * MB), current_mb=850)
+        guard.sample()
+        self.assertFalse(guard.healthy)
+
+        self._write_cgroup(limit=str(1000 * MB), current_mb=790)
+        guard.sample()
+        self.assertTrue(guard.healthy)
+        self.assertEqual(guard.trips, 1)
+
+    async def test_background_task_keeps_sampling(self) -> None:
+        self._write_cgroup(limit=str(1000 * MB), current_mb=100)
+        guard = MemoryGuard(min_free_mb=100, sample_interval_seconds=0.01, cgroup_root=self.root)
+        guard.enforce()
+
+        self._write_cgroup(limit=str(1000 * MB), current_mb=990)
+        await asyncio.sleep(0.05)
+
+        with self.assertRaises(HTTPException):
+            guard.enforce()
+        await guard.close()
+
+    async def test_unreadable_memory_keeps_last_verdict(self) -> None:
+        self._write_cgroup(limit=str(1000 * MB), current_mb=100)
+        guard = MemoryGuard(min_free_mb=100, cgroup_root=self.root)
+        guard.sample()
+        os.remove(os.path.join(self.root, "memory.current"))
+
+        guard.sample()
+
+        self.assertTrue(guard.healthy)
+        self.assertEqual(guard.sample_failures, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+
+from services.inference_router.metrics import Counter, MetricsRegistry, RouterMetrics
+
+
+class MetricsRegistryTests(unittest.TestCase):
+    def test_renders_counters_and_gauges_with_labels(self) -> None:
+        registry = MetricsRegistry()
+        hits = registry.counter("cache_hits_total", "Cache hits", ("tier",))
+        in_flight = registry.gauge("in_flight", "Requests in flight")
+
+        hits.labels("local").inc()
+        hits.labels("local").inc(2)
+        hits.labels('we"ird').inc()
+        in_flight.inc()
+        in_flight.dec(0.5)
+
+        text = registry.render()
+        self.assertIn("# TYPE cache_hits_total counter", text)
+        self.assertIn('cache_hits_total{tier="local"} 3', text)
+        self.assertIn('cache_hits_total{tier="we\\"ird"} 1', text)
+        self.assertIn("in_flight 0.5", text)
+        self.assertTrue(text.endswith("\n"))
+
+    def test_histogram_buckets_are_cumulative(self) -> None:
+        registry = MetricsRegistry()
+        latency = registry.histogram("latency_seconds", "Latency", ("stage",), buckets=(0.1, 1.0))
+
+        for value in (0.05, 0.1, 0.5, 3.0):
+            latency.labels("admit").observe(value)
+
+        text = registry.render()
+        self.assertIn('latency_seconds_bucket{stage="admit",le="0.1"} 2', text)
+        self.assertIn('latency_seconds_bucket{stage="admit",le="1"} 3', text)
+        self.assertIn('latency_seconds_bucket{stage="admit",le="+Inf"} 4', text)
+        self.assertIn('latency_seconds_sum{stage="admit"} 3.65', text)
+        self.assertIn('latency_seconds_count{stage="admit"} 4', text)
+
+    def test_rejects_wrong_labels_and_duplicate_names(self) -> None:
+        registry = MetricsRegistry()
+        hits = registry.counter("hits_total", "Hits", ("tier",))
+
+        with self.assertRaises(ValueError):
+            hits.labels("local", "extra")
+        with self.assertRaises(ValueError):
+            registry.gauge("hits_total", "Again")
+
+    def test_collectors_run_at_scrape_time(self) -> None:
+        registry = MetricsRegistry()
+        source = {"opened": 1}
+
+        def collect() -> list[Counter]:
+            trips = Counter("trips_total", "Breaker trips", ("provider",))
+            trips.labels("groq").inc(source["opened"])
+            return [trips]
+
+        registry.add_collector(collect)
+        self.assertIn('trips_total{provider="groq"} 1', registry.render())
+        source["opened"] = 4
+        self.assertIn('trips_total{provider="groq"} 4', registry.render())
+
+    def test_stage_times_the_block_even_when_it_raises(self) -> None:
+        metrics = RouterMetrics()
+
+        with self.assertRaises(RuntimeError):
+            with metrics.stage("execute"):
+                raise RuntimeError("boom")
+
+        self.assertIn('inference_stage_seconds_count{stage="execute"} 1', metrics.registry.render())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+
+from services.inference_router.rate_limit import RateLimitShaper, parse_reset_seconds
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 100.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _headers(
+    remaining_requests: int, reset_requests: str, remaining_tokens: int = 100000, reset_tokens: str = "1s"
+) -> dict[str, str]:
+    return {
+        "x-ratelimit-limit-requests": "100",
+        "x-ratelimit-remaining-requests": str(remaining_requests),
+        "x-ratelimit-reset-requests": reset_requests,
+        "x-ratelimit-limit-tokens": "100000",
+        "x-ratelimit-remaining-tokens": str(remaining_tokens),
+        "x-ratelimit-reset-tokens": reset_tokens,
+    }
+
+
+class ParseResetTests(unittest.TestCase):
+    def test_parses_groq_durations(self) -> None:
+        self.assertAlmostEqual(parse_reset_seconds("2m59.56s"), 179.56)
+        self.assertAlmostEqual(parse_reset_seconds("7.66s"), 7.66)
+        self.assertAlmostEqual(parse_reset_seconds("120ms"), 0.12)
+        self.assertAlmostEqual(parse_reset_seconds("3"), 3.0)
+        self.assertIsNone(parse_reset_seconds(None))
+        self.assertIsNone(parse_reset_seconds("soon"))
+
+
+class RateLimitShaperTests(unittest.IsolatedAsyncioTestCase):
+    def _shaper(self, clock: _Clock, **kwargs) -> RateLimitShaper:
+        return RateLimitShaper(clock=clock, sleep=clock.sleep, **kwargs)
+
+    async def test_passes_through_without_headers_or_with_headroom(self) -> None:
+        clock = _Clock()
+        shaper = self._shaper(clock)
+        self.assertTrue(await shaper.acquire(100))
+
+        shaper.update(_headers(80, "10s"))
+        self.assertTrue(await shaper.acquire(100))
+        self.assertEqual(clock.sleeps, [])
+        self.assertEqual(shaper.requests.remaining, 79)
+
+    async def test_defers_until_reset_when_quota_is_spent(self) -> None:
+        clock = _Clock()
+        shaper = self._shaper(clock, reserve_requests=1, max_defer_seconds=1.0)
+        shaper.update(_headers(1, "500ms"))
+
+        self.assertTrue(await shaper.acquire(10))
+        self.assertEqual(clock.sleeps, [0.5])
+        self.assertEqual(shaper.status()["deferred"], 1)
+
+    async def test_refuses_when_reset_is_too_far_away(self) -> None:
+        clock = _Clock()
+        shaper = self._shaper(clock, max_defer_seconds=1.0)
+        shaper.update(_headers(1, "30s"))
+
+        self.assertFalse(await shaper.acquire(10))
+        self.assertEqual(shaper.status()["refused"], 1)
+
+    async def test_token_quota_is_respected(self) -> None:
+        clock = _Clock()
+        shaper = self._shaper(clock, max_defer_seconds=0.1)
+        shaper.update(_headers(90, "10s", remaining_tokens=50))
+
+        self.assertFalse(await shaper.acquire(600))
+
+    async def test_paces_when_running_low(self) -> None:
+        clock = _Clock()
+        shaper = self._shaper(clock, reserve_requests=0, max_defer_seconds=5.0, pace_below_fraction=0.1)
+        shaper.update(_headers(5, "10s"))
+
+        for _ in range(3):
+            self.assertTrue(await shaper.acquire(1))
+
+        self.assertEqual(clock.sleeps[0], 2.0)
+        self.assertEqual(len(clock.sleeps), 2)
+
+    async def test_pacing_both_quotas_waits_one_interval(self) -> None:
+        clock = _Clock()
+        shaper = self._shaper(clock, reserve_requests=0, max_defer_seconds=5.0, pace_below_fraction=0.1)
+        shaper.update(_headers(5, "10s", remaining_tokens=5000, reset_tokens="10s"))
+
+        self.assertTrue(await shaper.acquire(1000))
+        self.assertEqual(clock.sleeps, [])
+        self.assertTrue(await shaper.acquire(1000))
+        self.assertEqual(clock.sleeps, [2.0])
+
+    async def test_refusal_leaves_pacing_slots_untouched(self) -> None:
+        clock = _Clock()
+        shaper = self._shaper(clock, reserve_requests=0, max_defer_seconds=1.0, pace_below_fraction=0.1)
+        shaper.update(_headers(5, "10s", remaining_tokens=50, reset_tokens="10s"))
+
+        self.assertFalse(await shaper.acquire(600))
+        self.assertEqual(shaper.requests.next_slot, 0.0)
+        self.assertTrue(await shaper.acquire(10))
+        self.assertEqual(clock.sleeps, [])
+
+    async def test_retry_after_on_429_blocks_until_expiry(self) -> None:
+        clock = _Clock()
+        shaper = self._shaper(clock, max_defer_seconds=1.0)
+        shaper.update({"retry-after": "20"}, status_code=429)
+
+        self.assertFalse(await shaper.acquire(1))
+        clock.now += 21
+        self.assertTrue(await shaper.acquire(1))
+
+    async def test_disabled_shaper_never_waits(self) -> None:
+        clock = _Clock()
+        shaper = self._shaper(clock, enabled=False)
+        shaper.update(_headers(0, "60s"))
+        self.assertTrue(await shaper.acquire(1))
+
+
+if __name__ == "__main__":
+    unittest.main()
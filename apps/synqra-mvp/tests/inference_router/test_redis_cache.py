@@ -0,0 +1,575 @@
+import asyncio
+import base64
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from services.inference_router.disk_cache import DiskResultCache
+from services.inference_router.local_cache import LocalResultCache
+from services.inference_router.redis_cache import RedisCache
+
+try:
+    import fakeredis
+    import lupa  # noqa: F401  fakeredis runs Lua through it
+except ImportError:
+    fakeredis = None
+
+
+class _FakePubSub:
+    def __init__(self) -> None:
+        self.patterns: list[str] = []
+        self.messages: asyncio.Queue = asyncio.Queue()
+
+    async def psubscribe(self, pattern: str) -> None:
+        self.patterns.append(pattern)
+
+    async def listen(self):
+        while True:
+            yield await self.messages.get()
+
+    async def aclose(self) -> None:
+        return None
+
+
+class _FakePipeline:
+    def __init__(self, redis: "_FakeRedis") -> None:
+        self.redis = redis
+
+    async def __aenter__(self) -> "_FakePipeline":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+
+    def set(self, key: str, value: str, ex: int | None = None) -> None:
+        self.redis.values[key] = value
+
+    def publish(self, channel: str, message: str) -> None:
+        self.redis.published.append((channel, message))
+
+    async def execute(self) -> list:
+        self.redis.pipeline_calls += 1
+        return []
+
+
+class _FakeRedis:
+    def __init__(self) -> None:
+        self.values: dict[str, str] = {}
+        self.published: list[tuple[str, str]] = []
+        self.mget_calls = 0
+        self.pipeline_calls = 0
+        self.pubsub_instance = _FakePubSub()
+
+    def pubsub(self) -> _FakePubSub:
+        return self.pubsub_instance
+
+    def pipeline(self, transaction: bool = True) -> _FakePipeline:
+        return _FakePipeline(self)
+
+    async def mget(self, *keys: str) -> list[str | None]:
+        self.mget_calls += 1
+        return [self.values.get(key) for key in keys]
+
+    async def aclose(self) -> None:
+        return None
+
+
+class DedupeWaitTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.cache = RedisCache("redis://localhost:6379/0", namespace="t")
+        self.fake = _FakeRedis()
+        self.cache._redis = self.fake
+
+    async def asyncTearDown(self) -> None:
+        await self.cache.close()
+
+    async def test_notification_wakes_waiter_without_polling(self) -> None:
+        waiter = asyncio.create_task(
+            self.cache.wait_for_dedupe_result("sig", timeout_ms=5000, fallback_poll_ms=5000)
+        )
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.fake.pubsub_instance.patterns, ["t:dedupe:notify:*"])
+
+        self.fake.values["t:cache:sig"] = json.dumps({"output": "x"})
+        await self.fake.pubsub_instance.messages.put(
+            {"type": "pmessage", "channel": "t:dedupe:notify:sig", "data": "1"}
+        )
+        result = await asyncio.wait_for(waiter, 1)
+
+        self.assertEqual(result, {"output": "x"})
+        self.assertEqual(self.fake.mget_calls, 2)
+        self.assertEqual(self.cache._dedupe_waiters, {})
+
+    async def test_stray_or_malformed_notifications_keep_the_waiter_registered(self) -> None:
+        waiter = asyncio.create_task(
+            self.cache.wait_for_dedupe_result("sig", timeout_ms=5000, fallback_poll_ms=5000)
+        )
+        await asyncio.sleep(0.01)
+
+        await self.fake.pubsub_instance.messages.put(
+            {"type": "pmessage", "channel": "t:dedupe:notify:sig", "data": "2z:not-base64"}
+        )
+        await asyncio.sleep(0.01)
+        self.assertFalse(waiter.done())
+        self.assertEqual(len(self.cache._dedupe_waiters["sig"]), 1)
+
+        self.fake.values["t:cache:sig"] = json.dumps({"output": "x"})
+        await self.fake.pubsub_instance.messages.put(
+            {"type": "pmessage", "channel": "t:dedupe:notify:sig", "data": "1"}
+        )
+        self.assertEqual(await asyncio.wait_for(waiter, 1), {"output": "x"})
+
+    async def test_falls_back_to_polling_when_notifications_disabled(self) -> None:
+        self.cache.dedupe_notify_enabled = False
+
+        async def publish_later() -> None:
+            await asyncio.sleep(0.03)
+            self.fake.values["t:cache:sig"] = json.dumps({"output": "y"})
+
+        asyncio.create_task(publish_later())
+        result = await self.cache.wait_for_dedupe_result("sig", timeout_ms=1000, poll_ms=5)
+
+        self.assertEqual(result, {"output": "y"})
+        self.assertGreater(self.fake.mget_calls, 1)
+        self.assertEqual(self.fake.pubsub_instance.patterns, [])
+
+    async def test_times_out_with_none(self) -> None:
+        result = await self.cache.wait_for_dedupe_result("sig", timeout_ms=30, fallback_poll_ms=10)
+        self.assertIsNone(result)
+
+    async def test_unwraps_soft_expiry_envelope(self) -> None:
+        self.fake.values["t:cache:sig"] = self.cache._encode_entry({"output": "z"}, compute_ms=10)[0]
+
+        result = await self.cache.wait_for_dedupe_result("sig", timeout_ms=100)
+
+        self.assertEqual(result, {"output": "z"})
+
+
+class NegativeCacheTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.cache = RedisCache("redis://localhost:6379/0", namespace="t", negative_ttl_seconds=5)
+        self.fake = _FakeRedis()
+        self.cache._redis = self.fake
+
+    async def asyncTearDown(self) -> None:
+        await self.cache.close()
+
+    async def test_failure_is_stored_locally_and_in_redis_and_wakes_waiters(self) -> None:
+        failure = await self.cache.set_failure("sig", 502, "All providers failed", notify=True)
+
+        self.assertEqual(self.cache.get_local_failure("sig"), failure)
+        self.assertIn("t:negative:sig", self.fake.values)
+        self.assertEqual(self.fake.published, [("t:dedupe:notify:sig", "1")])
+        self.assertEqual(self.cache.negative_stats()["local_hits"], 1)
+
+    async def test_writes_without_the_lock_publish_nothing(self) -> None:
+        await self.cache.set_failure("sig", 502, "All providers failed")
+        await self.cache.set_cached("sig", {"output": "x"})
+
+        self.assertIn("t:cache:sig", self.fake.values)
+        self.assertEqual(self.fake.published, [])
+
+    async def test_dedupe_waiter_sees_remote_failure(self) -> None:
+        self.fake.values["t:negative:sig"] = json.dumps(
+            {"failure": {"status_code": 502, "detail": "x", "expires_ms": int(time.time() * 1000) + 5000}}
+        )
+
+        result = await self.cache.wait_for_dedupe_result("sig", timeout_ms=100)
+
+        self.assertEqual(result["failure"]["status_code"], 502)
+        self.assertIsNotNone(self.cache.get_local_failure("sig"))
+        self.assertEqual(self.cache.negative_stats()["remote_hits"], 1)
+
+    async def test_admit_reports_failure(self) -> None:
+        raw = json.dumps({"failure": {"status_code": 503, "detail": "x", "expires_ms": int(time.time() * 1000) + 5000}})
+
+        async def admit_script(keys: list[str], args: list) -> tuple[str, str, int]:
+            self.assertEqual(keys[3], "t:negative:sig")
+            return "failed", raw, 0
+
+        self.cache._admit_script = admit_script
+        admitted = await self.cache.admit("sig", "r1")
+
+        self.assertFalse(admitted.lock_acquired)
+        self.assertEqual(admitted.failure["status_code"], 503)
+
+    async def test_disabled_by_default(self) -> None:
+        cache = RedisCache("redis://localhost:6379/0", namespace="t")
+        cache._redis = self.fake
+
+        self.assertIsNone(await cache.set_failure("sig", 502, "x"))
+        self.assertIsNone(cache.get_local_failure("sig"))
+        self.assertEqual(self.fake.values, {})
+
+
+class StaleWhileRevalidateTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.cache = RedisCache(
+            "redis://localhost:6379/0",
+            namespace="t",
+            cache_ttl_seconds=300,
+            stale_ttl_seconds=60,
+            local_cache=LocalResultCache(max_entries=16, max_bytes=1 << 20, ttl_seconds=600),
+        )
+        self.hit: tuple[str, str, int] | None = None
+
+        async def admit_script(keys: list[str], args: list) -> tuple[str, str, int]:
+            return self.hit
+
+        self.cache._admit_script = admit_script
+
+    async def asyncTearDown(self) -> None:
+        await self.cache.close()
+
+    def _entry(self, soft_in_ms: int, compute_ms: int = 50) -> str:
+        soft_ms = int(time.time() * 1000) + soft_in_ms
+        return json.dumps({"value": {"output": "v"}, "soft_expires_ms": soft_ms, "compute_ms": compute_ms})
+
+    async def test_legacy_plain_entries_still_read(self) -> None:
+        self.hit = ("hit", json.dumps({"output": "legacy"}), 120_000)
+
+        admitted = await self.cache.admit("sig", "r1")
+
+        self.assertEqual(admitted.cached, {"output": "legacy"})
+        self.assertFalse(admitted.refresh_due)
+        self.assertIsNotNone(self.cache.get_local("sig"))
+
+    async def test_fresh_entry_is_cached_locally_until_soft_expiry(self) -> None:
+        self.hit = ("hit", self._entry(soft_in_ms=200_000), 260_000)
+
+        admitted = await self.cache.admit("sig", "r1")
+
+        self.assertEqual(admitted.cached, {"output": "v"})
+        self.assertFalse(admitted.refresh_due)
+        expires_at = self.cache.local_cache._entries["sig"][0]
+        self.assertLess(expires_at - time.monotonic(), 201)
+
+    async def test_stale_entry_is_served_and_flagged_without_local_copy(self) -> None:
+        self.hit = ("hit", self._entry(soft_in_ms=-1_000), 59_000)
+
+        admitted = await self.cache.admit("sig", "r1")
+
+        self.assertEqual(admitted.cached, {"output": "v"})
+        self.assertTrue(admitted.refresh_due)
+        self.assertIsNone(self.cache.get_local("sig"))
+        self.assertEqual(self.cache.refresh_stats()["stale_hits"], 1)
+
+    async def test_early_refresh_fires_close_to_soft_expiry(self) -> None:
+        self.cache.early_refresh_beta = 1.0
+        self.hit = ("hit", self._entry(soft_in_ms=100, compute_ms=60_000), 60_000)
+
+        admitted = await self.cache.admit("sig", "r1")
+
+        # -60s * ln(U) exceeds 100ms unless U > 0.998.
+        self.assertTrue(admitted.refresh_due)
+        self.assertEqual(self.cache.refresh_stats()["early_refreshes"], 1)
+
+    async def test_entries_written_with_hard_ttl_past_soft_expiry(self) -> None:
+        encoded, _ = self.cache._encode_entry({"output": "v"}, compute_ms=5)
+        _, soft_expires_ms, compute_ms, _ = self.cache._decode_entry(encoded)
+
+        self.assertEqual(self.cache._hard_ttl_seconds, 360)
+        self.assertAlmostEqual(soft_expires_ms / 1000, time.time() + 300, delta=1)
+        self.assertEqual(compute_ms, 5)
+
+
+class EntryEncodingTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.cache = RedisCache("redis://localhost:6379/0", namespace="t", compress_min_bytes=256)
+        self.fake = _FakeRedis()
+        self.cache._redis = self.fake
+
+    async def asyncTearDown(self) -> None:
+        await self.cache.close()
+
+    def test_small_values_are_compact_json(self) -> None:
+        encoded, size_bytes = self.cache._encode_entry({"output": "short"}, compute_ms=7)
+
+        self.assertTrue(encoded.startswith("2:["))
+        self.assertEqual(size_bytes, len(encoded) - 2)
+        value, soft_expires_ms, compute_ms, _ = self.cache._decode_entry(encoded)
+        self.assertEqual((value, compute_ms), ({"output": "short"}, 7))
+        self.assertIsNotNone(soft_expires_ms)
+
+    def test_large_values_are_compressed(self) -> None:
+        value = {"output": "The launch went well. " * 200, "provider": "groq"}
+
+        encoded, size_bytes = self.cache._encode_entry(value, compute_ms=0)
+
+        self.assertTrue(encoded.startswith("2z:"))
+        self.assertLess(len(encoded), size_bytes / 4)
+        decoded, _, _, decoded_size = self.cache._decode_entry(encoded)
+        self.assertEqual(decoded, value)
+        self.assertEqual(decoded_size, size_bytes)
+
+    def test_legacy_envelope_is_still_read(self) -> None:
+        raw = json.dumps({"value": {"output": "v"}, "soft_expires_ms": 123, "compute_ms": 4})
+
+        self.assertEqual(self.cache._decode_entry(raw)[:3], ({"output": "v"}, 123, 4))
+
+    def test_version_1_writes_legacy_envelope(self) -> None:
+        self.cache.entry_version = 1
+
+        encoded, _ = self.cache._encode_entry({"output": "v"}, compute_ms=0)
+
+        self.assertEqual(json.loads(encoded)["value"], {"output": "v"})
+        self.assertEqual(self.cache._dedupe_result("sig", encoded), encoded)
+
+    async def test_dedupe_result_references_cache_entry(self) -> None:
+        value = {"output": "x" * 1000}
+        await self.cache.set_cached("sig", value)
+        await self.cache.set_dedupe_result("sig", value)
+
+        self.assertEqual(self.fake.values["t:dedupe:result:sig"], "2@t:cache:sig")
+        self.assertTrue(self.fake.values["t:cache:sig"].startswith("2z:"))
+        self.assertEqual(await self.cache.wait_for_dedupe_result("sig", timeout_ms=100), value)
+
+        del self.fake.values["t:cache:sig"]
+        self.assertIsNone(await self.cache.wait_for_dedupe_result("sig", timeout_ms=30))
+
+    async def test_notified_waiter_reads_compressed_entry(self) -> None:
+        waiter = asyncio.create_task(
+            self.cache.wait_for_dedupe_result("sig", timeout_ms=5000, fallback_poll_ms=5000)
+        )
+        await asyncio.sleep(0.01)
+        value = {"output": "y" * 1000}
+        self.fake.values["t:cache:sig"] = self.cache._encode_entry(value, compute_ms=0)[0]
+
+        await self.fake.pubsub_instance.messages.put(
+            {"type": "pmessage", "channel": "t:dedupe:notify:sig", "data": "1"}
+        )
+
+        self.assertEqual(await asyncio.wait_for(waiter, 1), value)
+
+
+class DiskTierTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.disk = DiskResultCache(os.path.join(self.directory.name, "cache.db"))
+        self.cache = RedisCache("redis://localhost:6379/0", namespace="t", disk_cache=self.disk)
+        self.fake = _FakeRedis()
+        self.cache._redis = self.fake
+        self.published: list[tuple[list[str], list]] = []
+
+        async def publish_script(keys: list[str], args: list) -> int:
+            self.published.append((keys, args))
+            return 1
+
+        self.cache._publish_script = publish_script
+
+    async def asyncTearDown(self) -> None:
+        await self.cache.close()
+        self.directory.cleanup()
+
+    async def test_redis_miss_is_served_from_disk_and_written_back(self) -> None:
+        async def admit_script(keys: list[str], args: list) -> tuple[str, str, int]:
+            return "lock", "", 0
+
+        self.cache._admit_script = admit_script
+        await self.cache.set_cached("sig", {"output": "kept"})
+        await self.disk.flush()
+        self.fake.values.clear()
+
+        admitted = await self.cache.admit("sig", "r1")
+
+        self.assertEqual(admitted.cached, {"output": "kept"})
+        self.assertFalse(admitted.lock_acquired)
+        self.assertEqual(self.published[0][0][2], "t:dedupe:lock:sig")
+        self.assertEqual(self.disk.stats()["writes"], 1)
+
+    async def test_get_cached_many_fills_gaps_from_disk(self) -> None:
+        await self.cache.set_cached("a", {"output": "a"})
+        await self.disk.flush()
+        self.fake.values.clear()
+        self.cache.local_cache.clear()
+
+        found = await self.cache.get_cached_many(["a", "b"])
+
+        self.assertEqual(found, {"a": {"output": "a"}})
+        self.assertIn("t:cache:a", self.fake.values)
+
+    async def test_get_cached_many_writes_disk_hits_back_in_one_round_trip(self) -> None:
+        for name in ("a", "b", "c"):
+            await self.cache.set_cached(name, {"output": name})
+        await self.disk.flush()
+        self.fake.values.clear()
+        self.cache.local_cache.clear()
+        self.fake.pipeline_calls = 0
+
+        found = await self.cache.get_cached_many(["a", "b", "c"])
+
+        self.assertEqual(len(found), 3)
+        self.assertEqual(self.fake.pipeline_calls, 1)
+        self.assertEqual(self.fake.published, [])
+        self.assertEqual(sorted(self.fake.values), ["t:cache:a", "t:cache:b", "t:cache:c"])
+
+
+@unittest.skipIf(fakeredis is None, "needs fakeredis[lua]")
+class CorruptEntryTests(unittest.IsolatedAsyncioTestCase):
+    """Values that are not cache entries must read as misses, never as errors."""
+
+    GARBAGE = (
+        "2z:not base64!",
+        "2z:" + base64.b64encode(b"not zlib").decode("ascii"),
+        '2:{"soft_expires_ms": 1}',
+        '2:[1, 2, "not an object"]',
+        "{truncated",
+    )
+
+    async def asyncSetUp(self) -> None:
+        self.redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        with mock.patch("services.inference_router.redis_cache.redis.from_url", return_value=self.redis):
+            self.cache = RedisCache(
+                "redis://localhost:6379/0",
+                namespace="t",
+                local_cache=LocalResultCache(),
+                dedupe_notify_enabled=False,
+            )
+
+    async def asyncTearDown(self) -> None:
+        await self.cache.close()
+
+    async def test_get_cached_treats_garbage_as_a_miss(self) -> None:
+        for garbage in self.GARBAGE:
+            with self.subTest(garbage=garbage):
+                await self.redis.set("t:cache:sig", garbage)
+                with self.assertLogs("services.inference_router.redis_cache", "ERROR"):
+                    self.assertIsNone(await self.cache.get_cached("sig"))
+                self.assertIsNone(self.cache.get_local("sig"))
+
+    async def test_get_cached_many_misses_only_the_garbage_items(self) -> None:
+        await self.cache.set_cached("good", {"output": "good"})
+        for index, garbage in enumerate(self.GARBAGE):
+            await self.redis.set(f"t:cache:bad-{index}", garbage)
+        self.cache.local_cache.clear()
+        signatures = ["good", *(f"bad-{index}" for index in range(len(self.GARBAGE)))]
+
+        with self.assertLogs("services.inference_router.redis_cache", "ERROR") as logs:
+            found = await self.cache.get_cached_many(signatures)
+
+        self.assertEqual(found, {"good": {"output": "good"}})
+        self.assertEqual(len(logs.records), len(self.GARBAGE))
+
+    async def test_admit_turns_a_garbage_hit_into_a_lock_and_publish_repairs_it(self) -> None:
+        for garbage in self.GARBAGE:
+            with self.subTest(garbage=garbage):
+                await self.redis.set("t:cache:sig", garbage)
+                with self.assertLogs("services.inference_router.redis_cache", "ERROR"):
+                    admitted = await self.cache.admit("sig", "r1")
+
+                self.assertIsNone(admitted.cached)
+                self.assertTrue(admitted.lock_acquired)
+                await self.cache.publish_result("sig", {"output": "fixed"}, "r1")
+                self.assertEqual((await self.cache.admit("sig", "r2")).cached, {"output": "fixed"})
+                self.assertFalse(await self.redis.exists("t:dedupe:lock:sig"))
+                await self.redis.delete("t:cache:sig")
+                self.cache.local_cache.clear()
+
+    async def test_admit_treats_a_garbage_negative_entry_as_a_miss(self) -> None:
+        await self.redis.set("t:negative:sig", "{truncated")
+        with self.assertLogs("services.inference_router.redis_cache", "ERROR"):
+            admitted = await self.cache.admit("sig", "r1")
+
+        self.assertIsNone(admitted.failure)
+        self.assertTrue(admitted.lock_acquired)
+
+    async def test_admit_ignores_an_unreadable_lock(self) -> None:
+        await self.redis.set("t:dedupe:lock:sig", "{truncated")
+        with self.assertLogs("services.inference_router.redis_cache", "ERROR"):
+            admitted = await self.cache.admit("sig", "r1")
+
+        self.assertFalse(admitted.lock_acquired)
+        self.assertIsNone(admitted.lock)
+
+
+@unittest.skipIf(fakeredis is None, "needs fakeredis[lua]")
+class LuaScriptTests(unittest.IsolatedAsyncioTestCase):
+    """Runs the registered scripts themselves on fakeredis."""
+
+    async def asyncSetUp(self) -> None:
+        self.redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        with mock.patch("services.inference_router.redis_cache.redis.from_url", return_value=self.redis):
+            self.cache = RedisCache(
+                "redis://localhost:6379/0",
+                namespace="t",
+                claude_cap_ratio=0.1,
+                claude_window_bucket_seconds=3600,
+                dedupe_notify_enabled=False,
+            )
+
+    async def asyncTearDown(self) -> None:
+        await self.cache.close()
+
+    async def test_admit_locks_a_miss_and_publish_turns_it_into_a_hit(self) -> None:
+        first = await self.cache.admit("sig", "r1")
+        second = await self.cache.admit("sig", "r2")
+
+        self.assertTrue(first.lock_acquired)
+        self.assertFalse(second.lock_acquired)
+        self.assertEqual(second.lock["owner"], "r1")
+
+        await self.cache.publish_result("sig", {"output": "x"}, "r1", product="aurafx")
+        third = await self.cache.admit("sig", "r3")
+
+        self.assertEqual(third.cached, {"output": "x"})
+        self.assertFalse(await self.redis.exists("t:dedupe:lock:sig"))
+        self.assertEqual(await self.redis.get("t:dedupe:result:sig"), "2@t:cache:sig")
+        self.assertEqual(await self.redis.zcard("t:index:aurafx"), 1)
+        self.assertEqual(await self.redis.hget("t:metrics:window:total", "sum"), "3")
+
+    async def test_publish_notifies_without_the_value(self) -> None:
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe("t:dedupe:notify:sig")
+        await pubsub.get_message(timeout=1)
+
+        await self.cache.publish_result("sig", {"output": "x" * 5000}, "r1")
+        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1)
+        await pubsub.aclose()
+
+        self.assertEqual(message["data"], "1")
+
+    async def test_publish_leaves_a_lock_held_by_someone_else(self) -> None:
+        await self.cache.admit("sig", "r1")
+
+        await self.cache.publish_result("sig", {"output": "x"}, "r2")
+
+        self.assertTrue(await self.redis.exists("t:dedupe:lock:sig"))
+        self.assertIsNotNone(await self.redis.get("t:cache:sig"))
+
+    async def test_admit_reports_a_stored_failure_instead_of_locking(self) -> None:
+        self.cache.negative_ttl_seconds = 5
+        await self.cache.set_failure("sig", 502, "down")
+
+        admitted = await self.cache.admit("sig", "r1")
+
+        self.assertFalse(admitted.lock_acquired)
+        self.assertEqual(admitted.failure["status_code"], 502)
+
+    async def test_claude_reservations_stop_at_the_cap(self) -> None:
+        await self.cache.record_total_requests([f"r{index}" for index in range(20)])
+
+        granted = [(await self.cache.try_reserve_claude_request(f"c{i}"))[0] for i in range(3)]
+        self.assertEqual(granted, [True, True, False])
+
+        _, _, _, _, member = await self.cache.try_reserve_claude_request("c3")
+        self.assertIsNone(member)
+        await self.cache.release_claude_reservation(str(self.cache.window.bucket_at()))
+        self.assertTrue((await self.cache.try_reserve_claude_request("c4"))[0])
+
+    async def test_leases_are_capped_and_returned_leftovers_are_granted_again(self) -> None:
+        await self.cache.record_total_requests([f"r{index}" for index in range(30)])
+
+        granted, total, _, _, bucket = await self.cache.lease_claude_requests(5)
+        self.assertEqual((granted, total), (3, 30))
+        self.assertEqual((await self.cache.lease_claude_requests(5))[0], 0)
+
+        regranted = await self.cache.lease_claude_requests(5, return_bucket=bucket, return_count=2)
+        self.assertEqual(regranted[0], 2)
+        self.assertEqual(await self.redis.hget("t:metrics:window:claude", "sum"), "3")
+
+
+if __name__ == "__main__":
+    unittest.main()
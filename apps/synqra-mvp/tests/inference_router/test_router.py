@@ -0,0 +1,844 @@
+import asyncio
+import time
+import unittest
+from typing import Any
+
+from fastapi import HTTPException
+
+from services.inference_router.admission import AdmissionController
+from services.inference_router.circuit_breaker import CircuitBreakerRegistry
+from services.inference_router.classifier import RequestClassifier
+from services.inference_router.deadline import Deadline
+from services.inference_router.hedging import HedgePolicy
+from services.inference_router.local_cache import LocalResultCache
+from services.inference_router.memory_guard import MemoryGuard
+from services.inference_router.providers import ProviderError, ProviderThrottled
+from services.inference_router.redis_cache import AdmitResult
+from services.inference_router.router import InferenceRouter
+from services.inference_router.server_timing import ServerTiming
+from services.inference_router.similarity_cache import SimilarityCache
+
+
+class _FakeCache:
+    cache_ttl_seconds = 300
+    claude_cap_ratio = 0.01
+
+    def __init__(self) -> None:
+        self.local_cache = LocalResultCache(max_entries=16, max_bytes=1 << 20, ttl_seconds=60)
+        self.store: dict[str, dict[str, Any]] = {}
+        self.calls: list[str] = []
+        self.claude_allowed = True
+        self.refresh_due = False
+        self.failures: dict[str, dict[str, Any]] = {}
+        self.generations: dict[str, int] = {}
+        self.products: dict[str, str] = {}
+
+    def get_local(self, signature: str) -> dict[str, Any] | None:
+        return self.local_cache.get(signature)
+
+    async def record_total_request(self, request_id: str) -> None:
+        self.calls.append("record_total_request")
+
+    async def record_total_requests(self, request_ids: list[str]) -> None:
+        self.calls.append(f"record_total_requests:{len(request_ids)}")
+
+    async def get_cached_many(
+        self, signatures: list[str], *, refresh_due: list[str] | None = None
+    ) -> dict[str, dict[str, Any]]:
+        self.calls.append("get_cached_many")
+        return {signature: self.store[signature] for signature in signatures if signature in self.store}
+
+    async def get_cached(self, signature: str) -> dict[str, Any] | None:
+        self.calls.append("get_cached")
+        return self.store.get(signature)
+
+    async def admit(self, signature: str, request_id: str) -> AdmitResult:
+        self.calls.append("admit")
+        cached = self.store.get(signature)
+        failure = None if cached is not None else self.failures.get(signature)
+        return AdmitResult(
+            cached=cached,
+            lock_acquired=cached is None and failure is None,
+            lock=None,
+            refresh_due=cached is not None and self.refresh_due,
+            failure=failure,
+        )
+
+    def get_local_failure(self, signature: str) -> dict[str, Any] | None:
+        return None
+
+    async def set_failure(
+        self, signature: str, status_code: int, detail: Any, *, notify: bool = False
+    ) -> None:
+        self.calls.append(f"set_failure:{status_code}" + (":notify" if notify else ""))
+        self.failures[signature] = {
+            "status_code": status_code,
+            "detail": detail,
+            "expires_ms": int(time.time() * 1000) + 5000,
+        }
+
+    async def claim_refresh(self, signature: str, ttl_seconds: int = 35) -> bool:
+        self.calls.append("claim_refresh")
+        return True
+
+    async def release_refresh(self, signature: str) -> None:
+        self.calls.append("release_refresh")
+
+    async def publish_result(
+        self,
+        signature: str,
+        value: dict[str, Any],
+        owner_id: str,
+        compute_ms: int = 0,
+        *,
+        product: str | None = None,
+    ) -> None:
+        self.calls.append("publish_result")
+        self.store[signature] = value
+        self.products[signature] = product
+        self.local_cache.set(signature, value, size_bytes=1)
+
+    async def set_cached(
+        self,
+        signature: str,
+        value: dict[str, Any],
+        compute_ms: int = 0,
+        *,
+        product: str | None = None,
+    ) -> None:
+        self.calls.append("set_cached")
+        self.store[signature] = value
+        self.products[signature] = product
+
+    async def get_generations(self) -> dict[str, int]:
+        return dict(self.generations)
+
+    async def bump_generation(self, field: str) -> int:
+        self.generations[field] = self.generations.get(field, 0) + 1
+        return self.generations[field]
+
+    async def cache_sizes(self) -> dict[str, int]:
+        sizes: dict[str, int] = {}
+        for product in self.products.values():
+            sizes[product] = sizes.get(product, 0) + 1
+        return sizes
+
+    async def release_dedupe_lock(self, signature: str, owner_id: str) -> None:
+        self.calls.append("release_dedupe_lock")
+
+    async def try_reserve_claude_request(self, request_id: str):
+        return self.claude_allowed, 100, 0, 0.01, "member" if self.claude_allowed else None
+
+    async def release_claude_reservation(self, member: str) -> None:
+        self.calls.append("release_claude_reservation")
+
+    def disk_stats(self) -> dict[str, Any]:
+        return {"enabled": False}
+
+    async def close(self) -> None:
+        return None
+
+
+class _FakeProviders:
+    groq_timeout_seconds = 8.0
+
+    def __init__(self) -> None:
+        self.min_call_seconds = {"groq": 0.5, "ollama": 1.0, "claude": 2.0}
+        self.calls: list[str] = []
+        self.groq_error: Exception | None = None
+        self.ollama_error: Exception | None = None
+        self.ollama_mid_stream_error: Exception | None = None
+        self.delay = 0.0
+
+    def time_budget(self, provider: str, deadline: Any) -> float | None:
+        budget = deadline.budget(self.groq_timeout_seconds)
+        return budget if budget >= self.min_call_seconds.get(provider, 0.0) else None
+
+    async def call_groq(self, prompt: str, deadline: Any = None) -> str:
+        self.calls.append("groq")
+        await asyncio.sleep(self.delay)
+        if self.groq_error:
+            raise self.groq_error
+        return f"groq:{prompt[-5:]}"
+
+    async def call_ollama(self, prompt: str, deadline: Any = None) -> str:
+        self.calls.append("ollama")
+        if self.ollama_error:
+            raise self.ollama_error
+        return "ollama"
+
+    async def call_claude(self, prompt: str, deadline: Any = None) -> str:
+        self.calls.append("claude")
+        return "claude"
+
+    async def stream_groq(self, prompt: str, deadline: Any = None):
+        self.calls.append("groq")
+        if self.groq_error:
+            raise self.groq_error
+        for chunk in ("gr", "oq"):
+            yield chunk
+
+    async def stream_ollama(self, prompt: str, deadline: Any = None):
+        self.calls.append("ollama")
+        if self.ollama_error:
+            raise self.ollama_error
+        yield "olla"
+        if self.ollama_mid_stream_error:
+            raise self.ollama_mid_stream_error
+        yield "ma"
+
+    async def stream_claude(self, prompt: str, deadline: Any = None):
+        self.calls.append("claude")
+        yield "claude"
+
+    def limiter_status(self) -> dict[str, Any]:
+        return {"groq": {"limit": 8, "in_flight": 0, "queue_depth": 0}}
+
+    async def close(self) -> None:
+        return None
+
+
+def _build_router() -> tuple[InferenceRouter, _FakeCache, _FakeProviders]:
+    cache = _FakeCache()
+    providers = _FakeProviders()
+    router = InferenceRouter(
+        providers=providers,
+        classifier=RequestClassifier(),
+        memory_guard=MemoryGuard(min_free_mb=0),
+        redis_cache=cache,
+    )
+    return router, cache, providers
+
+
+class InferenceRouterTests(unittest.IsolatedAsyncioTestCase):
+    async def test_miss_uses_admit_and_publish_round_trips(self) -> None:
+        router, cache, providers = _build_router()
+
+        result = await router.route_request({"product": "aurafx", "prompt": "hello"}, "r1")
+
+        self.assertEqual(result["provider"], "groq")
+        self.assertFalse(result["cached"])
+        self.assertEqual(cache.calls, ["admit", "publish_result"])
+        self.assertEqual(providers.calls, ["groq"])
+
+    async def test_local_hit_skips_redis_on_request_path(self) -> None:
+        router, cache, providers = _build_router()
+        payload = {"product": "aurafx", "prompt": "hello"}
+        await router.route_request(payload, "r1")
+        cache.calls.clear()
+
+        result = await router.route_request(payload, "r2")
+        self.assertTrue(result["cached"])
+        self.assertEqual(providers.calls, ["groq"])
+        await router.close()
+        self.assertEqual(cache.calls, ["record_total_request"])
+
+    async def test_local_duplicates_share_one_provider_call(self) -> None:
+        router, cache, providers = _build_router()
+        providers.delay = 0.01
+        payload = {"product": "aurafx", "prompt": "hello"}
+
+        results = await asyncio.gather(
+            *(router.route_request(payload, f"r{i}") for i in range(4))
+        )
+        await router.close()
+
+        self.assertEqual(providers.calls, ["groq"])
+        self.assertEqual(sum(1 for result in results if result["deduped"]), 3)
+        self.assertEqual(cache.calls.count("admit"), 1)
+        self.assertEqual(cache.calls.count("record_total_request"), 3)
+
+    async def test_falls_back_to_ollama_then_claude(self) -> None:
+        router, _, providers = _build_router()
+        providers.groq_error = ProviderError("groq", "down", 500)
+        providers.ollama_error = ProviderError("ollama", "down", 500)
+
+        result = await router.route_request({"product": "aurafx", "prompt": "hello"}, "r1")
+
+        self.assertEqual(result["provider"], "claude")
+        self.assertTrue(result["claude_escalated"])
+        self.assertEqual(providers.calls, ["groq", "ollama", "claude"])
+
+    async def test_all_providers_failing_releases_lock_and_raises_502(self) -> None:
+        router, cache, providers = _build_router()
+        providers.groq_error = ProviderError("groq", "down", 500)
+        providers.ollama_error = ProviderError("ollama", "down", 500)
+        cache.claude_allowed = False
+
+        with self.assertRaises(HTTPException) as ctx:
+            await router.route_request({"product": "aurafx", "prompt": "hello"}, "r1")
+
+        self.assertEqual(ctx.exception.status_code, 502)
+        self.assertIn("release_dedupe_lock", cache.calls)
+        self.assertIn("set_failure:502:notify", cache.calls)
+
+    async def test_recent_failure_is_answered_without_provider_calls(self) -> None:
+        router, cache, providers = _build_router()
+        providers.groq_error = ProviderError("groq", "down", 500)
+        providers.ollama_error = ProviderError("ollama", "down", 500)
+        cache.claude_allowed = False
+        payload = {"product": "aurafx", "prompt": "hello"}
+        with self.assertRaises(HTTPException):
+            await router.route_request(payload, "r1")
+        providers.calls.clear()
+
+        with self.assertRaises(HTTPException) as ctx:
+            await router.route_request(payload, "r2")
+
+        self.assertEqual(ctx.exception.status_code, 502)
+        self.assertEqual(ctx.exception.headers["Retry-After"], "5")
+        self.assertEqual(providers.calls, [])
+
+    async def test_deadline_failures_are_not_negatively_cached(self) -> None:
+        router, cache, _ = _build_router()
+
+        with self.assertRaises(HTTPException) as ctx:
+            await router.route_request(
+                {"product": "aurafx", "prompt": "hello"}, "r1", deadline=Deadline(0)
+            )
+
+        self.assertEqual(ctx.exception.status_code, 504)
+        self.assertEqual(cache.failures, {})
+
+
+class StaleWhileRevalidateTests(unittest.IsolatedAsyncioTestCase):
+    async def test_stale_hit_is_served_while_one_background_refresh_runs(self) -> None:
+        router, cache, providers = _build_router()
+        payload = {"product": "aurafx", "prompt": "hello"}
+        signature = router._signature(payload)
+        cache.store[signature] = {"provider": "groq", "route": "text", "output": "old"}
+        cache.refresh_due = True
+        providers.delay = 0.01
+
+        results = [await router.route_request(payload, f"r{i}") for i in range(3)]
+        self.assertEqual([result["output"] for result in results], ["old"] * 3)
+        self.assertTrue(all(result["cached"] for result in results))
+        await router.close()
+
+        self.assertEqual(providers.calls, ["groq"])
+        self.assertEqual(cache.calls.count("claim_refresh"), 1)
+        self.assertIn("release_refresh", cache.calls)
+        self.assertEqual(cache.store[signature]["output"], "groq:hello")
+        self.assertEqual(router.cache_refreshes, 1)
+
+    async def test_failed_refresh_keeps_stale_entry(self) -> None:
+        router, cache, providers = _build_router()
+        payload = {"product": "aurafx", "prompt": "hello"}
+        signature = router._signature(payload)
+        cache.store[signature] = {"provider": "groq", "route": "text", "output": "old"}
+        cache.refresh_due = True
+        cache.claude_allowed = False
+        providers.groq_error = ProviderError("groq", "down", 500)
+        providers.ollama_error = ProviderError("ollama", "down", 500)
+
+        result = await router.route_request(payload, "r1")
+        await router.close()
+
+        self.assertEqual(result["output"], "old")
+        self.assertEqual(cache.store[signature]["output"], "old")
+        self.assertEqual(router.cache_refresh_failures, 1)
+        self.assertIn("release_refresh", cache.calls)
+
+
+class SimilarityCacheRoutingTests(unittest.IsolatedAsyncioTestCase):
+    _PROMPT = "Write a launch caption for the new Synqra analytics dashboard aimed at marketing directors"
+
+    def _router(self) -> tuple[InferenceRouter, _FakeCache, _FakeProviders]:
+        router, cache, providers = _build_router()
+        router.similarity = SimilarityCache(enabled=True, default_threshold=0.85)
+        return router, cache, providers
+
+    async def test_near_duplicate_prompt_reuses_cached_answer(self) -> None:
+        router, cache, providers = self._router()
+        await router.route_request({"product": "aurafx", "prompt": self._PROMPT}, "r1")
+
+        result = await router.route_request(
+            {"product": "aurafx", "prompt": self._PROMPT.replace("Synqra", "Aurafx") + "!"}, "r2"
+        )
+
+        self.assertTrue(result["cached"])
+        self.assertEqual(providers.calls, ["groq"])
+        self.assertEqual(router.similarity.stats()["hits_by_product"], {"aurafx": 1})
+        self.assertEqual(cache.calls[-2:], ["get_cached", "publish_result"])
+
+    async def test_different_metadata_or_unrelated_prompt_misses(self) -> None:
+        router, _, providers = self._router()
+        await router.route_request({"product": "aurafx", "prompt": self._PROMPT}, "r1")
+
+        await router.route_request(
+            {"product": "aurafx", "prompt": self._PROMPT, "metadata": {"tone": "calm"}}, "r2"
+        )
+        await router.route_request(
+            {"product": "aurafx", "prompt": "Summarize the quarterly earnings call for investors"}, "r3"
+        )
+
+        self.assertEqual(providers.calls, ["groq", "groq", "groq"])
+        self.assertEqual(router.similarity.hits, 0)
+
+    async def test_evicted_match_is_forgotten(self) -> None:
+        router, cache, providers = self._router()
+        await router.route_request({"product": "aurafx", "prompt": self._PROMPT}, "r1")
+        cache.store.clear()
+        cache.local_cache.clear()
+
+        await router.route_request({"product": "aurafx", "prompt": self._PROMPT + "."}, "r2")
+
+        self.assertEqual(providers.calls, ["groq", "groq"])
+        self.assertEqual(router.similarity.stats()["stale"], 1)
+
+
+class CacheGenerationTests(unittest.IsolatedAsyncioTestCase):
+    async def test_bumping_product_generation_misses_old_entries(self) -> None:
+        router, cache, providers = _build_router()
+        await router.generations.refresh()
+        synqra = {"product": "synqra", "prompt": "hello"}
+        aurafx = {"product": "aurafx", "prompt": "hello"}
+        await router.route_request(synqra, "r1")
+        await router.route_request(aurafx, "r2")
+
+        await router.bump_cache_generation("product", "synqra")
+        first = await router.route_request(synqra, "r3")
+        second = await router.route_request(aurafx, "r4")
+
+        self.assertFalse(first["cached"])
+        self.assertTrue(second["cached"])
+        self.assertEqual(providers.calls, ["groq", "groq", "groq"])
+
+    async def test_template_comes_from_metadata_or_product(self) -> None:
+        router, _, _ = _build_router()
+        await router.generations.refresh()
+        await router.bump_cache_generation("template", "synqra_voice")
+
+        self.assertNotEqual(router._generation({"product": "synqra"}), "")
+        self.assertEqual(router._generation({"product": "aurafx"}), "")
+        self.assertNotEqual(
+            router._generation({"product": "aurafx", "metadata": {"template": "Synqra_Voice"}}), ""
+        )
+
+    async def test_cache_report_counts_entries_per_product(self) -> None:
+        router, _, _ = _build_router()
+        await router.route_request({"product": "synqra", "prompt": "a"}, "r1")
+        await router.route_request({"product": "synqra", "prompt": "b"}, "r2")
+        await router.route_request({"product": "noid", "prompt": "c"}, "r3")
+
+        report = await router.cache_report()
+
+        self.assertEqual(report["entries_by_product"], {"synqra": 2, "noid": 1})
+
+
+class RouterStartTests(unittest.IsolatedAsyncioTestCase):
+    async def test_start_loads_generations_bumped_before_the_process_existed(self) -> None:
+        router, cache, _ = _build_router()
+        cache.generations = {"product:aurafx": 2}
+        payload = {"product": "aurafx", "prompt": "hello"}
+
+        await router.start()
+
+        self.assertEqual(router.generations.snapshot(), {"product:aurafx": 2})
+        self.assertNotEqual(router._signature(payload), router.signatures.build(payload, generation=""))
+        await router.close()
+
+
+class RouterMetricsTests(unittest.IsolatedAsyncioTestCase):
+    async def test_records_stages_sources_and_provider_calls(self) -> None:
+        router, _, _ = _build_router()
+        payload = {"product": "aurafx", "prompt": "hello"}
+
+        await router.route_request(payload, "r1")
+        await router.route_request(payload, "r2")
+
+        text = router.metrics.registry.render()
+        for stage, count in (("signature", 2), ("local_cache", 2), ("admit", 1), ("execute", 1), ("cache_write", 1)):
+            self.assertIn(f'inference_stage_seconds_count{{stage="{stage}"}} {count}', text)
+        self.assertIn('inference_request_seconds_count{source="provider"} 1', text)
+        self.assertIn('inference_request_seconds_count{source="local_cache"} 1', text)
+        self.assertIn('inference_provider_call_seconds_count{provider="groq",outcome="ok"} 1', text)
+        self.assertIn('inference_cache_results_total{result="miss"} 1', text)
+        self.assertIn('inference_cache_tier_lookups_total{tier="local",result="hit"} 1', text)
+        self.assertIn('inference_provider_concurrency_limit{provider="groq"} 8', text)
+        self.assertIn("inference_requests_in_flight 0", text)
+
+    async def test_coalesced_followers_record_their_wait(self) -> None:
+        router, _, providers = _build_router()
+        providers.delay = 0.01
+        payload = {"product": "aurafx", "prompt": "hello"}
+        leader, follower = ServerTiming(), ServerTiming()
+
+        async def run(timing: ServerTiming, request_id: str) -> None:
+            with timing.activate():
+                await router.route_request(payload, request_id)
+
+        await asyncio.gather(run(leader, "r1"), run(follower, "r2"))
+
+        self.assertIn("groq", [entry[0] for entry in leader.entries])
+        self.assertIn("coalesce_wait", [entry[0] for entry in follower.entries])
+        self.assertNotIn("groq", [entry[0] for entry in follower.entries])
+
+    async def test_counts_breaker_trips_and_claude_escalations(self) -> None:
+        router, _, providers = _build_router()
+        router.breakers = CircuitBreakerRegistry(min_calls=1)
+        router.breakers.get("groq").record_failure()
+        providers.ollama_error = ProviderError("ollama", "down", 500)
+
+        await router.route_request({"product": "aurafx", "prompt": "hello"}, "r1")
+
+        text = router.metrics.registry.render()
+        self.assertIn('inference_breaker_trips_total{provider="groq"} 1', text)
+        self.assertIn('inference_breaker_open{provider="groq"} 1', text)
+        self.assertIn("inference_claude_escalations_total 1", text)
+        self.assertIn('inference_provider_call_seconds_count{provider="ollama",outcome="error"} 1', text)
+
+
+class AdmissionRoutingTests(unittest.IsolatedAsyncioTestCase):
+    async def test_coalesced_duplicates_share_one_admission_slot(self) -> None:
+        router, _, providers = _build_router()
+        router.admission = AdmissionController(max_concurrency=1, max_queue=0)
+        providers.delay = 0.01
+        payload = {"product": "aurafx", "prompt": "hello"}
+
+        results = await asyncio.gather(*(router.route_request(payload, f"r{i}") for i in range(4)))
+        await router.close()
+
+        self.assertEqual(len(results), 4)
+        self.assertEqual(providers.calls, ["groq"])
+        self.assertEqual(router.admission.stats()["outcomes"], {"aurafx": {"admitted": 1}})
+
+    async def test_rejects_over_capacity_with_retry_after(self) -> None:
+        router, _, providers = _build_router()
+        router.admission = AdmissionController(max_concurrency=1, max_queue=0)
+        providers.delay = 0.01
+
+        results = await asyncio.gather(
+            router.route_request({"product": "aurafx", "prompt": "first"}, "r1"),
+            router.route_request({"product": "aurafx", "prompt": "second"}, "r2"),
+            return_exceptions=True,
+        )
+
+        self.assertEqual(results[0]["provider"], "groq")
+        self.assertIsInstance(results[1], HTTPException)
+        self.assertEqual(results[1].status_code, 503)
+        self.assertIn("Retry-After", results[1].headers)
+        text = router.metrics.registry.render()
+        self.assertIn('inference_admission_total{product="aurafx",outcome="queue_full"} 1', text)
+        self.assertIn('inference_admission_wait_seconds_count{product="aurafx"} 1', text)
+        self.assertEqual(router.admission.in_flight, 0)
+
+    async def test_local_hits_bypass_a_saturated_queue(self) -> None:
+        router, _, _ = _build_router()
+        payload = {"product": "aurafx", "prompt": "hello"}
+        await router.route_request(payload, "r1")
+        router.admission = AdmissionController(max_concurrency=1, max_queue=0)
+        router.admission.in_flight = 1
+
+        result = await router.route_request(payload, "r2")
+        streamed = [event async for event in router.stream_request(payload, "r3")]
+
+        self.assertTrue(result["cached"])
+        self.assertTrue(streamed)
+        self.assertEqual(router.admission.stats()["outcomes"], {})
+
+    async def test_redis_cache_hits_are_served_while_saturated(self) -> None:
+        router, cache, providers = _build_router()
+        payload = {"product": "aurafx", "prompt": "hello"}
+        cache.store[router._signature(payload)] = {"provider": "groq", "route": "text", "output": "hit"}
+        router.admission = AdmissionController(max_concurrency=1, max_queue=0)
+        router.admission.in_flight = 1
+
+        result = await router.route_request(payload, "r1")
+        cache.local_cache = LocalResultCache(max_entries=16, max_bytes=1 << 20, ttl_seconds=60)
+        streamed = [event async for event in router.stream_request(payload, "r2")]
+
+        self.assertEqual(result["output"], "hit")
+        self.assertTrue(result["cached"])
+        self.assertEqual(streamed[0]["text"], "hit")
+        self.assertEqual(cache.calls.count("admit"), 2)
+        self.assertEqual(providers.calls, [])
+        self.assertEqual(router.admission.stats()["outcomes"], {})
+
+    async def test_shed_requests_release_the_lock_without_a_negative_entry(self) -> None:
+        router, cache, providers = _build_router()
+        router.admission = AdmissionController(max_concurrency=1, max_queue=0)
+        router.admission.in_flight = 1
+
+        with self.assertRaises(HTTPException) as ctx:
+            await router.route_request({"product": "aurafx", "prompt": "hello"}, "r1")
+
+        self.assertEqual(ctx.exception.status_code, 503)
+        self.assertIn("release_dedupe_lock", cache.calls)
+        self.assertEqual(cache.failures, {})
+        self.assertEqual(providers.calls, [])
+
+    async def test_only_provider_calls_feed_the_service_time_estimate(self) -> None:
+        router, _, _ = _build_router()
+
+        [event async for event in router.stream_request({"product": "aurafx", "prompt": "a"}, "r1")]
+        self.assertIsNone(router.admission.service_seconds)
+
+        await router.route_request({"product": "aurafx", "prompt": "b"}, "r2")
+        self.assertIsNotNone(router.admission.service_seconds)
+        self.assertEqual(router.admission.in_flight, 0)
+
+
+class CircuitBreakerRoutingTests(unittest.IsolatedAsyncioTestCase):
+    async def test_groq_rate_limits_open_breaker_and_next_request_skips_it(self) -> None:
+        router, _, providers = _build_router()
+        providers.groq_error = ProviderError("groq", "slow down", 429)
+
+        for i in range(2):
+            result = await router.route_request({"product": "aurafx", "prompt": f"p{i}"}, f"r{i}")
+            self.assertEqual(result["provider"], "ollama")
+        providers.calls.clear()
+
+        result = await router.route_request({"product": "aurafx", "prompt": "p2"}, "r2")
+
+        self.assertEqual(result["provider"], "ollama")
+        self.assertEqual(providers.calls, ["ollama"])
+        self.assertEqual(router.breakers.get("groq").status()["state"], "open")
+
+    async def test_open_ollama_is_skipped_without_a_call(self) -> None:
+        router, _, providers = _build_router()
+        router.breakers = CircuitBreakerRegistry(min_calls=1)
+        providers.groq_error = ProviderError("groq", "bad request", 400)
+        router.breakers.get("ollama").record_failure()
+
+        result = await router.route_request({"product": "aurafx", "prompt": "hello"}, "r1")
+
+        self.assertEqual(result["provider"], "claude")
+        self.assertEqual(providers.calls, ["groq", "claude"])
+        self.assertEqual(router.breakers.get("groq").status()["state"], "closed")
+
+    async def test_all_local_providers_open_returns_503_with_retry_after(self) -> None:
+        router, cache, providers = _build_router()
+        router.breakers = CircuitBreakerRegistry(min_calls=1, open_seconds=30)
+        router.breakers.get("groq").record_failure()
+        router.breakers.get("ollama").record_failure()
+        cache.claude_allowed = False
+
+        with self.assertRaises(HTTPException) as ctx:
+            await router.route_request({"product": "aurafx", "prompt": "hello"}, "r1")
+
+        self.assertEqual(ctx.exception.status_code, 503)
+        self.assertEqual(ctx.exception.headers["Retry-After"], "30")
+        self.assertEqual(providers.calls, [])
+
+    async def test_shaped_groq_calls_do_not_count_against_breaker(self) -> None:
+        router, _, providers = _build_router()
+        providers.groq_error = ProviderThrottled("groq", "quota")
+
+        result = await router.route_request({"product": "aurafx", "prompt": "hello"}, "r1")
+
+        self.assertEqual(result["provider"], "ollama")
+        self.assertEqual(router.breakers.get("groq").status()["window_calls"], 0)
+
+
+class DeadlineRoutingTests(unittest.IsolatedAsyncioTestCase):
+    async def test_fallback_hops_only_run_when_they_fit_the_deadline(self) -> None:
+        router, cache, providers = _build_router()
+        providers.groq_error = ProviderError("groq", "down", 500)
+        providers.ollama_error = ProviderError("ollama", "down", 500)
+        seen: list[float] = []
+        original = providers.call_ollama
+
+        async def ollama(prompt: str, deadline: Any = None) -> str:
+            seen.append(deadline.remaining())
+            return await original(prompt, deadline)
+
+        providers.call_ollama = ollama
+
+        with self.assertRaises(HTTPException) as ctx:
+            await router.route_request(
+                {"product": "aurafx", "prompt": "hello"}, "r1", deadline=Deadline(1.5)
+            )
+
+        self.assertEqual(ctx.exception.status_code, 504)
+        self.assertEqual(providers.calls, ["groq", "ollama"])
+        self.assertLessEqual(seen[0], 1.5)
+
+    async def test_expired_deadline_calls_no_provider(self) -> None:
+        router, _, providers = _build_router()
+
+        with self.assertRaises(HTTPException) as ctx:
+            await router.route_request(
+                {"product": "aurafx", "prompt": "hello"}, "r1", deadline=Deadline(0)
+            )
+
+        self.assertEqual(ctx.exception.status_code, 504)
+        self.assertEqual(providers.calls, [])
+
+    async def test_hop_overrunning_deadline_is_cut_off_without_tripping_breaker(self) -> None:
+        router, _, providers = _build_router()
+        providers.delay = 5
+
+        with self.assertRaises(HTTPException) as ctx:
+            await router.route_request(
+                {"product": "aurafx", "prompt": "hello"}, "r1", deadline=Deadline(0.6)
+            )
+
+        self.assertEqual(ctx.exception.status_code, 504)
+        self.assertEqual(providers.calls, ["groq"])
+        self.assertEqual(router.breakers.get("groq").status()["window_calls"], 0)
+
+
+class HedgingTests(unittest.IsolatedAsyncioTestCase):
+    async def test_slow_groq_is_hedged_and_loser_cancelled(self) -> None:
+        router, _, providers = _build_router()
+        router.hedging = HedgePolicy(enabled=True, default_delay_seconds=0.01, min_delay_seconds=0.01)
+        cancelled = asyncio.Event()
+
+        async def slow_groq(prompt: str, deadline: Any = None) -> str:
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return "groq"
+
+        providers.call_groq = slow_groq
+        result = await router.route_request({"product": "aurafx", "prompt": "hello"}, "r1")
+        await asyncio.sleep(0)
+
+        self.assertEqual(result["provider"], "ollama")
+        self.assertTrue(cancelled.is_set())
+        self.assertEqual(router.hedging.stats()["hedge_wins"], 1)
+
+    async def test_fast_groq_is_not_hedged(self) -> None:
+        router, _, providers = _build_router()
+        router.hedging = HedgePolicy(enabled=True, default_delay_seconds=1.0)
+
+        result = await router.route_request({"product": "aurafx", "prompt": "hello"}, "r1")
+
+        self.assertEqual(result["provider"], "groq")
+        self.assertEqual(providers.calls, ["groq"])
+        self.assertEqual(router.hedging.stats()["hedges"], 0)
+
+    async def test_failed_groq_calls_feed_the_hedge_delay(self) -> None:
+        router, _, providers = _build_router()
+        router.hedging = HedgePolicy(enabled=True)
+        providers.delay = 0.02
+        providers.groq_error = ProviderError("groq", "down", 500)
+
+        await router.route_request({"product": "aurafx", "prompt": "hello"}, "r1")
+
+        self.assertEqual(len(router.hedging.primary_latency), 1)
+
+    async def test_open_ollama_breaker_does_not_spend_hedge_budget(self) -> None:
+        router, _, providers = _build_router()
+        router.hedging = HedgePolicy(enabled=True, default_delay_seconds=0.01, min_delay_seconds=0.01)
+        router.breakers = CircuitBreakerRegistry(min_calls=1)
+        router.breakers.get("ollama").record_failure()
+        providers.delay = 0.05
+
+        result = await router.route_request({"product": "aurafx", "prompt": "hello"}, "r1")
+
+        self.assertEqual(result["provider"], "groq")
+        self.assertEqual(router.hedging.stats()["hedges"], 0)
+        self.assertEqual(router.hedging.stats()["hedges_denied"], 0)
+
+    async def test_failed_hedge_falls_back_to_claude(self) -> None:
+        router, _, providers = _build_router()
+        router.hedging = HedgePolicy(enabled=True, default_delay_seconds=0.01, min_delay_seconds=0.01)
+        providers.delay = 0.05
+        providers.groq_error = ProviderError("groq", "down", 500)
+        providers.ollama_error = ProviderError("ollama", "down", 500)
+
+        result = await router.route_request({"product": "aurafx", "prompt": "hello"}, "r1")
+
+        self.assertEqual(result["provider"], "claude")
+        self.assertEqual(providers.calls, ["groq", "ollama", "claude"])
+
+
+class RouteBatchTests(unittest.IsolatedAsyncioTestCase):
+    async def test_collapses_duplicates_and_serves_hits_from_one_lookup(self) -> None:
+        router, cache, providers = _build_router()
+        await router.route_request({"product": "aurafx", "prompt": "cached"}, "warm")
+        cache.local_cache.clear()
+        cache.calls.clear()
+        providers.calls.clear()
+
+        payloads = [
+            {"product": "aurafx", "prompt": "a"},
+            {"product": "aurafx", "prompt": "cached"},
+            {"product": "aurafx", "prompt": "a"},
+            {"product": "noid", "prompt": "x" * 5000},
+        ]
+        outcomes = dict([item async for item in router.route_batch(payloads, "b")])
+        await router.close()
+
+        self.assertEqual(sorted(outcomes), [0, 1, 2, 3])
+        self.assertEqual(providers.calls, ["groq"])
+        self.assertTrue(outcomes[1]["response"]["cached"])
+        self.assertFalse(outcomes[0]["response"]["deduped"])
+        self.assertTrue(outcomes[2]["response"]["deduped"])
+        self.assertEqual(outcomes[2]["response"]["request_id"], "b:2")
+        self.assertEqual(outcomes[3]["error"]["status_code"], 413)
+        self.assertEqual(cache.calls.count("get_cached_many"), 1)
+        self.assertEqual(cache.calls.count("admit"), 1)
+        self.assertIn("record_total_requests:2", cache.calls)
+
+    async def test_bounds_fan_out(self) -> None:
+        router, _, providers = _build_router()
+        router.batch_max_concurrency = 2
+        active = {"now": 0, "peak": 0}
+
+        async def slow_groq(prompt: str, deadline: Any = None) -> str:
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+            await asyncio.sleep(0.01)
+            active["now"] -= 1
+            return prompt
+
+        providers.call_groq = slow_groq
+        payloads = [{"product": "aurafx", "prompt": f"p{i}"} for i in range(6)]
+        outcomes = [item async for item in router.route_batch(payloads, "b")]
+
+        self.assertEqual(len(outcomes), 6)
+        self.assertEqual(active["peak"], 2)
+
+
+class StreamRequestTests(unittest.IsolatedAsyncioTestCase):
+    async def _collect(self, router: InferenceRouter, payload: dict[str, Any]) -> list[dict[str, Any]]:
+        return [event async for event in router.stream_request(payload, "r1")]
+
+    async def test_streams_tokens_then_caches_assembled_output(self) -> None:
+        router, cache, _ = _build_router()
+        payload = {"product": "aurafx", "prompt": "hello"}
+
+        events = await self._collect(router, payload)
+
+        self.assertEqual([e["text"] for e in events if e["event"] == "token"], ["gr", "oq"])
+        self.assertEqual(events[-1]["event"], "done")
+        self.assertEqual(events[-1]["provider"], "groq")
+        self.assertNotIn("output", events[-1])
+        self.assertEqual(cache.calls, ["admit", "publish_result"])
+
+        replay = await router.route_request(payload, "r2")
+        self.assertEqual(replay["output"], "groq")
+        self.assertTrue(replay["cached"])
+
+    async def test_falls_back_before_first_token(self) -> None:
+        router, _, providers = _build_router()
+        providers.groq_error = ProviderError("groq", "down", 500)
+
+        events = await self._collect(router, {"product": "aurafx", "prompt": "hello"})
+
+        self.assertEqual(providers.calls, ["groq", "ollama"])
+        self.assertEqual(events[-1]["provider"], "ollama")
+
+    async def test_mid_stream_failure_ends_stream_without_caching(self) -> None:
+        router, cache, providers = _build_router()
+        providers.groq_error = ProviderError("groq", "down", 500)
+        providers.ollama_mid_stream_error = ProviderError("ollama", "reset", None)
+
+        events = []
+        with self.assertRaises(ProviderError):
+            async for event in router.stream_request({"product": "aurafx", "prompt": "hello"}, "r1"):
+                events.append(event)
+
+        self.assertEqual(events, [{"event": "token", "text": "olla"}])
+        self.assertEqual(providers.calls, ["groq", "ollama"])
+        self.assertNotIn("publish_result", cache.calls)
+        self.assertIn("release_dedupe_lock", cache.calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
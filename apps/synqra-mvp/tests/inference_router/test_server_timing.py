@@ -0,0 +1,41 @@
+import asyncio
+import unittest
+
+from services.inference_router.server_timing import ServerTiming
+
+
+class ServerTimingTests(unittest.IsolatedAsyncioTestCase):
+    def test_renders_header_in_completion_order(self) -> None:
+        timing = ServerTiming()
+        timing.add("admit", 0.0012)
+        timing.add("groq", 0.25, 'ok "fast"')
+
+        self.assertEqual(timing.header(), 'admit;dur=1.2, groq;dur=250;desc="ok \\"fast\\""')
+        self.assertEqual(
+            timing.as_list(),
+            [
+                {"name": "admit", "duration_ms": 1.2},
+                {"name": "groq", "duration_ms": 250.0, "description": 'ok "fast"'},
+            ],
+        )
+
+    async def test_current_is_scoped_to_activation_and_inherited_by_tasks(self) -> None:
+        timing = ServerTiming()
+
+        async def child() -> None:
+            ServerTiming.current().add("child", 0.001)
+
+        async def detached() -> None:
+            ServerTiming.detach()
+            self.assertIsNone(ServerTiming.current())
+
+        with timing.activate():
+            await asyncio.create_task(child())
+            await asyncio.create_task(detached())
+            self.assertIs(ServerTiming.current(), timing)
+        self.assertIsNone(ServerTiming.current())
+        self.assertEqual([entry[0] for entry in timing.entries], ["child"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+from services.inference_router.signature import KeySchema, SignatureBuilder
+
+
+class SignatureBuilderTests(unittest.TestCase):
+    def test_whitespace_and_volatile_metadata_do_not_change_signature(self) -> None:
+        builder = SignatureBuilder()
+        first = builder.build(
+            {"product": "synqra", "prompt": "Write  a caption\n", "metadata": {"trace_id": "a", "tone": "bold"}}
+        )
+        second = builder.build(
+            {"product": "Synqra", "prompt": " Write a caption", "metadata": {"tone": "bold", "trace_id": "b"}}
+        )
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(first), 32)
+
+    def test_meaningful_fields_change_signature(self) -> None:
+        builder = SignatureBuilder()
+        base = {"product": "synqra", "prompt": "caption", "metadata": {"tone": "bold"}}
+
+        self.assertNotEqual(builder.build(base), builder.build({**base, "metadata": {"tone": "calm"}}))
+        self.assertNotEqual(builder.build(base), builder.build({**base, "product": "noid"}))
+        self.assertNotEqual(builder.build(base), builder.build({**base, "media_url": "https://x/y.png"}))
+
+    def test_separator_cannot_shift_fields(self) -> None:
+        builder = SignatureBuilder()
+
+        self.assertNotEqual(
+            builder.build({"product": "synqra", "prompt": "a\x1fb"}),
+            builder.build({"product": "synqra", "prompt": "a", "media_url": "b"}),
+        )
+
+    def test_per_product_schema(self) -> None:
+        builder = SignatureBuilder.from_json(
+            '{"default": {"exclude_metadata": ["session"]},'
+            ' "aurafx": {"fields": ["product", "prompt"], "lowercase_prompt": true}}'
+        )
+
+        self.assertEqual(
+            builder.build({"product": "aurafx", "prompt": "EURUSD Outlook", "metadata": {"a": 1}}),
+            builder.build({"product": "aurafx", "prompt": "eurusd outlook", "metadata": {"a": 2}}),
+        )
+        self.assertEqual(
+            builder.build({"product": "synqra", "prompt": "x", "metadata": {"session": 1}}),
+            builder.build({"product": "synqra", "prompt": "x", "metadata": {"session": 2}}),
+        )
+        self.assertNotEqual(
+            builder.build({"product": "synqra", "prompt": "X"}),
+            builder.build({"product": "synqra", "prompt": "x"}),
+        )
+
+    def test_whitespace_normalization_can_be_disabled(self) -> None:
+        builder = SignatureBuilder({"noid": KeySchema(normalize_whitespace=False)})
+
+        self.assertNotEqual(
+            builder.build({"product": "noid", "prompt": "a  b"}),
+            builder.build({"product": "noid", "prompt": "a b"}),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
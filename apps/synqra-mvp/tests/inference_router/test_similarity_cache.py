@@ -0,0 +1,80 @@
+import unittest
+
+from services.inference_router.similarity_cache import SimilarityCache, simhash
+
+
+_PROMPT = "Write a launch caption for the new Synqra analytics dashboard aimed at marketing directors"
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class SimHashTests(unittest.TestCase):
+    def test_case_and_punctuation_are_ignored(self) -> None:
+        self.assertEqual(simhash(_PROMPT)[0], simhash(_PROMPT.upper() + "!!")[0])
+
+    def test_one_changed_word_stays_close_and_unrelated_text_does_not(self) -> None:
+        base, tokens = simhash(_PROMPT)
+        changed, _ = simhash(_PROMPT.replace("Synqra", "Aurafx"))
+        unrelated, _ = simhash("Summarize the quarterly earnings call for investors in three bullets")
+
+        self.assertEqual(tokens, 14)
+        self.assertLessEqual((base ^ changed).bit_count(), 9)
+        self.assertGreater((base ^ unrelated).bit_count(), 16)
+
+
+class SimilarityCacheTests(unittest.TestCase):
+    def test_lookup_returns_closest_signature_in_same_partition(self) -> None:
+        cache = SimilarityCache(enabled=True)
+        cache.add("ctx", _PROMPT, "sig-a")
+
+        match = cache.lookup("ctx", "synqra", _PROMPT.replace("Synqra", "Aurafx"))
+        self.assertIsNotNone(match)
+        self.assertEqual(match[0], "sig-a")
+        self.assertGreaterEqual(match[1], 0.85)
+        self.assertIsNone(cache.lookup("other-ctx", "synqra", _PROMPT))
+
+    def test_per_product_threshold(self) -> None:
+        cache = SimilarityCache(enabled=True, thresholds={"noid": 1.0})
+        cache.add("ctx", _PROMPT, "sig-a")
+        variant = _PROMPT.replace("Synqra", "Aurafx")
+
+        self.assertIsNotNone(cache.lookup("ctx", "synqra", variant))
+        self.assertIsNone(cache.lookup("ctx", "noid", variant))
+        self.assertIsNotNone(cache.lookup("ctx", "noid", _PROMPT + "?"))
+
+    def test_short_prompts_are_not_indexed(self) -> None:
+        cache = SimilarityCache(enabled=True, min_tokens=4)
+        cache.add("ctx", "hello there", "sig-a")
+
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(cache.lookup("ctx", "synqra", "hello there"))
+
+    def test_entries_expire_and_evict_oldest(self) -> None:
+        clock = _Clock()
+        cache = SimilarityCache(enabled=True, max_entries=1, ttl_seconds=10, clock=clock)
+        cache.add("ctx", _PROMPT, "sig-a")
+        cache.add("ctx", "Summarize the quarterly earnings call for investors", "sig-b")
+
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertIsNone(cache.lookup("ctx", "synqra", _PROMPT))
+        clock.now = 10.0
+        self.assertIsNone(
+            cache.lookup("ctx", "synqra", "Summarize the quarterly earnings call for investors")
+        )
+
+    def test_disabled_cache_indexes_nothing(self) -> None:
+        cache = SimilarityCache()
+        cache.add("ctx", _PROMPT, "sig-a")
+
+        self.assertIsNone(cache.lookup("ctx", "synqra", _PROMPT))
+        self.assertEqual(cache.stats()["lookups"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
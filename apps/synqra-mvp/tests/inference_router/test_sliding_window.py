@@ -0,0 +1,85 @@
+import unittest
+
+from services.inference_router.sliding_window import WINDOW_LUA, SlidingWindow
+
+try:
+    import fakeredis
+    import lupa  # noqa: F401  fakeredis runs Lua through it
+except ImportError:
+    fakeredis = None
+
+
+class SlidingWindowTests(unittest.TestCase):
+    def test_bucket_geometry(self) -> None:
+        window = SlidingWindow(window_seconds=3600, bucket_seconds=60)
+        self.assertEqual(window.buckets, 60)
+        self.assertEqual(window.bucket_at(119.9), 1)
+        self.assertEqual(window.bucket_at(120.0), 2)
+        self.assertGreater(window.ttl_seconds, window.window_seconds)
+
+    def test_partial_bucket_rounds_up(self) -> None:
+        self.assertEqual(SlidingWindow(window_seconds=90, bucket_seconds=60).buckets, 2)
+        self.assertEqual(SlidingWindow(window_seconds=10, bucket_seconds=60).buckets, 1)
+
+    def test_lua_helpers_are_defined(self) -> None:
+        for name in ("window_roll", "window_add", "window_remove"):
+            self.assertIn(f"local function {name}(", WINDOW_LUA)
+
+
+@unittest.skipIf(fakeredis is None, "needs fakeredis[lua]")
+class WindowLuaTests(unittest.IsolatedAsyncioTestCase):
+    """Runs the helpers on fakeredis with buckets=3 and explicit bucket ids."""
+
+    async def asyncSetUp(self) -> None:
+        self.redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        self.add = self.redis.register_script(
+            WINDOW_LUA
+            + "return window_add(KEYS[1], tonumber(ARGV[1]), 3, tonumber(ARGV[2]), 100)"
+        )
+        self.roll = self.redis.register_script(
+            WINDOW_LUA + "return window_roll(KEYS[1], tonumber(ARGV[1]), 3, 100)"
+        )
+        self.remove = self.redis.register_script(
+            WINDOW_LUA + "return window_remove(KEYS[1], tonumber(ARGV[1]), tonumber(ARGV[2]))"
+        )
+
+    async def asyncTearDown(self) -> None:
+        await self.redis.aclose()
+
+    async def test_buckets_roll_out_of_the_sum_one_at_a_time(self) -> None:
+        await self.add(keys=["w"], args=[10, 3])
+        await self.add(keys=["w"], args=[11, 2])
+        self.assertEqual(await self.add(keys=["w"], args=[12, 1]), 6)
+
+        self.assertEqual(await self.roll(keys=["w"], args=[13]), 3)
+        self.assertEqual(await self.roll(keys=["w"], args=[14]), 1)
+        fields = await self.redis.hgetall("w")
+        self.assertEqual(fields, {"head": "12", "sum": "1", "12": "1"})
+
+    async def test_sum_is_zero_once_the_whole_window_has_expired(self) -> None:
+        await self.add(keys=["w"], args=[10, 5])
+
+        self.assertEqual(await self.roll(keys=["w"], args=[20]), 0)
+        self.assertEqual(await self.redis.hgetall("w"), {"head": "18", "sum": "0"})
+        self.assertEqual(await self.add(keys=["w"], args=[20, 1]), 1)
+
+    async def test_reads_of_a_missing_window_leave_it_expiring(self) -> None:
+        self.assertEqual(await self.roll(keys=["w"], args=[10]), 0)
+        self.assertGreater(await self.redis.ttl("w"), 0)
+
+        await self.redis.persist("w")
+        await self.roll(keys=["w"], args=[30])
+        self.assertGreater(await self.redis.ttl("w"), 0)
+
+    async def test_remove_only_touches_live_buckets(self) -> None:
+        await self.add(keys=["w"], args=[10, 2])
+        await self.add(keys=["w"], args=[12, 2])
+
+        self.assertEqual(await self.remove(keys=["w"], args=[12, 5]), 2)
+        await self.roll(keys=["w"], args=[13])
+        self.assertEqual(await self.remove(keys=["w"], args=[10, 1]), 0)
+        self.assertEqual(await self.roll(keys=["w"], args=[13]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import io
+import json
+import logging
+import sys
+import threading
+import unittest
+
+from services.inference_router import structured_logging
+from services.inference_router.structured_logging import (
+    BackgroundLogHandler,
+    EventSampler,
+    JsonFormatter,
+)
+
+
+def _record(event: str, level: int = logging.INFO, **extra: object) -> logging.LogRecord:
+    record = logging.LogRecord("router", level, __file__, 1, event, (), None)
+    record.__dict__.update(extra)
+    return record
+
+
+class _ThreadRecordingHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.records: list[tuple[str, str]] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append((record.getMessage(), threading.current_thread().name))
+
+
+class JsonFormatterTests(unittest.TestCase):
+    def test_includes_extras_and_falls_back_to_stdlib_encoder(self) -> None:
+        formatter = JsonFormatter()
+
+        line = json.loads(formatter.format(_record("cache.hit", request_id="r1", size=1 << 70)))
+
+        self.assertEqual(line["message"], "cache.hit")
+        self.assertEqual(line["request_id"], "r1")
+        self.assertEqual(line["size"], 1 << 70)
+
+    def test_works_without_orjson(self) -> None:
+        original = structured_logging.orjson
+        structured_logging.orjson = None
+        try:
+            line = json.loads(JsonFormatter().format(_record("cache.hit", tags={"a": 1})))
+        finally:
+            structured_logging.orjson = original
+        self.assertEqual(line["tags"], {"a": 1})
+
+
+class EventSamplerTests(unittest.TestCase):
+    def test_rate_limit_reports_suppressed_count_in_next_window(self) -> None:
+        now = [0.0]
+        sampler = EventSampler(rate_limits={"cache.get_failed": 2}, clock=lambda: now[0])
+
+        passed = [sampler.filter(_record("cache.get_failed")) for _ in range(5)]
+        now[0] = 1.0
+        next_record = _record("cache.get_failed")
+
+        self.assertEqual(passed, [True, True, False, False, False])
+        self.assertTrue(sampler.filter(next_record))
+        self.assertEqual(next_record.suppressed, 3)
+        self.assertTrue(sampler.filter(_record("cache.set_failed")))
+
+    def test_samples_a_fraction_of_an_event(self) -> None:
+        draws = iter([0.05, 0.5, 0.09, 0.95])
+        sampler = EventSampler(sample_rates={"http.request": 0.1}, rng=lambda: next(draws))
+
+        passed = [sampler.filter(_record("http.request")) for _ in range(4)]
+
+        self.assertEqual(passed, [True, False, True, False])
+        self.assertEqual(sampler.sampled_out, 2)
+
+
+class BackgroundLogHandlerTests(unittest.TestCase):
+    def test_writes_on_worker_thread(self) -> None:
+        target = _ThreadRecordingHandler()
+        handler = BackgroundLogHandler(target)
+        try:
+            handler.handle(_record("cache.get_failed"))
+            handler.handle(
+                logging.LogRecord("router", logging.INFO, __file__, 1, "hit %s", ("r1",), None)
+            )
+            handler.flush()
+        finally:
+            handler.close()
+
+        self.assertEqual([message for message, _ in target.records], ["cache.get_failed", "hit r1"])
+        self.assertNotIn(threading.current_thread().name, {thread for _, thread in target.records})
+
+    def test_formats_exceptions_off_the_caller(self) -> None:
+        stream = io.StringIO()
+        target = logging.StreamHandler(stream)
+        target.setFormatter(JsonFormatter())
+        handler = BackgroundLogHandler(target)
+        try:
+            raise RuntimeError("redis down")
+        except RuntimeError:
+            record = logging.LogRecord(
+                "router", logging.ERROR, __file__, 1, "cache.get_failed", (), sys.exc_info()
+            )
+        handler.handle(record)
+        handler.close()
+
+        line = json.loads(stream.getvalue())
+        self.assertIn("RuntimeError: redis down", line["exc_info"])
+
+    def test_drops_when_queue_is_full(self) -> None:
+        release = threading.Event()
+
+        class _Blocking(logging.Handler):
+            def emit(self, record: logging.LogRecord) -> None:
+                release.wait()
+
+        handler = BackgroundLogHandler(_Blocking(), max_queue=1)
+        try:
+            for _ in range(5):
+                handler.handle(_record("http.request"))
+            self.assertGreaterEqual(handler.dropped, 3)
+        finally:
+            release.set()
+            handler.close()
+
+
+if __name__ == "__main__":
+    unittest.main()